@@ -15,7 +15,15 @@ from src.example.my_security_monitor import MySecurityMonitor
 from src.system.security_policy_type import SecurityPolicy
 
 from src.system.config import CRITICALITY_STR, LOG_DEBUG, \
-    LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME
+    LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, \
+    SATELITE_QUEUE_NAME
+
+# телеметрия спутника идёт отрисовщику через монитор безопасности
+TELEMETRY_POLICY = SecurityPolicy(
+    source=SATELITE_QUEUE_NAME,
+    destination=ORBIT_DRAWER_QUEUE_NAME,
+    operation='orbit_telemetry'
+)
 
 
 def setup_system(queues_dir):
@@ -66,7 +74,7 @@ if __name__ == '__main__':
     queues_dir = QueuesDirectory()
 
     # Пример монитора безопасности реализован в классе MySecurityMonitor
-    security_monitor = MySecurityMonitor(queues_dir=queues_dir, log_level=LOG_DEBUG, policies=[])
+    security_monitor = MySecurityMonitor(queues_dir=queues_dir, log_level=LOG_DEBUG, policies=[TELEMETRY_POLICY])
 
     
     # Создадим модули системы
@@ -103,6 +111,7 @@ if __name__ == '__main__':
         queues_dir=queues_dir, 
         log_level=LOG_DEBUG, 
         policies=[
+            TELEMETRY_POLICY,
             SecurityPolicy(
                 source=OPTICS_CONTROL_QUEUE_NAME,
                 destination=ORBIT_DRAWER_QUEUE_NAME,
@@ -1,9 +1,12 @@
+import os
+import sys
 import numpy as np
 from time import sleep
 
 from src.satellite_simulator.satellite import Satellite
 from src.satellite_simulator.orbit_drawer import OrbitDrawer
 from src.satellite_simulator.camera import Camera
+from src.satellite_simulator.telemetry_recorder import TelemetryRecorder
 
 from src.satellite_control_system.optics_control import OpticsControl
 from src.satellite_control_system.orbit_control import OrbitControl
@@ -12,8 +15,11 @@ from src.satellite_control_system.user_program_executor import UserProgramExecut
 
 from src.system.queues_dir import QueuesDirectory
 from src.system.system_wrapper import SystemComponentsContainer
+from src.system.async_runtime import AsyncQueuesDirectory, AsyncSystemComponentsContainer
 from src.system.event_types import Event
-from src.system.config import LOG_DEBUG, SECURITY_MONITOR_QUEUE_NAME
+from src.system.frame_pool import SharedFramePool
+from src.system.config import LOG_DEBUG, LOG_ERROR, LOG_CATEGORY_EVENTS, SECURITY_MONITOR_QUEUE_NAME, \
+    PHOTO_FRAME_POOL_NAME, PHOTO_FRAME_POOL_SLOTS, PHOTO_FRAME_SIZE_PX
 from src.example.my_security_monitor import MySecurityMonitor
 from src.system.security_policy_type import SecurityPolicy
 
@@ -39,23 +45,30 @@ def create_security_policies():
         SecurityPolicy("user_program", "camera", "request_photo"),  # Низкоцелостные данные
         SecurityPolicy("user_program", "restricted_zone_control", "add_zone"),  # Высокоцелостные данные
         SecurityPolicy("user_program", "restricted_zone_control", "remove_zone"),  # Высокоцелостные данные
+        SecurityPolicy("user_program", "restricted_zone_control", "import_zones"),  # Высокоцелостные данные
         
         # === Политики для RestrictedZoneControl (доверенный домен) ===
         # Контроллер зон может отправлять обновления зон
         # ВАЖНО: RestrictedZoneControl управляет высокоцелостными данными (координаты зон)
         SecurityPolicy("restricted_zone_control", "optics_control", "sync_zones"),  # Высокоцелостные данные
         SecurityPolicy("restricted_zone_control", "orbit_drawer", "draw_restricted_zone"),  # Визуализация
+        SecurityPolicy("restricted_zone_control", "orbit_drawer", "draw_restricted_zones"),  # Визуализация
         SecurityPolicy("restricted_zone_control", "orbit_drawer", "clear_restricted_zone"),  # Визуализация
         
         # === Политики для OrbitControl (доверенный домен) ===
         # Контроллер орбиты может управлять спутником
         # ВАЖНО: OrbitControl управляет высокоцелостными данными (параметры орбиты)
         SecurityPolicy("orbit_control", "satellite", "change_orbit"),  # Высокоцелостные данные
+        # Контроллер орбиты узнаёт подтверждённую орбиту спутника из телеметрии
+        SecurityPolicy("orbit_control", "satellite", "subscribe_telemetry"),  # Низкоцелостные данные
+        SecurityPolicy("orbit_control", "satellite", "unsubscribe_telemetry"),  # Низкоцелостные данные
+        SecurityPolicy("satellite", "orbit_control", "orbit_telemetry"),  # Высокоцелостные данные (параметры орбиты)
         
         # === Политики для OpticsControl (доверенный домен) ===
         # Контроллер оптики может запрашивать фото и обновлять карту
         SecurityPolicy("optics_control", "camera", "request_photo"),  # Низкоцелостные данные
         SecurityPolicy("optics_control", "orbit_drawer", "update_photo_map"),  # Низкоцелостные данные
+        SecurityPolicy("optics_control", "telemetry_recorder", "update_photo_map"),  # Низкоцелостные данные
         
         # === Политики для Camera (недоверенный домен - симулятор) ===
         # Камера может запрашивать координаты у спутника
@@ -66,12 +79,21 @@ def create_security_policies():
         # === Политики для Satellite (недоверенный домен - симулятор) ===
         # Спутник может отправлять данные отрисовщику
         SecurityPolicy("satellite", "orbit_drawer", "update_orbit_data"),  # Низкоцелостные данные (визуализация)
+        SecurityPolicy("satellite", "orbit_drawer", "orbit_telemetry"),  # Низкоцелостные данные (визуализация)
         # Спутник может отвечать камере
         SecurityPolicy("satellite", "camera", "camera_update"),  # Низкоцелостные данные
         
         # === Политики для OrbitDrawer (недоверенный домен - визуализация) ===
         # Отрисовщик может запрашивать данные у спутника
         SecurityPolicy("orbit_drawer", "satellite", "send_data"),  # Низкоцелостные данные
+        # Отрисовщик подписывается на телеметрию спутника
+        SecurityPolicy("orbit_drawer", "satellite", "subscribe_telemetry"),  # Низкоцелостные данные
+        SecurityPolicy("orbit_drawer", "satellite", "unsubscribe_telemetry"),  # Низкоцелостные данные
+
+        # === Политики для TelemetryRecorder (недоверенный домен - история телеметрии) ===
+        SecurityPolicy("satellite", "telemetry_recorder", "orbit_telemetry"),  # Низкоцелостные данные
+        SecurityPolicy("telemetry_recorder", "satellite", "subscribe_telemetry"),  # Низкоцелостные данные
+        SecurityPolicy("telemetry_recorder", "satellite", "unsubscribe_telemetry"),  # Низкоцелостные данные
     ]
 
 
@@ -80,16 +102,43 @@ if __name__ == "__main__":
     print("КИБЕРИММУННАЯ СИСТЕМА УПРАВЛЕНИЯ СПУТНИКОМ")
     print("="*70 + "\n")
     
+    # Среда исполнения выбирается при запуске:
+    #   python example_3.py          - каждый компонент в отдельном процессе
+    #   python example_3.py --asyncio - все компоненты как задачи asyncio в одном процессе
+    #                                  (без отрисовщика, которому нужен свой главный цикл)
+    use_asyncio = "--asyncio" in sys.argv
+    #   python example_3.py --capture - монитор записывает все события в журнал
+    #                                  (воспроизведение: src/system/event_replay.py)
+    capture_path = "./event_capture.log" if "--capture" in sys.argv else None
+    #   python example_3.py --quiet  - только ошибки; уровень журнала работающих
+    #                                  компонентов меняется командой set_log_level
+    log_level = LOG_ERROR if "--quiet" in sys.argv else LOG_DEBUG
+
     # Создаём каталог очередей
-    queues_dir = QueuesDirectory()
+    queues_dir = AsyncQueuesDirectory() if use_asyncio else QueuesDirectory()
+
+    # Снимки камеры передаются через разделяемую память, в событиях - только ссылки на кадры
+    frame_pool = SharedFramePool(
+        name=PHOTO_FRAME_POOL_NAME,
+        slots=PHOTO_FRAME_POOL_SLOTS,
+        slot_bytes=PHOTO_FRAME_SIZE_PX * PHOTO_FRAME_SIZE_PX * 3)
+    queues_dir.register_frame_pool(frame_pool)
 
     # === СОЗДАНИЕ МОНИТОРА БЕЗОПАСНОСТИ ===
     print("📋 Инициализация политик безопасности...")
     security_policies = create_security_policies()
+    # Ключи подписи событий, которые отправляются через монитор безопасности:
+    # событие без верной подписи ключом своего источника будет отклонено
+    signing_keys = {
+        name: os.urandom(32)
+        for name in ("optics_control", "orbit_control", "restricted_zone_control", "user_program", "satellite")
+    }
     security_monitor = MySecurityMonitor(
         queues_dir=queues_dir,
-        log_level=LOG_DEBUG,
-        policies=security_policies
+        log_level=log_level,
+        policies=security_policies,
+        signing_keys=signing_keys,
+        capture_path=capture_path
     )
     print(f"✅ Загружено {len(security_policies)} политик безопасности\n")
 
@@ -102,33 +151,46 @@ if __name__ == "__main__":
         inclination=np.pi / 3,
         raan=0,
         queues_dir=queues_dir,
-        log_level=LOG_DEBUG
+        log_level=log_level
     )
 
     camera = Camera(
         queues_dir=queues_dir,
-        log_level=LOG_DEBUG
+        log_level=log_level
     )
 
-    drawer = OrbitDrawer(
+    drawer = None
+    if not use_asyncio:
+        drawer = OrbitDrawer(
+            queues_dir=queues_dir,
+            log_level=log_level
+        )
+
+    # История положений спутника и снимков сохраняется на диск
+    recorder = TelemetryRecorder(
         queues_dir=queues_dir,
-        log_level=LOG_DEBUG
+        storage_dir="./telemetry_storage",
+        log_level=log_level
     )
 
     # Контроллеры (доверенные домены)
     optics_control = OpticsControl(
         queues_dir=queues_dir,
-        log_level=LOG_DEBUG
+        log_level=log_level
     )
 
+    # начальная орбита спутника нужна для оценки переходов: (высота, наклонение, RAAN)
     orbit_control = OrbitControl(
         queues_dir=queues_dir,
-        log_level=LOG_DEBUG
+        log_level=log_level,
+        initial_orbits={None: (1000e3, np.pi / 3, 0)}
     )
 
+    # Зоны сохраняются на диск и восстанавливаются при следующем запуске
     zone_control = RestrictedZoneControl(
         queues_dir=queues_dir,
-        log_level=LOG_DEBUG
+        log_level=log_level,
+        storage_dir="./zones_storage"
     )
 
     # Исполнитель пользовательских программ (недоверенный домен)
@@ -136,22 +198,34 @@ if __name__ == "__main__":
     user_executor = UserProgramExecutor(
         queues_dir=queues_dir,
         permissions={"photo", "zones"},  # НЕТ прав на изменение орбиты!
-        log_level=LOG_DEBUG
+        log_level=log_level
     )
 
+    optics_control.set_signing_key(signing_keys["optics_control"])
+    orbit_control.set_signing_key(signing_keys["orbit_control"])
+    zone_control.set_signing_key(signing_keys["restricted_zone_control"])
+    user_executor.set_signing_key(signing_keys["user_program"])
+    # телеметрия спутника идёт через монитор и тоже подписывается
+    satellite.set_signing_key(signing_keys["satellite"])
+
     # Контейнер всех компонентов
-    system = SystemComponentsContainer(
-        components=[
-            security_monitor,  # Монитор должен быть первым!
-            satellite,
-            camera,
-            drawer,
-            optics_control,
-            orbit_control,
-            zone_control,
-            user_executor
-        ],
-        log_level=LOG_DEBUG
+    components = [
+        security_monitor,  # Монитор должен быть первым!
+        satellite,
+        camera,
+        drawer,
+        recorder,
+        optics_control,
+        orbit_control,
+        zone_control,
+        user_executor
+    ]
+    container_type = AsyncSystemComponentsContainer if use_asyncio else SystemComponentsContainer
+    system = container_type(
+        components=[component for component in components if component is not None],
+        log_level=log_level,
+        # упавший компонент перезапускается и восстанавливает состояние
+        restart_failed=True
     )
 
     # === ЗАПУСК СИСТЕМЫ ===
@@ -301,7 +375,11 @@ if __name__ == "__main__":
     sleep(2)
 
     print("\n📊 Наблюдение за системой...")
+    # прохождение событий через монитор выводится только на время наблюдения,
+    # без перезапуска монитора и без подробного журнала остальных компонентов
+    security_monitor.set_log_level(categories={LOG_CATEGORY_EVENTS: LOG_DEBUG})
     sleep(5)
+    security_monitor.set_log_level(categories={LOG_CATEGORY_EVENTS: None})
 
     # === ЗАВЕРШЕНИЕ ===
     print("\n" + "="*70)
@@ -310,6 +388,7 @@ if __name__ == "__main__":
     
     system.stop()
     system.clean()
+    frame_pool.close()
     
     print("\n✅ Демонстрация завершена!")
     print("\n📝 Продемонстрированные механизмы безопасности:")
@@ -0,0 +1,257 @@
+""" нагрузочная проверка задержки команд монитора под потоком телеметрии
+
+Монитор безопасности и генераторы работают в отдельных процессах. Генераторы отправляют
+ему телеметрию и координаты снимков для отрисовщика так, чтобы у монитора
+всё время оставалось max_backlog необработанных событий (монитор загружен
+полностью, а очередь не растёт до исчерпания памяти), а раз
+в command_interval_sec отправляются команды change_orbit и remove_zone.
+Время отправки команды передаётся в extra_parameters; приёмник в этом
+процессе выбирает события из очередей получателей и считает задержку
+команд от отправки до доставки получателю (time.monotonic одинаково
+в процессах одной машины).
+
+Проверка выполняется для обоих порядков выборки из полос приоритета
+(SCHEDULING_STRICT и SCHEDULING_WEIGHTED) и для сравнения - для монитора
+с одной очередью без приоритетов (SCHEDULING_FIFO). p99 задержки команд
+с полосами приоритета должна быть меньше, чем у очереди FIFO, не менее чем
+в FIFO_SPEEDUP раз, иначе проверка завершается ошибкой:
+
+    python -m src.example.monitor_load_test
+"""
+import threading
+from multiprocessing import Process, Queue, Value
+from queue import Empty
+from time import monotonic, sleep
+from typing import Dict, List
+
+import numpy as np
+
+from src.example.my_security_monitor import MySecurityMonitor
+from src.system.event_types import Event
+from src.system.queues_dir import QueuesDirectory, PriorityLanesQueue
+from src.system.security_monitor import SCHEDULING_STRICT, SCHEDULING_WEIGHTED
+from src.system.security_policy_type import SecurityPolicy
+from src.system.config import LOG_FAILURE, EXECUTION_MODE_PROCESS, SECURITY_MONITOR_QUEUE_NAME, \
+    SATELITE_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, ORBIT_CONTROL_QUEUE_NAME, OPTICS_CONTROL_QUEUE_NAME
+
+RESTRICTED_ZONE_CONTROL_QUEUE_NAME = "restricted_zone_control"
+USER_PROGRAM_QUEUE_NAME = "user_program"
+
+POLICIES = [
+    SecurityPolicy(ORBIT_CONTROL_QUEUE_NAME, SATELITE_QUEUE_NAME, "change_orbit"),
+    SecurityPolicy(USER_PROGRAM_QUEUE_NAME, RESTRICTED_ZONE_CONTROL_QUEUE_NAME, "remove_zone"),
+    SecurityPolicy(SATELITE_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, "orbit_telemetry"),
+    SecurityPolicy(OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, "update_photo_map"),
+]
+
+# монитор с одной очередью: события обрабатываются в порядке поступления
+SCHEDULING_FIFO = "fifo"
+# во сколько раз p99 задержки команд с полосами приоритета должна быть меньше, чем у FIFO
+FIFO_SPEEDUP = 2.0
+
+COMMANDS = (
+    (ORBIT_CONTROL_QUEUE_NAME, SATELITE_QUEUE_NAME, "change_orbit", [1000e3, 0.5, 0.0]),
+    (USER_PROGRAM_QUEUE_NAME, RESTRICTED_ZONE_CONTROL_QUEUE_NAME, "remove_zone", 1),
+)
+
+
+def _single_lane(event) -> int:
+    return 0
+
+
+class _FifoSecurityMonitor(MySecurityMonitor):
+    """ монитор без полос приоритета, для сравнения """
+
+    def _create_events_q(self, queues_dir: QueuesDirectory, execution_mode: str):
+        return PriorityLanesQueue(lanes=[queues_dir.create_queue(execution_mode)], lane_of=_single_lane)
+
+
+class _Sink:
+    """ приёмник событий на стороне получателей """
+
+    def __init__(self, queues: Dict[str, Queue]):
+        self._queues = queues
+        self.latencies: Dict[str, List[float]] = {operation: [] for _, _, operation, _ in COMMANDS}
+        # счётчик общий с процессами генераторов
+        self.telemetry = Value("q", 0)
+        self._quit = False
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._quit = True
+        self._thread.join()
+
+    def _drain(self):
+        while not self._quit:
+            idle = True
+            for q in self._queues.values():
+                try:
+                    while True:
+                        event = q.get_nowait()
+                        idle = False
+                        if event.operation in self.latencies:
+                            self.latencies[event.operation].append(monotonic() - event.extra_parameters)
+                        else:
+                            with self.telemetry.get_lock():
+                                self.telemetry.value += 1
+                except Empty:
+                    pass
+            if idle:
+                sleep(0.0005)
+
+
+def _flood(monitor_q, sent, delivered, quit_flag, max_backlog: int, batch: int = 100):
+    """ генератор телеметрии и снимков, рабочая функция процесса """
+    telemetry = Event(SATELITE_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, "orbit_telemetry",
+                      {"fields": ("time", "lat", "lon"), "samples": [(0.0, 10.0, 20.0)] * 16})
+    photo = Event(OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, "update_photo_map", (10.0, 20.0))
+    while not quit_flag.value:
+        if sent.value - delivered.value >= max_backlog:
+            sleep(0.0005)
+            continue
+        for _ in range(batch):
+            monitor_q.put(telemetry)
+            monitor_q.put(photo)
+        with sent.get_lock():
+            sent.value += 2 * batch
+
+
+class _Flood:
+    """ процессы генераторов телеметрии и снимков """
+
+    def __init__(self, monitor_q, sink: _Sink, processes: int, max_backlog: int):
+        self._sink = sink
+        self._sent = Value("q", 0)
+        self._quit = Value("b", 0)
+        self._processes = [
+            Process(target=_flood, args=(monitor_q, self._sent, sink.telemetry, self._quit, max_backlog),
+                    daemon=True)
+            for _ in range(processes)]
+
+    @property
+    def sent(self) -> int:
+        return self._sent.value
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+
+    def stop(self):
+        self._quit.value = 1
+        for process in self._processes:
+            process.join()
+
+    def backlog(self) -> int:
+        return self._sent.value - self._sink.telemetry.value
+
+
+def run_load_test(scheduling: str, duration_sec: float = 3.0, flood_processes: int = 2,
+                  max_backlog: int = 20_000, command_interval_sec: float = 0.02) -> dict:
+    """run_load_test задержка команд при заданном порядке выборки из полос
+
+    Args:
+        scheduling (str): SCHEDULING_STRICT, SCHEDULING_WEIGHTED или SCHEDULING_FIFO
+
+    Returns:
+        dict: число команд и доставленной телеметрии, задержки команд
+            (медиана, p99, максимум) в миллисекундах по операциям
+    """
+    queues_dir = QueuesDirectory()
+    sink_queues = {}
+    for name in (SATELITE_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, RESTRICTED_ZONE_CONTROL_QUEUE_NAME):
+        sink_queues[name] = Queue()
+        queues_dir.register(sink_queues[name], name)
+
+    if scheduling == SCHEDULING_FIFO:
+        monitor = _FifoSecurityMonitor(queues_dir, LOG_FAILURE, POLICIES, execution_mode=EXECUTION_MODE_PROCESS)
+    else:
+        monitor = MySecurityMonitor(queues_dir, LOG_FAILURE, POLICIES, execution_mode=EXECUTION_MODE_PROCESS)
+        monitor.scheduling = scheduling
+    monitor.start()
+    sink = _Sink(sink_queues)
+    sink.start()
+
+    monitor_q = queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+    flood = _Flood(monitor_q, sink, flood_processes, max_backlog)
+    flood.start()
+
+    # поток телеметрии успевает накопиться до первой команды
+    sleep(0.2)
+    deadline = monotonic() + duration_sec
+    sent = 0
+    while monotonic() < deadline:
+        source, destination, operation, parameters = COMMANDS[sent % len(COMMANDS)]
+        monitor_q.put(Event(source, destination, operation, parameters, extra_parameters=monotonic()))
+        sent += 1
+        sleep(command_interval_sec)
+
+    flood.stop()
+    # очереди разбираются до остановки монитора, иначе процесс не сможет
+    # завершиться, пока не передаст в них все отправленные события
+    drain_deadline = monotonic() + 30.0
+    while (flood.backlog() > 0 or sum(map(len, sink.latencies.values())) < sent) \
+            and monotonic() < drain_deadline:
+        sleep(0.05)
+    monitor.stop()
+    monitor.join()
+    sink.stop()
+
+    report = {"scheduling": scheduling, "commands_sent": sent, "telemetry_sent": flood.sent,
+              "telemetry_delivered": sink.telemetry.value}
+    for operation, latencies in sink.latencies.items():
+        latencies_ms = np.array(latencies) * 1000
+        report[operation] = {
+            "delivered": len(latencies_ms),
+            "p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+            "p99_ms": float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else None,
+            "max_ms": float(latencies_ms.max()) if len(latencies_ms) else None,
+        }
+    return report
+
+
+def check_latency(reports: Dict[str, dict]) -> List[str]:
+    """check_latency сравнение p99 задержки команд с полосами приоритета и без них
+
+    Returns:
+        List[str]: нарушения; пустой список, если команды с полосами приоритета
+            доставляются не менее чем в FIFO_SPEEDUP раз быстрее, чем через FIFO
+    """
+    failures = []
+    fifo = reports[SCHEDULING_FIFO]
+    for scheduling in (SCHEDULING_STRICT, SCHEDULING_WEIGHTED):
+        for _, _, operation, _ in COMMANDS:
+            p99, fifo_p99 = reports[scheduling][operation]["p99_ms"], fifo[operation]["p99_ms"]
+            if p99 is None or fifo_p99 is None:
+                failures.append(f"{scheduling}/{operation}: команды не доставлены")
+            elif p99 * FIFO_SPEEDUP > fifo_p99:
+                failures.append(
+                    f"{scheduling}/{operation}: p99 {p99:.2f} мс, у FIFO {fifo_p99:.2f} мс")
+    return failures
+
+
+def main():
+    reports = {}
+    for scheduling in (SCHEDULING_FIFO, SCHEDULING_STRICT, SCHEDULING_WEIGHTED):
+        report = reports[scheduling] = run_load_test(scheduling)
+        print(f"{scheduling}: команд {report['commands_sent']}, телеметрии отправлено "
+              f"{report['telemetry_sent']}, доставлено {report['telemetry_delivered']}")
+        for _, _, operation, _ in COMMANDS:
+            stats = report[operation]
+            if not stats["delivered"]:
+                print(f"  {operation}: ни одна команда не доставлена")
+                continue
+            print(f"  {operation}: доставлено {stats['delivered']}, "
+                  f"p50 {stats['p50_ms']:.2f} мс, p99 {stats['p99_ms']:.2f} мс, "
+                  f"максимум {stats['max_ms']:.2f} мс")
+
+    failures = check_latency(reports)
+    if failures:
+        raise AssertionError("полосы приоритета не сокращают задержку команд: " + "; ".join(failures))
+    print(f"p99 задержки команд с полосами приоритета не менее чем в {FIFO_SPEEDUP:g} раза меньше, чем у FIFO")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,9 @@ from queue import Empty
 from src.system.custom_process import BaseCustomProcess
 from src.system.queues_dir import QueuesDirectory
 from src.system.event_types import Event
-from src.system.config import CRITICALITY_STR, LOG_DEBUG, \
+from src.system.config import CRITICALITY_STR, LOG_DEBUG, LOG_CATEGORY_EVENTS, \
     LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, \
-    OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, SECURITY_MONITOR_QUEUE_NAME
+    OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME
 
 class MyOpticsControl(BaseCustomProcess):
     """ Модуль управления потической аппаратурой """
@@ -49,15 +49,19 @@ class MyOpticsControl(BaseCustomProcess):
                         # В данном примере запрашиваем не очередь отрисовщика, а очередь монитора
                         # безопасности. Он сам отправит отрисовщику наше событие, если запрос
                         # разрешен политика безопасности
-                        q: Queue = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+                        q = self._security_q
                         lat, lon = event.parameters
                         q.put(
-                            Event(
-                                source=self._event_source_name, 
-                                destination=ORBIT_DRAWER_QUEUE_NAME, 
-                                operation='update_photo_map', 
-                                parameters=(lat, lon)))
-                        self._log_message(LOG_DEBUG, f"рисуем снимок ({lat}, {lon})")
+                            self._sign(Event(
+                                source=self._event_source_name,
+                                destination=ORBIT_DRAWER_QUEUE_NAME,
+                                operation='update_photo_map',
+                                parameters=(lat, lon),
+                                # кадр снимка в разделяемой памяти, если камера его сделала
+                                extra_parameters=event.extra_parameters,
+                                satellite_id=event.satellite_id)))
+                        self._log_message(LOG_DEBUG, "рисуем снимок (%s, %s)", lat, lon,
+                                          category=LOG_CATEGORY_EVENTS)
 
             except Empty:
                 break
@@ -66,12 +70,13 @@ class MyOpticsControl(BaseCustomProcess):
     def run(self):
         self._log_message(LOG_INFO, f"модуль управления оптикой активен")
 
-        while self._quit is False:
-            try:
-                self._check_events_q()
-                self._check_control_q()
-            except Exception as e:
-                self._log_message(LOG_ERROR, f"ошибка системы контроля оптики: {e}")
+        super().run()
+
+    def _iteration(self):
+        try:
+            return super()._iteration()
+        except Exception as e:
+            self._log_message(LOG_ERROR, f"ошибка системы контроля оптики: {e}")
 
     
     def _send_photo_request(self):
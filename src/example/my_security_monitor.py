@@ -1,40 +1,90 @@
-from src.system.event_types import Event
+from src.system.event_types import Event, ControlEvent
 from src.system.security_monitor import BaseSecurityMonitor
+from src.system.policy_store import PolicyStore, DecisionCache
 from src.system.security_policy_type import SecurityPolicy
-from src.system.config import LOG_DEBUG, LOG_ERROR, LOG_INFO, OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME
+from src.system.config import LOG_DEBUG, LOG_ERROR, LOG_INFO, OPTICS_CONTROL_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, \
+    EXECUTION_MODE_PROCESS, LOG_CATEGORY_EVENTS
 
 
 class MySecurityMonitor(BaseSecurityMonitor):
     """ класс монитора безопасности """
 
-    def __init__(self, queues_dir, log_level, policies):
-        super().__init__(queues_dir, log_level)
-        self._security_policies = []
+    # максимальное число решений в кэше
+    decision_cache_size = 1024
+
+    def __init__(self, queues_dir, log_level, policies, execution_mode=EXECUTION_MODE_PROCESS,
+                 signing_keys=None, capture_path=None):
+        super().__init__(queues_dir, log_level, execution_mode=execution_mode,
+                         signing_keys=signing_keys, capture_path=capture_path)
+        self._policy_store = PolicyStore()
+        # версия политик в последней контрольной точке
+        self._checkpoint_version = None
+        self._decision_cache = DecisionCache(self.decision_cache_size)
         self._init_security_policies(policies)
-    
+
 
     def _init_security_policies(self, policies):
-        """ инициализация политик безопасности """
-        self._security_policies = policies
-        self._log_message(LOG_INFO, f"изменение политик безопасности: {self._security_policies}")
+        """ инициализация (замена) политик безопасности """
+        policy_set = self._policy_store.reload(policies)
+        # решения по прежним политикам больше не нужны
+        self._decision_cache.clear()
+        self._log_message(
+            LOG_INFO, f"изменение политик безопасности (версия {policy_set.version}): {policies}")
+
+
+    def reload_policies(self, policies):
+        """reload_policies замена политик работающего монитора без его остановки
+
+        Args:
+            policies (list[SecurityPolicy]): новый набор политик
+        """
+        self._control_q.put(ControlEvent(operation="reload_policies", parameters=list(policies)))
+
+
+    def _handle_control(self, request: ControlEvent):
+        if request.operation == "reload_policies":
+            self._log_message(
+                LOG_INFO, f"статистика кэша решений до замены политик: {self._decision_cache.stats()}")
+            self._init_security_policies(request.parameters)
+        else:
+            super()._handle_control(request)
+
+
+    def _component_stats(self) -> dict:
+        stats = super()._component_stats()
+        stats["decision_cache"] = self._decision_cache.stats()
+        return stats
+
+
+    def _get_checkpoint(self):
+        # после перезапуска монитор получит политики, заменённые во время работы
+        policy_set = self._policy_store.current
+        if policy_set.version == self._checkpoint_version:
+            return None
+        self._checkpoint_version = policy_set.version
+        return [SecurityPolicy(*key) for key in policy_set.rules]
+
+
+    def _restore_checkpoint(self, state):
+        self._init_security_policies(state)
 
 
     def _check_event(self, event: Event):
         """ проверка входящих событий """
         self._log_message(
-            LOG_DEBUG, f"проверка события {event}, по умолчанию выполнение запрещено")
+            LOG_DEBUG, "проверка события %s, по умолчанию выполнение запрещено", event,
+            category=LOG_CATEGORY_EVENTS)
 
-        authorized = False
-        request = SecurityPolicy(
-            source=event.source,
-            destination=event.destination,
-            operation=event.operation)
+        policy_set = self._policy_store.current
+        key = (event.source, event.destination, event.operation, policy_set.version)
+        authorized = self._decision_cache.get(key)
+        if authorized is None:
+            authorized = policy_set.allows(event.source, event.destination, event.operation)
+            self._decision_cache.put(key, authorized)
 
-        if request in self._security_policies:
+        if authorized:
             self._log_message(
-                LOG_DEBUG, "событие разрешено политиками, выполняем")
-            authorized = True
-
-        if authorized is False:
+                LOG_DEBUG, "событие разрешено политиками, выполняем", category=LOG_CATEGORY_EVENTS)
+        else:
             self._log_message(LOG_ERROR, f"событие не разрешено политиками безопасности! {event}")
-        return authorized
\ No newline at end of file
+        return authorized
@@ -0,0 +1,176 @@
+from queue import Empty
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.system.custom_process import BaseCustomProcess
+from src.system.queues_dir import QueuesDirectory
+from src.system.event_types import Event
+from src.satellite_control_system.conjunction_screening import Conjunction, advance_states, \
+    predict_states, screen_conjunctions
+from src.system.config import LOG_DEBUG, LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, \
+    EXECUTION_MODE_PROCESS, SATELITE_QUEUE_NAME, CONJUNCTION_CONTROL_QUEUE_NAME, LOG_CATEGORY_EVENTS
+
+# поля телеметрии, из которых берётся состояние спутника
+STATE_FIELDS = ("time", "x", "y", "z", "vx", "vy", "vz")
+
+
+class ConjunctionControl(BaseCustomProcess):
+    """ Поиск опасных сближений спутников
+
+    Положения и скорости спутников приходят по подписке на телеметрию
+    (orbit_telemetry). Раз в screening_period_sec модельного времени
+    последние состояния приводятся к общему моменту, прогнозируются
+    на window_sec вперёд и проверяются на сближения ближе threshold_m
+    (см. conjunction_screening.py). Новые сближения записываются в журнал
+    как ошибки, их число - в показатели компонента.
+    """
+    log_prefix = "[CONJUNCTION]"
+    event_source_name = CONJUNCTION_CONTROL_QUEUE_NAME
+    events_q_name = event_source_name
+
+    # подписка на телеметрию спутника: период выборки (сек. модельного времени)
+    # и число выборок в одном сообщении
+    telemetry_period_sec = 10
+    telemetry_batch_size = 1
+
+    def __init__(
+        self,
+        queues_dir: QueuesDirectory,
+        satellite_ids: Sequence[Optional[str]],
+        log_level: int = DEFAULT_LOG_LEVEL,
+        execution_mode: str = EXECUTION_MODE_PROCESS,
+        threshold_m: float = 5_000.0,
+        window_sec: float = 3_600.0,
+        step_sec: float = 10.0,
+        screening_period_sec: float = 60.0
+    ):
+        """
+        Args:
+            satellite_ids (Sequence[Optional[str]]): проверяемые спутники
+            threshold_m (float): расстояние опасного сближения
+            window_sec (float): окно прогноза
+            step_sec (float): шаг прогноза
+            screening_period_sec (float): период проверки (сек. модельного времени)
+        """
+        super().__init__(
+            log_prefix=ConjunctionControl.log_prefix,
+            queues_dir=queues_dir,
+            events_q_name=ConjunctionControl.events_q_name,
+            event_source_name=ConjunctionControl.event_source_name,
+            log_level=log_level,
+            execution_mode=execution_mode)
+
+        # события телеметрии не требуют мгновенной реакции
+        self._loop_interval_sec = 0.1
+        self._satellite_ids = tuple(satellite_ids)
+        self._threshold_m = threshold_m
+        self._window_sec = window_sec
+        self._step_sec = step_sec
+        self._screening_period_sec = screening_period_sec
+        # последние состояния спутников: модельное время, положение, скорость
+        self._states: Dict[Optional[str], Tuple[float, np.ndarray, np.ndarray]] = {}
+        self._last_screening_sec: Optional[float] = None
+        # сближения последней проверки по парам спутников
+        self._conjunctions: Dict[Tuple, Conjunction] = {}
+        self._screenings = 0
+
+        self._log_message(LOG_INFO, "модуль поиска сближений создан")
+
+    def _send_to_satellites(self, operation: str, parameters=None):
+        for satellite_id in self._satellite_ids:
+            q = self._queues_dir.route(SATELITE_QUEUE_NAME, satellite_id)
+            if q:
+                q.put(
+                    Event(
+                        source=self._event_source_name,
+                        destination=SATELITE_QUEUE_NAME,
+                        operation=operation,
+                        parameters=parameters,
+                        satellite_id=satellite_id))
+
+    def _update_state(self, satellite_id: Optional[str], telemetry: dict):
+        fields = telemetry["fields"]
+        indices = [fields.index(name) for name in STATE_FIELDS]
+        # из пачки нужна только последняя выборка
+        sample = [telemetry["samples"][-1][index] for index in indices]
+        self._states[satellite_id] = (
+            float(sample[0]), np.array(sample[1:4], dtype=np.float64), np.array(sample[4:7], dtype=np.float64))
+
+    def _check_events_q(self):
+        while True:
+            try:
+                event: Event = self._events_q.get_nowait()
+
+                if not isinstance(event, Event):
+                    return
+
+                if event.operation == 'orbit_telemetry' and event.parameters["samples"]:
+                    self._update_state(event.satellite_id, event.parameters)
+
+            except Empty:
+                break
+        self._screen_if_due()
+
+    def _screen_if_due(self):
+        if len(self._states) < 2:
+            return
+        epoch = max(state[0] for state in self._states.values())
+        if self._last_screening_sec is not None \
+                and epoch - self._last_screening_sec < self._screening_period_sec:
+            return
+        self._last_screening_sec = epoch
+        self._screen(epoch)
+
+    def _screen(self, epoch: float):
+        satellite_ids = list(self._states)
+        times, positions, velocities = zip(*(self._states[sid] for sid in satellite_ids))
+        positions, velocities = advance_states(
+            np.array(positions), np.array(velocities), epoch - np.array(times), self._step_sec)
+        times, positions, velocities = predict_states(positions, velocities, self._window_sec, self._step_sec)
+        found = screen_conjunctions(times, positions, velocities, self._threshold_m)
+        self._screenings += 1
+
+        conjunctions = {}
+        for conjunction in found:
+            pair = tuple(sorted(
+                (satellite_ids[conjunction.first], satellite_ids[conjunction.second]), key=str))
+            conjunctions[pair] = conjunction
+            if pair not in self._conjunctions:
+                self._log_message(
+                    LOG_ERROR,
+                    "опасное сближение %s и %s: %.0f м через %.0f сек.",
+                    pair[0], pair[1], conjunction.distance_m, conjunction.time_sec)
+        for pair in self._conjunctions.keys() - conjunctions.keys():
+            self._log_message(LOG_INFO, "сближение %s и %s больше не ожидается", *pair)
+        self._conjunctions = conjunctions
+        self._log_message(
+            LOG_DEBUG, "проверено %s спутников на момент %.0f сек., сближений %s",
+            len(satellite_ids), epoch, len(conjunctions), category=LOG_CATEGORY_EVENTS)
+
+    def _component_stats(self) -> dict:
+        stats = super()._component_stats()
+        stats["satellites"] = len(self._states)
+        stats["screenings"] = self._screenings
+        stats["conjunctions"] = len(self._conjunctions)
+        return stats
+
+    def _iteration(self):
+        try:
+            return super()._iteration()
+        except Exception as e:
+            self._log_message(LOG_ERROR, f"ошибка поиска сближений: {e}")
+
+    def run(self):
+        self._log_message(LOG_INFO, "модуль поиска сближений активен")
+        self._send_to_satellites(
+            "subscribe_telemetry",
+            {
+                "period_sec": self.telemetry_period_sec,
+                "batch_size": self.telemetry_batch_size,
+                "fields": STATE_FIELDS,
+            })
+
+        super().run()
+
+        self._send_to_satellites("unsubscribe_telemetry")
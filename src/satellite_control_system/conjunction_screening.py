@@ -0,0 +1,274 @@
+""" модуль поиска опасных сближений спутников
+
+Проверка всех пар объектов на каждом шаге - O(N^2). Здесь:
+  * advance_states - приведение состояний, полученных в разные моменты,
+    к общему моменту;
+  * predict_states - прогноз положений и скоростей всех объектов на окно
+    времени (интегрирование задачи двух тел, как в симуляторе спутника,
+    сразу для всех объектов);
+  * candidate_pairs - пары точек не дальше radius друг от друга через
+    пространственное хеширование: точки раскладываются по кубическим
+    ячейкам со стороной radius, сравниваются только точки из одной ячейки
+    и 13 соседних (другие 13 соседей учтены симметрично), поэтому время
+    почти линейно по числу объектов;
+  * screen_conjunctions - на каждом шаге прогноза ищутся кандидаты
+    с радиусом, увеличенным на наибольшее относительное смещение за шаг,
+    затем для кандидатов уточняются момент и расстояние наибольшего
+    сближения (относительное движение близких объектов на коротком шаге
+    почти прямолинейно).
+
+Замер на 1 000 и 10 000 объектов: python -m src.satellite_control_system.conjunction_screening
+"""
+from dataclasses import dataclass
+from itertools import product
+from time import perf_counter
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+EARTH_MU = 6.67430e-11 * 5.972e24  # гравитационный параметр земли (м^3/с^2), как в симуляторе
+EARTH_RADIUS = 6.371e6             # м
+
+# смещения 13 соседних ячеек: вторая половина соседей получается перестановкой пары
+_HALF_NEIGHBOURS = np.array(
+    [offset for offset in product((-1, 0, 1), repeat=3) if offset > (0, 0, 0)], dtype=np.int64)
+# бит на координату ячейки в ключе
+_CELL_BITS = 21
+
+
+@dataclass(frozen=True)
+class Conjunction:
+    """ сближение двух объектов """
+    first: int            # индексы объектов, first < second
+    second: int
+    time_sec: float       # момент наибольшего сближения
+    distance_m: float     # расстояние при наибольшем сближении
+
+
+def predict_states(positions: np.ndarray, velocities: np.ndarray,
+                   duration_sec: float, step_sec: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """predict_states прогноз движения объектов на duration_sec
+
+    Args:
+        positions, velocities (np.ndarray): состояния объектов, N x 3 (м, м/с)
+        duration_sec (float): длина окна прогноза
+        step_sec (float): шаг интегрирования и выдачи состояний
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: моменты (T,), положения
+            и скорости (T x N x 3), первый момент - 0 (исходные состояния)
+    """
+    steps = max(int(np.ceil(duration_sec / step_sec)), 1)
+    times = np.linspace(0.0, steps * step_sec, steps + 1)
+    all_positions = np.empty((steps + 1,) + positions.shape)
+    all_velocities = np.empty_like(all_positions)
+    position = all_positions[0] = positions
+    velocity = all_velocities[0] = velocities
+    acceleration = _gravity(position)
+    for index in range(1, steps + 1):
+        # Velocity Verlet, как в Satellite._update_position
+        position = position + velocity * step_sec + 0.5 * acceleration * step_sec ** 2
+        new_acceleration = _gravity(position)
+        velocity = velocity + 0.5 * (acceleration + new_acceleration) * step_sec
+        acceleration = new_acceleration
+        all_positions[index] = position
+        all_velocities[index] = velocity
+    return times, all_positions, all_velocities
+
+
+def advance_states(positions: np.ndarray, velocities: np.ndarray, durations_sec: np.ndarray,
+                   max_step_sec: float) -> Tuple[np.ndarray, np.ndarray]:
+    """advance_states перенос состояний объектов на разное время вперёд
+
+    Состояния из телеметрии разных спутников получены в разные моменты,
+    перед поиском сближений они приводятся к общему моменту.
+
+    Args:
+        positions, velocities (np.ndarray): состояния объектов, N x 3
+        durations_sec (np.ndarray): время переноса каждого объекта, N
+        max_step_sec (float): наибольший шаг интегрирования
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: положения и скорости после переноса
+    """
+    durations_sec = np.asarray(durations_sec, dtype=np.float64)
+    steps = int(np.ceil(durations_sec.max(initial=0.0) / max_step_sec))
+    # одинаковое число шагов, у каждого объекта свой шаг
+    step = (durations_sec / max(steps, 1))[:, None]
+    acceleration = _gravity(positions)
+    for _ in range(steps):
+        positions = positions + velocities * step + 0.5 * acceleration * step ** 2
+        new_acceleration = _gravity(positions)
+        velocities = velocities + 0.5 * (acceleration + new_acceleration) * step
+        acceleration = new_acceleration
+    return positions, velocities
+
+
+def _gravity(positions: np.ndarray) -> np.ndarray:
+    r = np.sqrt(np.einsum("ij,ij->i", positions, positions))
+    return -EARTH_MU / r[:, None] ** 3 * positions
+
+
+def _cell_keys(cells: np.ndarray) -> np.ndarray:
+    return (cells[:, 0] << (2 * _CELL_BITS)) | (cells[:, 1] << _CELL_BITS) | cells[:, 2]
+
+
+def candidate_pairs(points: np.ndarray, radius: float) -> np.ndarray:
+    """candidate_pairs пары точек на расстоянии не больше radius
+
+    Args:
+        points (np.ndarray): точки, N x 3
+        radius (float): наибольшее расстояние
+
+    Returns:
+        np.ndarray: пары индексов (K x 2), в каждой паре первый индекс меньше
+    """
+    if len(points) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    cells = np.floor(points / radius).astype(np.int64)
+    # ячейки сдвигаются так, чтобы у соседей крайних ячеек координаты были неотрицательны
+    cells -= cells.min(axis=0) - 1
+    if cells.max() >= (1 << _CELL_BITS) - 1:
+        raise ValueError("слишком много ячеек: radius мал для размеров области")
+
+    keys = _cell_keys(cells)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    firsts, seconds = [], []
+    for offset in np.vstack(([0, 0, 0], _HALF_NEIGHBOURS)):
+        neighbour_keys = _cell_keys(cells + offset)
+        begin = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+        counts = np.searchsorted(sorted_keys, neighbour_keys, side="right") - begin
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        # все точки соседней ячейки для каждой точки: диапазоны [begin, begin + count)
+        first = np.repeat(np.arange(len(points)), counts)
+        starts = np.cumsum(counts) - counts
+        second = order[np.arange(total) - np.repeat(starts - begin, counts)]
+        if not offset.any():
+            # в своей ячейке каждая пара встречается дважды и с самой собой
+            keep = first < second
+            first, second = first[keep], second[keep]
+        firsts.append(first)
+        seconds.append(second)
+
+    if not firsts:
+        return np.empty((0, 2), dtype=np.int64)
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    delta = points[first] - points[second]
+    close = np.einsum("ij,ij->i", delta, delta) <= radius * radius
+    pairs = np.column_stack((first[close], second[close]))
+    return np.sort(pairs, axis=1)
+
+
+def closest_approach(relative_positions: np.ndarray, relative_velocities: np.ndarray,
+                     duration_sec: float) -> Tuple[np.ndarray, np.ndarray]:
+    """closest_approach наибольшее сближение при прямолинейном относительном движении
+
+    Args:
+        relative_positions, relative_velocities (np.ndarray): K x 3 в начале шага
+        duration_sec (float): длина шага
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: время от начала шага и расстояние
+    """
+    speed2 = np.einsum("ij,ij->i", relative_velocities, relative_velocities)
+    along = np.einsum("ij,ij->i", relative_positions, relative_velocities)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        times = np.where(speed2 > 0, -along / speed2, 0.0)
+    times = np.clip(times, 0.0, duration_sec)
+    closest = relative_positions + relative_velocities * times[:, None]
+    return times, np.sqrt(np.einsum("ij,ij->i", closest, closest))
+
+
+def screen_conjunctions(times: np.ndarray, positions: np.ndarray, velocities: np.ndarray,
+                        threshold_m: float) -> List[Conjunction]:
+    """screen_conjunctions сближения ближе threshold_m на прогнозе predict_states
+
+    Returns:
+        List[Conjunction]: для каждой пары - наибольшее сближение в окне,
+            по возрастанию расстояния
+    """
+    best = {}
+    for index in range(len(times) - 1):
+        step = times[index + 1] - times[index]
+        speeds = np.sqrt(np.einsum("ij,ij->i", velocities[index], velocities[index]))
+        # за шаг расстояние между объектами меняется не больше, чем на сумму их смещений
+        pairs = candidate_pairs(positions[index], threshold_m + 2 * speeds.max() * step)
+        if not len(pairs):
+            continue
+        first, second = pairs[:, 0], pairs[:, 1]
+        offsets, distances = closest_approach(
+            positions[index][second] - positions[index][first],
+            velocities[index][second] - velocities[index][first],
+            step)
+        close = distances <= threshold_m
+        for a, b, offset, distance in zip(
+                first[close].tolist(), second[close].tolist(),
+                offsets[close].tolist(), distances[close].tolist()):
+            if (a, b) not in best or distance < best[(a, b)].distance_m:
+                best[(a, b)] = Conjunction(a, b, float(times[index]) + offset, distance)
+    return sorted(best.values(), key=lambda conjunction: conjunction.distance_m)
+
+
+def random_orbits(count: int, rng: np.random.Generator,
+                  altitudes: Sequence[float] = (500e3, 1200e3)) -> Tuple[np.ndarray, np.ndarray]:
+    """ состояния count объектов на случайных круговых орбитах """
+    radius = EARTH_RADIUS + rng.uniform(*altitudes, count)
+    inclination = rng.uniform(0, np.pi, count)
+    raan = rng.uniform(0, 2 * np.pi, count)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    # базис плоскости орбиты: направление на восходящий узел и перпендикуляр к нему
+    node = np.column_stack((np.cos(raan), np.sin(raan), np.zeros(count)))
+    across = np.column_stack((
+        -np.sin(raan) * np.cos(inclination), np.cos(raan) * np.cos(inclination), np.sin(inclination)))
+    speed = np.sqrt(EARTH_MU / radius)
+    positions = radius[:, None] * (np.cos(angle)[:, None] * node + np.sin(angle)[:, None] * across)
+    velocities = speed[:, None] * (-np.sin(angle)[:, None] * node + np.cos(angle)[:, None] * across)
+    return positions, velocities
+
+
+def _naive_pairs(points: np.ndarray, radius: float) -> int:
+    """ число пар ближе radius полным перебором, построчно для ограничения памяти """
+    count = 0
+    for index in range(len(points) - 1):
+        delta = points[index + 1:] - points[index]
+        count += int((np.einsum("ij,ij->i", delta, delta) <= radius * radius).sum())
+    return count
+
+
+def benchmark(counts: Sequence[int] = (1_000, 10_000), window_sec: float = 600.0,
+              step_sec: float = 10.0, threshold_m: float = 5_000.0, seed: int = 1):
+    """ замер поиска сближений и сравнение с полным перебором пар на одном шаге """
+    rng = np.random.default_rng(seed)
+    for count in counts:
+        positions, velocities = random_orbits(count, rng)
+
+        started = perf_counter()
+        times, all_positions, all_velocities = predict_states(positions, velocities, window_sec, step_sec)
+        predicted = perf_counter() - started
+
+        started = perf_counter()
+        conjunctions = screen_conjunctions(times, all_positions, all_velocities, threshold_m)
+        screened = perf_counter() - started
+
+        radius = threshold_m + 2 * np.sqrt(EARTH_MU / EARTH_RADIUS) * step_sec
+        started = perf_counter()
+        hashed = len(candidate_pairs(positions, radius))
+        hashed_step = perf_counter() - started
+        started = perf_counter()
+        naive = _naive_pairs(positions, radius)
+        naive_step = perf_counter() - started
+
+        print(f"{count} объектов, окно {window_sec:.0f} сек. ({len(times) - 1} шагов): "
+              f"прогноз {predicted * 1000:.0f} мс, поиск {screened * 1000:.0f} мс, "
+              f"сближений {len(conjunctions)}")
+        print(f"  один шаг: хеширование {hashed_step * 1000:.1f} мс, "
+              f"перебор {naive_step * 1000:.1f} мс, пар {hashed} / {naive}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,260 @@
+""" модуль расчёта покрытия земной поверхности снимками
+
+Какая доля района будет снята за ближайшие N часов и когда - по орбитам,
+которые моделирует Satellite:
+  * ground_tracks - трассы спутников на сетке моментов времени. Орбиты
+    круговые, как в симуляторе, поэтому положение считается по углу
+    на орбите сразу для всех моментов и спутников. Долгота - как
+    в Satellite.get_earth_coordinates, без вращения земли; для оценки
+    реального покрытия задаётся earth_rotation_rate=EARTH_ROTATION_RATE;
+  * compute_coverage - полоса захвата камеры (квадрат footprint_deg
+    по широте и долготе вокруг подспутниковой точки, как у снимка Camera)
+    накладывается на растр широта/долгота. Для каждой ячейки копятся
+    первый момент съёмки, число проходов и промежутки между проходами.
+    Моменты обрабатываются порциями по порядку, поэтому память
+    не зависит от длины интервала. Ячейки, центры которых лежат
+    в запрещённых зонах (ZoneIndex), не снимаются и не учитываются.
+
+Проход - подряд идущие моменты сетки, в которые ячейка в полосе захвата;
+промежуток между проходами - от последнего момента одного прохода
+до первого момента следующего.
+
+Замер на сутках модельного времени: python -m src.satellite_control_system.coverage
+"""
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.satellite_control_system.zone_index import ZoneIndex
+from src.system.config import PHOTO_FOOTPRINT_DEG
+
+EARTH_MU = 6.67430e-11 * 5.972e24  # гравитационный параметр земли (м^3/с^2), как в симуляторе
+EARTH_RADIUS = 6.371e6             # м
+EARTH_ROTATION_RATE = 7.2921159e-5  # угловая скорость вращения земли, рад/с
+
+# максимальное число пар ячейка-момент, обрабатываемых за один шаг
+CHUNK_PAIRS = 4_000_000
+
+# орбита в порядке параметров Satellite: (высота, м; угол на орбите, рад;
+# наклонение, рад; долгота восходящего узла, рад)
+SatelliteOrbit = Tuple[float, float, float, float]
+
+
+def ground_tracks(orbits: Sequence[SatelliteOrbit], duration_sec: float, step_sec: float,
+                  earth_rotation_rate: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ground_tracks подспутниковые точки на сетке моментов
+
+    Args:
+        orbits (Sequence[SatelliteOrbit]): орбиты спутников
+        duration_sec (float): длина интервала, сек. модельного времени
+        step_sec (float): шаг сетки
+        earth_rotation_rate (float): угловая скорость вращения земли, рад/с
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: моменты (T,), широты
+            и долготы в градусах (T x K)
+    """
+    orbits = np.asarray(orbits, dtype=np.float64).reshape(-1, 4)
+    altitude, position_angle, inclination, raan = orbits.T
+    times = np.arange(int(np.floor(duration_sec / step_sec)) + 1) * step_sec
+
+    radius = EARTH_RADIUS + altitude
+    mean_motion = np.sqrt(EARTH_MU / radius ** 3)
+    angle = position_angle + times[:, None] * mean_motion
+    # положение на орбите, как в Satellite._compute_position (без множителя радиуса)
+    cos_raan, sin_raan = np.cos(raan), np.sin(raan)
+    x = cos_raan * np.cos(angle) - sin_raan * np.sin(angle) * np.cos(inclination)
+    y = sin_raan * np.cos(angle) + cos_raan * np.sin(angle) * np.cos(inclination)
+    z = np.sin(angle) * np.sin(inclination)
+
+    lats = np.degrees(np.arcsin(np.clip(z, -1.0, 1.0)))
+    lons = np.degrees(np.arctan2(y, x) - earth_rotation_rate * times[:, None])
+    lons = (lons + 180.0) % 360.0 - 180.0
+    return times, lats, lons
+
+
+@dataclass
+class CoverageMap:
+    """ растр покрытия: ячейки по широте (строки) и долготе (столбцы) """
+    lats: np.ndarray               # широты центров строк, градусы
+    lons: np.ndarray               # долготы центров столбцов, градусы
+    step_sec: float
+    duration_sec: float
+    excluded: np.ndarray           # ячейки в запрещённых зонах
+    first_access_sec: np.ndarray   # первый момент съёмки, nan - не снимается
+    passes: np.ndarray             # число проходов
+    max_revisit_sec: np.ndarray    # наибольший промежуток между проходами, nan - меньше двух проходов
+    mean_revisit_sec: np.ndarray   # средний промежуток между проходами
+
+    def _region_mask(self, region: Optional[ZoneIndex]) -> np.ndarray:
+        mask = ~self.excluded
+        if region is not None:
+            lats, lons = np.meshgrid(self.lats, self.lons, indexing="ij")
+            mask &= region.contains(lats.ravel(), lons.ravel()).reshape(mask.shape)
+        return mask
+
+    def fraction(self, until_sec: Optional[float] = None, region: Optional[ZoneIndex] = None) -> float:
+        """fraction доля ячеек района, снятых до until_sec
+
+        Args:
+            until_sec (Optional[float]): момент, None - весь интервал
+            region (Optional[ZoneIndex]): район (зоны, заданные так же, как
+                запрещённые), None - вся земля; ячейки в запрещённых зонах
+                не учитываются
+
+        Returns:
+            float: доля ячеек; ячейки взвешиваются по площади (косинус широты)
+        """
+        mask = self._region_mask(region)
+        until_sec = self.duration_sec if until_sec is None else until_sec
+        covered = mask & (self.first_access_sec <= until_sec)
+        weights = np.broadcast_to(np.cos(np.radians(self.lats))[:, None], mask.shape)
+        total = weights[mask].sum()
+        return float(weights[covered].sum() / total) if total > 0 else 0.0
+
+    def fraction_curve(self, region: Optional[ZoneIndex] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ доля снятых ячеек района к каждому моменту сетки: (моменты, доли) """
+        mask = self._region_mask(region)
+        times = np.arange(int(np.floor(self.duration_sec / self.step_sec)) + 1) * self.step_sec
+        weights = np.broadcast_to(np.cos(np.radians(self.lats))[:, None], mask.shape)
+        total = weights[mask].sum()
+        if total == 0:
+            return times, np.zeros(len(times))
+        first = self.first_access_sec[mask]
+        covered = ~np.isnan(first)
+        steps = np.rint(first[covered] / self.step_sec).astype(np.int64)
+        gained = np.bincount(steps, weights=weights[mask][covered], minlength=len(times))
+        return times, np.cumsum(gained) / total
+
+
+def _swath_offsets(footprint_deg: float, resolution_deg: float) -> np.ndarray:
+    """ смещения ячеек, которые могут попасть в полосу захвата, от ячейки подспутниковой точки """
+    reach = int(np.ceil(footprint_deg / 2 / resolution_deg)) + 1
+    return np.arange(-reach, reach + 1)
+
+
+def compute_coverage(orbits: Sequence[SatelliteOrbit], duration_sec: float = 86_400.0,
+                     step_sec: float = 30.0, resolution_deg: float = 1.0,
+                     footprint_deg: float = PHOTO_FOOTPRINT_DEG,
+                     zones: Optional[ZoneIndex] = None,
+                     earth_rotation_rate: float = 0.0) -> CoverageMap:
+    """compute_coverage покрытие растра снимками спутников
+
+    Args:
+        orbits (Sequence[SatelliteOrbit]): орбиты спутников
+        duration_sec (float): длина интервала, сек. модельного времени
+        step_sec (float): шаг сетки моментов
+        resolution_deg (float): сторона ячейки растра, градусы
+        footprint_deg (float): сторона снимка по широте и долготе, градусы
+        zones (Optional[ZoneIndex]): запрещённые зоны
+        earth_rotation_rate (float): угловая скорость вращения земли, рад/с
+
+    Returns:
+        CoverageMap: растр покрытия
+    """
+    rows, columns = int(round(180 / resolution_deg)), int(round(360 / resolution_deg))
+    cell_lats = -90.0 + (np.arange(rows) + 0.5) * resolution_deg
+    cell_lons = -180.0 + (np.arange(columns) + 0.5) * resolution_deg
+
+    excluded = np.zeros((rows, columns), dtype=bool)
+    if zones is not None and len(zones):
+        grid_lats, grid_lons = np.meshgrid(cell_lats, cell_lons, indexing="ij")
+        excluded = zones.contains(grid_lats.ravel(), grid_lons.ravel()).reshape(rows, columns)
+
+    times, track_lats, track_lons = ground_tracks(orbits, duration_sec, step_sec, earth_rotation_rate)
+    steps = len(times)
+    half = footprint_deg / 2
+
+    # накопители по ячейкам (в номерах моментов сетки)
+    cells = rows * columns
+    first = np.full(cells, -1, dtype=np.int64)
+    last = np.full(cells, -1, dtype=np.int64)
+    passes = np.zeros(cells, dtype=np.int64)
+    max_gap = np.zeros(cells, dtype=np.int64)
+    sum_gap = np.zeros(cells, dtype=np.int64)
+
+    offsets = _swath_offsets(footprint_deg, resolution_deg)
+    chunk = max(1, CHUNK_PAIRS // (len(offsets) ** 2 * track_lats.shape[1]))
+    for start in range(0, steps, chunk):
+        step_index = np.broadcast_to(
+            np.arange(start, min(start + chunk, steps))[:, None], track_lats[start:start + chunk].shape).ravel()
+        lat = track_lats[start:start + chunk].ravel()
+        lon = track_lons[start:start + chunk].ravel()
+
+        # строки и столбцы, центры которых в квадрате снимка
+        row = np.floor((lat + 90.0) / resolution_deg).astype(np.int64)[:, None] + offsets
+        row_ok = (row >= 0) & (row < rows)
+        row_ok &= np.abs(cell_lats[np.clip(row, 0, rows - 1)] - lat[:, None]) <= half
+        column = np.floor((lon + 180.0) / resolution_deg).astype(np.int64)[:, None] + offsets
+        column %= columns
+        lon_distance = np.abs((cell_lons[column] - lon[:, None] + 180.0) % 360.0 - 180.0)
+        column_ok = lon_distance <= half
+
+        hit = row_ok[:, :, None] & column_ok[:, None, :]
+        point, row_offset, column_offset = np.nonzero(hit)
+        cell = row[point, row_offset] * columns + column[point, column_offset]
+        # пары ячейка-момент по возрастанию ячейки, затем момента; несколько спутников
+        # над одной ячейкой в один момент - одна съёмка
+        keys = np.sort(cell * steps + step_index[point])
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        cell, index = keys // steps, keys % steps
+
+        # предыдущий момент съёмки той же ячейки: в этой порции или в прошлых
+        same_cell = np.concatenate(([False], cell[1:] == cell[:-1]))
+        previous = np.where(same_cell, np.roll(index, 1), last[cell])
+        seen = previous >= 0
+        new_pass = ~seen | (index - previous > 1)
+        gap = index - previous
+        revisit = seen & new_pass
+
+        np.add.at(passes, cell[new_pass], 1)
+        np.maximum.at(max_gap, cell[revisit], gap[revisit])
+        np.add.at(sum_gap, cell[revisit], gap[revisit])
+        first[cell[~seen]] = index[~seen]
+        # последний момент каждой ячейки в порции
+        is_last = np.concatenate((cell[1:] != cell[:-1], [True]))
+        last[cell[is_last]] = index[is_last]
+
+    passes[excluded.ravel()] = 0
+    first[excluded.ravel()] = -1
+    revisits = passes - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_gap = np.where(revisits > 0, sum_gap / np.maximum(revisits, 1), np.nan)
+    shape = (rows, columns)
+    return CoverageMap(
+        lats=cell_lats,
+        lons=cell_lons,
+        step_sec=step_sec,
+        duration_sec=float(times[-1]),
+        excluded=excluded,
+        first_access_sec=np.where(first >= 0, first * step_sec, np.nan).reshape(shape),
+        passes=passes.reshape(shape),
+        max_revisit_sec=np.where(revisits > 0, max_gap * step_sec, np.nan).reshape(shape),
+        mean_revisit_sec=(mean_gap * step_sec).reshape(shape))
+
+
+def benchmark(satellite_counts: Sequence[int] = (1, 8), resolution_deg: float = 0.5, seed: int = 1):
+    """ замер расчёта покрытия за сутки модельного времени с вращением земли """
+    from src.satellite_control_system.restricted_zone import RestrictedZone, zones_to_array
+
+    rng = np.random.default_rng(seed)
+    zones = ZoneIndex(zones_to_array([
+        RestrictedZone(1, 40.0, -10.0, 60.0, 30.0), RestrictedZone(2, -20.0, 170.0, 10.0, -170.0)]))
+    for count in satellite_counts:
+        orbits = np.column_stack((
+            rng.uniform(500e3, 1200e3, count), rng.uniform(0, 2 * np.pi, count),
+            rng.uniform(np.radians(50), np.radians(100), count), rng.uniform(0, 2 * np.pi, count)))
+        started = perf_counter()
+        coverage = compute_coverage(orbits, resolution_deg=resolution_deg, zones=zones,
+                                    earth_rotation_rate=EARTH_ROTATION_RATE)
+        elapsed = perf_counter() - started
+        print(f"{count} спутн., растр {resolution_deg}°, сутки с шагом {coverage.step_sec:.0f} сек.: "
+              f"{elapsed * 1000:.0f} мс, покрыто {coverage.fraction() * 100:.1f}%, "
+              f"за 6 ч. {coverage.fraction(6 * 3600) * 100:.1f}%, "
+              f"медиана наибольшего промежутка {np.nanmedian(coverage.max_revisit_sec) / 3600:.1f} ч.")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,15 +1,20 @@
 from queue import Empty
+from typing import Dict, Optional
 
 from src.system.custom_process import BaseCustomProcess
+from src.satellite_control_system.zone_index import ZoneIndex
 from src.system.event_types import Event
+from src.system.frame_pool import FrameHandle
 from src.system.config import (
     LOG_DEBUG,
     LOG_ERROR,
+    LOG_CATEGORY_EVENTS,
     LOG_INFO,
     DEFAULT_LOG_LEVEL,
+    EXECUTION_MODE_PROCESS,
     OPTICS_CONTROL_QUEUE_NAME,
     ORBIT_DRAWER_QUEUE_NAME,
-    SECURITY_MONITOR_QUEUE_NAME
+    TELEMETRY_RECORDER_QUEUE_NAME
 )
 
 
@@ -20,27 +25,36 @@ class OpticsControl(BaseCustomProcess):
     event_source_name = OPTICS_CONTROL_QUEUE_NAME
     events_q_name = OPTICS_CONTROL_QUEUE_NAME
 
-    def __init__(self, queues_dir, log_level=DEFAULT_LOG_LEVEL):
+    # получатели координат снимков, незарегистрированные получатели пропускаются
+    photo_map_destinations = (ORBIT_DRAWER_QUEUE_NAME, TELEMETRY_RECORDER_QUEUE_NAME)
+
+    def __init__(self, queues_dir, log_level=DEFAULT_LOG_LEVEL, execution_mode=EXECUTION_MODE_PROCESS):
         super().__init__(
             log_prefix=self.log_prefix,
             queues_dir=queues_dir,
             events_q_name=self.events_q_name,
             event_source_name=self.event_source_name,
-            log_level=log_level
+            log_level=log_level,
+            execution_mode=execution_mode
         )
 
-        self._zones = []
+        # запрещённые зоны общие для всех спутников
+        self._zones = ZoneIndex()
+        # число запрошенных, но ещё не полученных снимков по спутникам
+        self._pending_photos: Dict[Optional[str], int] = {}
+        # получатели снимков, зарегистрированные после создания модуля, тоже будут найдены
+        self._photo_map_queues = [queues_dir.handle(name) for name in self.photo_map_destinations]
         self._log_message(LOG_INFO, "модуль управления оптикой создан")
 
     def run(self):
         self._log_message(LOG_INFO, "модуль управления оптикой активен")
+        super().run()
 
-        while not self._quit:
-            try:
-                self._check_events_q()
-                self._check_control_q()
-            except Exception as e:
-                self._log_message(LOG_ERROR, f"ошибка OpticsControl: {e}")
+    def _iteration(self):
+        try:
+            return super()._iteration()
+        except Exception as e:
+            self._log_message(LOG_ERROR, f"ошибка OpticsControl: {e}")
 
     def _check_events_q(self):
         while True:
@@ -48,12 +62,14 @@ class OpticsControl(BaseCustomProcess):
                 event: Event = self._events_q.get_nowait()
 
                 if event.operation == "request_photo":
-                    self._request_photo()
+                    self._request_photo(event.satellite_id)
 
                 elif event.operation == "post_photo":
                     lat, lon = event.parameters
+                    self._photo_received(event.satellite_id)
 
                     if self._is_restricted(lat, lon):
+                        self._release_frame(event)
                         self._log_message(
                             LOG_ERROR,
                             f"съёмка ({lat:.2f}, {lon:.2f}) запрещена зоной"
@@ -61,23 +77,31 @@ class OpticsControl(BaseCustomProcess):
                         return
 
                     # Отправляем через монитор безопасности
-                    security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
-                    if security_q:
+                    security_q = self._security_q
+                    destinations = [
+                        handle.name for handle in self._photo_map_queues if handle
+                    ] if security_q else []
+                    frame = self._share_frame(event, len(destinations))
+                    for destination in destinations:
                         security_q.put(
-                            Event(
+                            self._sign(Event(
                                 source=self._event_source_name,
-                                destination=ORBIT_DRAWER_QUEUE_NAME,
+                                destination=destination,
                                 operation="update_photo_map",
-                                parameters=(lat, lon)
-                            )
+                                parameters=(lat, lon),
+                                extra_parameters=frame,
+                                satellite_id=event.satellite_id
+                            ))
                         )
+                    if destinations:
                         self._log_message(
                             LOG_DEBUG,
-                            f"рисуем снимок ({lat:.2f}, {lon:.2f})"
+                            "рисуем снимок (%.2f, %.2f)", lat, lon,
+                            category=LOG_CATEGORY_EVENTS
                         )
 
                 elif event.operation == "sync_zones":
-                    self._zones = event.parameters
+                    self._zones = ZoneIndex.from_payload(event.parameters)
                     self._log_message(
                         LOG_INFO,
                         f"обновлены запрещённые зоны: {len(self._zones)}"
@@ -86,19 +110,47 @@ class OpticsControl(BaseCustomProcess):
             except Empty:
                 break
 
-    def _request_photo(self):
+    def _share_frame(self, event: Event, receivers: int):
+        """ кадр снимка для receivers получателей: по ссылке на каждого получателя """
+        handle = event.extra_parameters
+        if not isinstance(handle, FrameHandle):
+            return None
+        if receivers == 0:
+            self._release_frame(event)
+            return None
+        pool = self._queues_dir.get_frame_pool(handle.pool)
+        if pool is None or (receivers > 1 and not pool.retain(handle, receivers - 1)):
+            return None
+        return handle
+
+    def _photo_received(self, satellite_id: Optional[str]):
+        pending = self._pending_photos.get(satellite_id, 0)
+        if pending > 1:
+            self._pending_photos[satellite_id] = pending - 1
+        else:
+            self._pending_photos.pop(satellite_id, None)
+
+    def _component_stats(self) -> dict:
+        stats = super()._component_stats()
+        stats["pending_photos"] = sum(self._pending_photos.values())
+        stats["satellites_pending"] = len(self._pending_photos)
+        return stats
+
+    def _request_photo(self, satellite_id: Optional[str] = None):
         # Отправляем через монитор безопасности
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination="camera",
                     operation="request_photo",
-                    parameters=None
-                )
+                    parameters=None,
+                    satellite_id=satellite_id
+                ))
             )
+            self._pending_photos[satellite_id] = self._pending_photos.get(satellite_id, 0) + 1
             self._log_message(LOG_DEBUG, "запрос фото отправлен через монитор безопасности")
 
     def _is_restricted(self, lat, lon) -> bool:
-        return any(zone.contains(lat, lon) for zone in self._zones)
+        return self._zones.contains_point(lat, lon)
@@ -1,51 +1,151 @@
+from collections import deque
+from concurrent.futures import Future
 from queue import Empty
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from src.system.custom_process import BaseCustomProcess
 from src.system.queues_dir import QueuesDirectory
 from src.system.event_types import Event, ControlEvent
+from src.satellite_control_system.orbit_planner import Orbit, TransferPlan, TransferPlanner
 from src.system.config import (
     LOG_DEBUG,
     LOG_ERROR,
     LOG_INFO,
     DEFAULT_LOG_LEVEL,
+    EXECUTION_MODE_PROCESS,
     ORBIT_CONTROL_QUEUE_NAME,
-    SECURITY_MONITOR_QUEUE_NAME
+    SATELITE_QUEUE_NAME
 )
 
+# поля телеметрии с параметрами орбиты спутника
+ORBIT_FIELDS = ("altitude", "inclination", "raan")
+
 
 class OrbitControl(BaseCustomProcess):
-    """ Модуль корректировки орбиты """
+    """ Модуль корректировки орбиты
+
+    Для каждой команды смены орбиты оценивается переход с текущей орбиты
+    спутника (см. orbit_planner.py). Оценка выполняется в пуле процессов,
+    рабочий цикл её не ждёт: команды спутника отправляются по порядку,
+    как только готовы их планы. Текущая орбита спутника - начальная
+    (initial_orbits) или подтверждённая самим спутником в телеметрии
+    (подписка на поля ORBIT_FIELDS; подписка и телеметрия проходят через
+    монитор безопасности); пока она неизвестна, команда
+    отправляется без плана. Отправленная команда орбиту не меняет: монитор
+    может её отклонить, поэтому команды, отправленные до подтверждения
+    предыдущей, оцениваются от той же подтверждённой орбиты.
+
+    Операция plan_orbits оценивает переходы на массив орбит-кандидатов
+    (параметры - список орбит) одним заданием пула и записывает в журнал
+    кандидата с наименьшим импульсом; орбита спутника при этом не меняется.
+    """
 
     log_prefix = "[ORBIT]"
     event_source_name = ORBIT_CONTROL_QUEUE_NAME
     events_q_name = event_source_name
 
+    # число процессов пула оценки переходов
+    planner_workers = 2
+
+    # подписка на параметры орбиты спутника: период выборки (сек. модельного времени)
+    # и число выборок в одном сообщении
+    telemetry_period_sec = 30
+    telemetry_batch_size = 1
+
     def __init__(
         self,
         queues_dir: QueuesDirectory,
-        log_level: int = DEFAULT_LOG_LEVEL
+        log_level: int = DEFAULT_LOG_LEVEL,
+        execution_mode: str = EXECUTION_MODE_PROCESS,
+        initial_orbits: Optional[Dict[Optional[str], Orbit]] = None
     ):
+        """
+        Args:
+            initial_orbits (Optional[Dict[Optional[str], Orbit]]): начальные орбиты
+                (высота, наклонение, долгота восходящего узла) по спутникам
+        """
         super().__init__(
             log_prefix=self.log_prefix,
             queues_dir=queues_dir,
             events_q_name=self.events_q_name,
             event_source_name=self.event_source_name,
-            log_level=log_level
+            log_level=log_level,
+            execution_mode=execution_mode
         )
 
+        # подтверждённые орбиты по спутникам: начальные или из телеметрии спутника
+        self._orbits: Dict[Optional[str], Orbit] = {
+            satellite_id: tuple(map(float, orbit))
+            for satellite_id, orbit in (initial_orbits or {}).items()}
+        # команды, ожидающие плана перехода: (текущая орбита, целевая орбита) по спутникам
+        self._transfers: Dict[Optional[str], Deque[Tuple[Optional[Orbit], Orbit]]] = {}
+        # оценки орбит-кандидатов в пуле: (результат, спутник, кандидаты)
+        self._candidate_plans: List[Tuple[Future, Optional[str], np.ndarray]] = []
+        # спутники, на параметры орбиты которых оформлена подписка
+        self._subscribed = set()
+        self._planner = TransferPlanner(workers=self.planner_workers)
         self._log_message(LOG_INFO, "модуль контроля орбиты создан")
 
+    def _init_resources(self):
+        # пул создаётся в рабочем процессе компонента
+        self._planner.start()
+
     def run(self):
         self._log_message(LOG_INFO, "модуль управления орбитой активен")
+        for satellite_id in self._orbits:
+            self._subscribe(satellite_id)
 
-        while not self._quit:
-            try:
-                self._check_events_q()
-                self._check_control_q()
-            except Exception as e:
-                self._log_message(LOG_ERROR, f"ошибка OrbitControl: {e}")
+        super().run()
+
+        for satellite_id in self._subscribed:
+            self._send_to_satellite("unsubscribe_telemetry", satellite_id)
+        self._subscribed.clear()
+        self._planner.close()
+
+    def _send_to_satellite(self, operation: str, satellite_id: Optional[str], parameters=None):
+        # Отправляем через монитор безопасности: подписка определяет, чьим
+        # данным об орбите доверяет планирование
+        security_q = self._security_q
+        if security_q:
+            security_q.put(
+                self._sign(Event(
+                    source=self._event_source_name,
+                    destination=SATELITE_QUEUE_NAME,
+                    operation=operation,
+                    parameters=parameters,
+                    satellite_id=satellite_id)))
+
+    def _subscribe(self, satellite_id: Optional[str]):
+        """ подписка на параметры орбиты спутника, один раз для каждого спутника """
+        if satellite_id in self._subscribed:
+            return
+        self._subscribed.add(satellite_id)
+        self._send_to_satellite(
+            "subscribe_telemetry",
+            satellite_id,
+            {
+                "period_sec": self.telemetry_period_sec,
+                "batch_size": self.telemetry_batch_size,
+                "fields": ORBIT_FIELDS,
+            })
+
+    def _update_orbit(self, satellite_id: Optional[str], telemetry: dict):
+        fields = telemetry["fields"]
+        # из пачки нужна только последняя выборка
+        sample = telemetry["samples"][-1]
+        self._orbits[satellite_id] = tuple(float(sample[fields.index(name)]) for name in ORBIT_FIELDS)
+
+    def _iteration(self):
+        try:
+            busy = super()._iteration()
+            self._send_planned()
+            return busy
+        except Exception as e:
+            self._log_message(LOG_ERROR, f"ошибка OrbitControl: {e}")
 
-    def _check_orbit_bounds(self, altitude, raan, inclination) -> bool:
+    def _check_orbit_bounds(self, altitude, inclination, raan) -> bool:
         return 200_000 <= altitude <= 2_000_000
 
     def _check_events_q(self):
@@ -54,34 +154,128 @@ class OrbitControl(BaseCustomProcess):
                 event: Event = self._events_q.get_nowait()
 
                 if not isinstance(event, Event):
-                    return
+                    break
 
                 if event.operation == "change_orbit":
-                    altitude, raan, inclination = event.parameters
+                    # порядок параметров - как в команде спутника
+                    altitude, inclination, raan = event.parameters
                     self._log_message(
                         LOG_INFO,
                         "получены новые параметры орбиты"
                     )
-                    self._change_orbit(altitude, raan, inclination)
+                    self._change_orbit(altitude, inclination, raan, event.satellite_id)
+
+                elif event.operation == "plan_orbits":
+                    self._plan_orbits(event.parameters, event.satellite_id)
+
+                elif event.operation == "orbit_telemetry":
+                    # орбиту сообщает только сам спутник, на телеметрию которого есть подписка
+                    if event.source != SATELITE_QUEUE_NAME or event.satellite_id not in self._subscribed:
+                        self._log_message(
+                            LOG_ERROR, f"телеметрия от {event.source} (спутник {event.satellite_id}) отклонена")
+                    elif event.parameters["samples"]:
+                        self._update_orbit(event.satellite_id, event.parameters)
 
             except Empty:
                 break
+        # запросы, накопленные за проверку очереди, оцениваются общими пачками
+        self._planner.flush()
+
+    def _component_stats(self) -> dict:
+        stats = super()._component_stats()
+        stats["satellites"] = len(self._orbits)
+        stats["transfer_plans"] = self._planner.stats()
+        stats["candidate_plans"] = len(self._candidate_plans)
+        return stats
 
-    def _change_orbit(self, altitude, raan, inclination):
-        if not self._check_orbit_bounds(altitude, raan, inclination):
+    def _change_orbit(self, altitude, inclination, raan, satellite_id: Optional[str] = None):
+        if not self._check_orbit_bounds(altitude, inclination, raan):
             self._log_message(LOG_ERROR, "орбита вне допустимых границ")
             return
 
+        target = (float(altitude), float(inclination), float(raan))
+        # орбита меняется только по телеметрии спутника, см. _update_orbit
+        current = self._orbits.get(satellite_id)
+        self._subscribe(satellite_id)
+        self._transfers.setdefault(satellite_id, deque()).append((current, target))
+        if current is not None:
+            self._planner.request(current, target)
+
+    def _plan_orbits(self, candidates, satellite_id: Optional[str] = None):
+        """ оценка переходов на орбиты-кандидаты в пуле процессов """
+        current = self._orbits.get(satellite_id)
+        if current is None:
+            self._log_message(LOG_ERROR, "текущая орбита неизвестна, кандидаты не оценены")
+            self._subscribe(satellite_id)
+            return
+        candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 3)
+        candidates = candidates[[self._check_orbit_bounds(*candidate) for candidate in candidates]]
+        if not len(candidates):
+            self._log_message(LOG_ERROR, "нет орбит-кандидатов в допустимых границах")
+            return
+        self._candidate_plans.append(
+            (self._planner.plan_candidates(current, candidates), satellite_id, candidates))
+
+    def _report_candidates(self):
+        """ запись в журнал лучших кандидатов по готовым оценкам """
+        waiting = []
+        for future, satellite_id, candidates in self._candidate_plans:
+            if not future.done():
+                waiting.append((future, satellite_id, candidates))
+                continue
+            try:
+                plans = future.result()
+            except Exception as e:
+                self._log_message(LOG_ERROR, f"ошибка оценки орбит-кандидатов: {e}")
+                continue
+            best = int(np.argmin(plans["delta_v"]))
+            altitude, inclination, raan = candidates[best]
+            self._log_message(
+                LOG_INFO,
+                f"лучшая из {len(candidates)} орбит-кандидатов: высота {altitude:.0f} м, "
+                f"наклонение {inclination:.3f} рад, ДВУ {raan:.3f} рад, "
+                f"импульс {plans['delta_v'][best]:.0f} м/с, {plans['duration_sec'][best] / 60:.0f} мин.")
+        self._candidate_plans = waiting
+
+    def _send_planned(self):
+        """ отправка команд, планы которых готовы, в порядке их получения """
+        for error in self._planner.poll():
+            self._log_message(LOG_ERROR, f"ошибка оценки перехода: {error}")
+        self._report_candidates()
+
+        for satellite_id in list(self._transfers):
+            transfers = self._transfers[satellite_id]
+            while transfers:
+                current, target = transfers[0]
+                plan = None
+                if current is not None:
+                    plan = self._planner.cached(current, target)
+                    if plan is None and self._planner.pending(current, target):
+                        break
+                transfers.popleft()
+                self._send_change_orbit(target, plan, satellite_id)
+            if not transfers:
+                del self._transfers[satellite_id]
+
+    def _send_change_orbit(self, target: Orbit, plan: Optional[TransferPlan], satellite_id: Optional[str]):
+        if plan is not None:
+            self._log_message(
+                LOG_INFO,
+                f"план перехода: импульс {plan.delta_v:.0f} м/с "
+                f"(поворот плоскости {plan.delta_v_plane:.0f} м/с), {plan.duration_sec / 60:.0f} мин.")
+
         # Отправляем через монитор безопасности
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination="satellite",
                     operation="change_orbit",
-                    parameters=[altitude, raan, inclination]
-                )
+                    parameters=list(target),
+                    extra_parameters=plan,
+                    satellite_id=satellite_id
+                ))
             )
             self._log_message(
                 LOG_INFO,
@@ -0,0 +1,218 @@
+""" модуль планирования перехода между круговыми орбитами
+
+Оценка манёвра - гомановский переход с поворотом плоскости орбиты:
+  * первый импульс на внутренней орбите переводит спутник на эллипс перехода;
+  * второй импульс на внешней орбите, где скорость меньше, одновременно
+    скругляет орбиту и поворачивает её плоскость на угол между плоскостями
+    текущей и целевой орбит (комбинированный импульс по теореме косинусов);
+  * длительность - половина периода эллипса перехода.
+
+plan_transfers оценивает переходы с одной орбиты сразу на массив целевых
+орбит операциями numpy. TransferPlanner выполняет оценку в пуле процессов
+и хранит готовые планы в кэше с ключом (текущая орбита, целевая орбита);
+массивы орбит-кандидатов (plan_candidates) оцениваются в пуле целиком
+и в кэш не попадают.
+
+Орбита задаётся так же, как в команде change_orbit спутника:
+(высота, м; наклонение, рад; долгота восходящего узла, рад).
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_MU = 6.67430e-11 * 5.972e24  # гравитационный параметр земли (м^3/с^2), как в симуляторе
+EARTH_RADIUS = 6.371e6             # м
+
+# (высота, наклонение, долгота восходящего узла)
+Orbit = Tuple[float, float, float]
+
+
+@dataclass(frozen=True)
+class TransferPlan:
+    """ оценка перехода между орбитами """
+    delta_v: float          # суммарный импульс, м/с
+    delta_v_plane: float    # доля импульса на поворот плоскости, м/с
+    plane_angle: float      # угол между плоскостями орбит, рад
+    duration_sec: float     # длительность перехода, сек.
+
+
+def plan_transfers(current: Orbit, targets: np.ndarray) -> Dict[str, np.ndarray]:
+    """plan_transfers оценка переходов с орбиты current на каждую из орбит targets
+
+    Args:
+        current (Orbit): текущая орбита
+        targets (np.ndarray): целевые орбиты, массив N x 3
+
+    Returns:
+        Dict[str, np.ndarray]: массивы длины N с полями TransferPlan
+    """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    altitude, inclination, raan = current
+    r1 = EARTH_RADIUS + altitude
+    r2 = EARTH_RADIUS + targets[:, 0]
+
+    # угол между плоскостями - угол между нормалями орбит
+    cos_angle = np.cos(inclination) * np.cos(targets[:, 1]) \
+        + np.sin(inclination) * np.sin(targets[:, 1]) * np.cos(targets[:, 2] - raan)
+    plane_angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
+
+    r_inner = np.minimum(r1, r2)
+    r_outer = np.maximum(r1, r2)
+    semi_major = (r_inner + r_outer) / 2
+    v_inner = np.sqrt(EARTH_MU / r_inner)
+    v_outer = np.sqrt(EARTH_MU / r_outer)
+    # скорости на эллипсе перехода в перигее и апогее
+    v_perigee = np.sqrt(EARTH_MU * (2 / r_inner - 1 / semi_major))
+    v_apogee = np.sqrt(EARTH_MU * (2 / r_outer - 1 / semi_major))
+
+    delta_v_inner = np.abs(v_perigee - v_inner)
+    delta_v_outer_coplanar = np.abs(v_outer - v_apogee)
+    delta_v_outer = np.sqrt(
+        v_apogee ** 2 + v_outer ** 2 - 2 * v_apogee * v_outer * np.cos(plane_angle))
+
+    return {
+        "delta_v": delta_v_inner + delta_v_outer,
+        # без поворота плоскости разность - только ошибка округления
+        "delta_v_plane": np.maximum(delta_v_outer - delta_v_outer_coplanar, 0.0),
+        "plane_angle": plane_angle,
+        "duration_sec": np.pi * np.sqrt(semi_major ** 3 / EARTH_MU),
+    }
+
+
+def plan_transfer(current: Orbit, target: Orbit) -> TransferPlan:
+    """ оценка одного перехода """
+    plans = plan_transfers(current, np.array([target]))
+    return TransferPlan(**{name: float(values[0]) for name, values in plans.items()})
+
+
+class TransferPlanner:
+    """ оценка переходов в пуле процессов с кэшем планов
+
+    Запросы копятся до flush() и отправляются в пул одним вызовом
+    plan_transfers на каждую текущую орбиту; небольшие пачки считаются
+    на месте, так как передача в пул дороже самой оценки. Готовые планы
+    забираются poll() без ожидания.
+    """
+
+    def __init__(self, workers: int = 2, cache_size: int = 1024, inline_batch_size: int = 8):
+        """
+        Args:
+            workers (int): число процессов пула
+            cache_size (int): наибольшее число планов в кэше (LRU)
+            inline_batch_size (int): пачки меньше этого размера считаются
+                в вызывающем потоке
+        """
+        self._workers = workers
+        self._cache_size = cache_size
+        self._inline_batch_size = inline_batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[Tuple[Orbit, Orbit], TransferPlan]" = OrderedDict()
+        # запрошенные, но ещё не отправленные цели по текущим орбитам
+        self._batches: Dict[Orbit, List[Orbit]] = {}
+        # отправленные в пул пачки и их ключи
+        self._futures: List[Tuple[Future, Orbit, List[Orbit]]] = []
+        self._pending = set()
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """ создание пула, в процессе, где будет работать планировщик """
+        self._executor = ProcessPoolExecutor(max_workers=self._workers)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def cached(self, current: Orbit, target: Orbit) -> Optional[TransferPlan]:
+        key = (current, target)
+        plan = self._cache.get(key)
+        if plan is None:
+            return None
+        self._cache.move_to_end(key)
+        return plan
+
+    def pending(self, current: Orbit, target: Orbit) -> bool:
+        """ план запрошен, но ещё не готов """
+        return (current, target) in self._pending
+
+    def request(self, current: Orbit, target: Orbit):
+        """ запрос плана, если его нет в кэше и он ещё не запрошен """
+        key = (current, target)
+        if key in self._cache:
+            self.hits += 1
+            return
+        if key in self._pending:
+            return
+        self.misses += 1
+        self._pending.add(key)
+        self._batches.setdefault(current, []).append(target)
+
+    def plan_candidates(self, current: Orbit, targets: np.ndarray) -> Future:
+        """plan_candidates оценка переходов на массив орбит-кандидатов одним заданием пула
+
+        Args:
+            current (Orbit): текущая орбита
+            targets (np.ndarray): орбиты-кандидаты, массив N x 3
+
+        Returns:
+            Future: результат plan_transfers; небольшой массив оценивается
+                на месте и результат готов сразу
+        """
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+        if self._executor is None or len(targets) < self._inline_batch_size:
+            future = Future()
+            try:
+                future.set_result(plan_transfers(current, targets))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._executor.submit(plan_transfers, current, targets)
+
+    def flush(self):
+        """ отправка накопленных запросов на оценку """
+        batches, self._batches = self._batches, {}
+        for current, targets in batches.items():
+            if self._executor is None or len(targets) < self._inline_batch_size:
+                self._store(current, targets, plan_transfers(current, np.array(targets)))
+            else:
+                future = self._executor.submit(plan_transfers, current, np.array(targets))
+                self._futures.append((future, current, targets))
+
+    def poll(self) -> List[BaseException]:
+        """poll перенос готовых результатов пула в кэш
+
+        Returns:
+            List[BaseException]: ошибки оценки; планы с ошибкой больше
+                не ожидаются (pending() - False)
+        """
+        errors = []
+        waiting = []
+        for future, current, targets in self._futures:
+            if not future.done():
+                waiting.append((future, current, targets))
+                continue
+            try:
+                self._store(current, targets, future.result())
+            except Exception as e:
+                errors.append(e)
+                self._pending.difference_update((current, target) for target in targets)
+        self._futures = waiting
+        return errors
+
+    def _store(self, current: Orbit, targets: List[Orbit], plans: Dict[str, np.ndarray]):
+        for index, target in enumerate(targets):
+            key = (current, target)
+            self._pending.discard(key)
+            self._cache[key] = TransferPlan(
+                **{name: float(values[index]) for name, values in plans.items()})
+            self._cache.move_to_end(key)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._cache), "hits": self.hits, "misses": self.misses,
+                "in_flight": len(self._pending)}
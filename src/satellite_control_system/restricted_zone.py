@@ -1,10 +1,15 @@
 from dataclasses import dataclass
+from typing import Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
 
 @dataclass
 class RestrictedZone:
     """ Описание зоны на карте, в которой запрещены снимки.
         Прямоугольная зона, заданная двумя точками:
-        (lat_bot_left, lon_bot_left) и (lat_top_right, lon_top_right)
+        (lat_bot_left, lon_bot_left) и (lat_top_right, lon_top_right).
+        Если lon_bot_left > lon_top_right, зона пересекает антимеридиан
+        и продолжается от 180 до -180 градусов долготы.
     """
 
     lat_bot_left: float
@@ -14,10 +19,10 @@ class RestrictedZone:
     zone_id: int
 
     def __init__(self, zone_id, lat_bot_left, lon_bot_left, lat_top_right, lon_top_right):
-        if lat_bot_left >= lat_top_right or lon_bot_left >= lon_top_right:
+        if lat_bot_left >= lat_top_right or lon_bot_left == lon_top_right:
             raise Exception(
                 "Некорректные координаты зоны, "
-                "первая точка должна быть ниже и левее второй."
+                "первая точка должна быть ниже второй и не совпадать с ней по долготе."
             )
 
         self.zone_id = zone_id
@@ -28,7 +33,271 @@ class RestrictedZone:
 
     def contains(self, lat: float, lon: float) -> bool:
         """ Проверяет, находится ли точка внутри запрещённой зоны """
-        return (
-            self.lat_bot_left <= lat <= self.lat_top_right and
-            self.lon_bot_left <= lon <= self.lon_top_right
-        )
+        if not self.lat_bot_left <= lat <= self.lat_top_right:
+            return False
+        if self.wraps_antimeridian:
+            return lon >= self.lon_bot_left or lon <= self.lon_top_right
+        return self.lon_bot_left <= lon <= self.lon_top_right
+
+    @property
+    def wraps_antimeridian(self) -> bool:
+        return self.lon_bot_left > self.lon_top_right
+
+
+@dataclass
+class PolygonZone:
+    """ Многоугольная зона, в которой запрещены снимки.
+        Вершины (lat, lon) перечисляются в порядке обхода, многоугольник
+        замыкается автоматически. Соседние вершины соединяются кратчайшим
+        путём по долготе, так что зона может пересекать антимеридиан.
+    """
+
+    zone_id: int
+    vertices: List[Tuple[float, float]]
+
+    def __init__(self, zone_id, vertices: Sequence[Tuple[float, float]]):
+        vertices = [(float(lat), float(lon)) for lat, lon in vertices]
+        if len(vertices) < 3 or not all(
+                -90 <= lat <= 90 and -180 <= lon <= 180 for lat, lon in vertices):
+            raise Exception(
+                "Некорректные координаты зоны, "
+                "нужно не менее трёх вершин в пределах карты."
+            )
+
+        self.zone_id = zone_id
+        self.vertices = vertices
+
+    def contains(self, lat: float, lon: float) -> bool:
+        """ Проверяет, находится ли точка внутри запрещённой зоны """
+        from src.satellite_control_system.zone_index import ZoneIndex
+
+        return ZoneIndex(polygon_vertices=polygons_to_array([self])).contains_point(lat, lon)
+
+
+Zone = Union[RestrictedZone, PolygonZone]
+
+
+# запись зоны в двоичном виде фиксированной ширины (журнал, снимок, sync_zones)
+ZONE_DTYPE = np.dtype([
+    ("zone_id", "<i8"),
+    ("lat_bot_left", "<f8"),
+    ("lon_bot_left", "<f8"),
+    ("lat_top_right", "<f8"),
+    ("lon_top_right", "<f8"),
+])
+
+
+# вершина многоугольной зоны, вершины одной зоны идут подряд в порядке обхода
+POLYGON_VERTEX_DTYPE = np.dtype([
+    ("zone_id", "<i8"),
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+])
+
+
+def polygons_to_array(zones: Iterable[PolygonZone]) -> np.ndarray:
+    """ список многоугольных зон в массив вершин POLYGON_VERTEX_DTYPE """
+    return np.array(
+        [(zone.zone_id, lat, lon) for zone in zones for lat, lon in zone.vertices],
+        dtype=POLYGON_VERTEX_DTYPE)
+
+
+def polygons_from_array(vertices: np.ndarray) -> List[PolygonZone]:
+    """ массив вершин POLYGON_VERTEX_DTYPE в список многоугольных зон """
+    if len(vertices) == 0:
+        return []
+    ids = vertices["zone_id"]
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    return [
+        PolygonZone(int(ids[start]), zip(polygon["lat"].tolist(), polygon["lon"].tolist()))
+        for start, polygon in zip(starts, np.split(vertices, starts[1:]))
+    ]
+
+
+def zones_to_array(zones: Iterable[RestrictedZone]) -> np.ndarray:
+    """ список зон в массив записей ZONE_DTYPE """
+    return np.array(
+        [(zone.zone_id, zone.lat_bot_left, zone.lon_bot_left,
+          zone.lat_top_right, zone.lon_top_right) for zone in zones],
+        dtype=ZONE_DTYPE)
+
+
+def as_zone_array(zones) -> np.ndarray:
+    """ массив записей ZONE_DTYPE из массива записей, списка RestrictedZone
+    или таблицы строк (zone_id, lat_bot_left, lon_bot_left, lat_top_right, lon_top_right)
+    """
+    if isinstance(zones, np.ndarray) and zones.dtype.names:
+        return zones.astype(ZONE_DTYPE, copy=False)
+    if not isinstance(zones, np.ndarray):
+        zones = list(zones)
+        if all(isinstance(zone, RestrictedZone) for zone in zones):
+            return zones_to_array(zones)
+
+    table = np.asarray(zones, dtype=np.float64).reshape(-1, len(ZONE_DTYPE.names))
+    records = np.empty(len(table), dtype=ZONE_DTYPE)
+    for column, name in enumerate(ZONE_DTYPE.names):
+        records[name] = table[:, column]
+    return records
+
+
+def read_zones(path: str) -> np.ndarray:
+    """read_zones чтение каталога зон из файла
+
+    Args:
+        path (str): файл .npy с массивом записей ZONE_DTYPE или CSV со столбцами
+            zone_id, lat_bot_left, lon_bot_left, lat_top_right, lon_top_right
+            (строка заголовка необязательна)
+
+    Returns:
+        np.ndarray: записи зон ZONE_DTYPE
+    """
+    if path.endswith(".npy"):
+        return as_zone_array(np.load(path))
+
+    with open(path) as f:
+        first_line = f.readline()
+    try:
+        [float(value) for value in first_line.split(",")]
+        header_lines = 0
+    except ValueError:
+        header_lines = 1
+
+    return as_zone_array(np.loadtxt(path, delimiter=",", skiprows=header_lines, ndmin=2))
+
+
+def invalid_zones(zones: np.ndarray) -> np.ndarray:
+    """invalid_zones проверка записей зон
+
+    Args:
+        zones (np.ndarray): записи зон ZONE_DTYPE
+
+    Returns:
+        np.ndarray: маска некорректных записей: координаты вне допустимых
+            пределов, нижняя точка не ниже верхней, совпадающие долготы
+            (зоны с lon_bot_left > lon_top_right пересекают антимеридиан)
+            или повторяющийся идентификатор
+    """
+    lat1, lon1 = zones["lat_bot_left"], zones["lon_bot_left"]
+    lat2, lon2 = zones["lat_top_right"], zones["lon_top_right"]
+    with np.errstate(invalid="ignore"):
+        invalid = ~(
+            (-90 <= lat1) & (lat1 < lat2) & (lat2 <= 90) &
+            (-180 <= lon1) & (lon1 <= 180) & (-180 <= lon2) & (lon2 <= 180) & (lon1 != lon2))
+
+    ids = zones["zone_id"]
+    _, first, counts = np.unique(ids, return_index=True, return_counts=True)
+    duplicated = np.ones(len(zones), dtype=bool)
+    duplicated[first[counts == 1]] = False
+    return invalid | duplicated
+
+
+def zone_from_record(record) -> RestrictedZone:
+    return RestrictedZone(
+        int(record["zone_id"]),
+        float(record["lat_bot_left"]), float(record["lon_bot_left"]),
+        float(record["lat_top_right"]), float(record["lon_top_right"]))
+
+
+class ZoneTable:
+    """ набор запрещённых зон
+
+    Прямоугольные зоны хранятся в массиве записей ZONE_DTYPE: зоны идут подряд
+    в начале массива, удаление переносит последнюю зону на место удалённой,
+    поэтому добавление и удаление не зависят от числа зон, а весь набор
+    передаётся и сохраняется одним массивом без преобразований.
+    Многоугольные зоны хранятся отдельно, их обычно немного.
+    """
+
+    def __init__(self, records: np.ndarray = None, polygon_vertices: np.ndarray = None):
+        records = np.empty(0, dtype=ZONE_DTYPE) if records is None else records
+        self._records = np.array(records, dtype=ZONE_DTYPE)
+        self._size = len(self._records)
+        # номер строки по идентификатору зоны, строится при первом обращении,
+        # чтобы восстановленный набор можно было опубликовать сразу
+        self._rows_index = None
+        self._polygons = {}
+        if polygon_vertices is not None:
+            for zone in polygons_from_array(polygon_vertices):
+                self._polygons[zone.zone_id] = zone
+
+    @property
+    def _rows(self) -> dict:
+        if self._rows_index is None:
+            ids = self._records["zone_id"][:self._size].tolist()
+            self._rows_index = dict(zip(ids, range(self._size)))
+        return self._rows_index
+
+    def __len__(self) -> int:
+        return self._size + len(self._polygons)
+
+    def __contains__(self, zone_id: int) -> bool:
+        return zone_id in self._polygons or zone_id in self._rows
+
+    @property
+    def array(self) -> np.ndarray:
+        """ записи прямоугольных зон (представление, меняется вместе с набором) """
+        return self._records[:self._size]
+
+    def polygon_vertices(self) -> np.ndarray:
+        """ вершины многоугольных зон, записи POLYGON_VERTEX_DTYPE """
+        return polygons_to_array(self._polygons.values())
+
+    def payload(self) -> dict:
+        """ копия всего набора для передачи в событиях sync_zones и draw_restricted_zones
+
+        Подпись события охватывает оба массива целиком, вместе с dtype и формой
+        (см. src/system/event_signing.py).
+        """
+        return {"rectangles": self.array.copy(), "polygons": self.polygon_vertices()}
+
+    def get(self, zone_id: int) -> Zone:
+        if zone_id in self._polygons:
+            return self._polygons[zone_id]
+        return zone_from_record(self._records[self._rows[zone_id]])
+
+    def zones(self) -> List[Zone]:
+        return [zone_from_record(record) for record in self.array] + list(self._polygons.values())
+
+    def _reserve(self, size: int):
+        if size > len(self._records):
+            grown = np.empty(max(16, 2 * self._size, size), dtype=ZONE_DTYPE)
+            grown[:self._size] = self._records[:self._size]
+            self._records = grown
+
+    def add(self, zone: Zone):
+        if isinstance(zone, PolygonZone):
+            self._polygons[zone.zone_id] = zone
+            return
+
+        self._reserve(self._size + 1)
+        self._records[self._size] = (
+            zone.zone_id, zone.lat_bot_left, zone.lon_bot_left,
+            zone.lat_top_right, zone.lon_top_right)
+        self._rows[zone.zone_id] = self._size
+        self._size += 1
+
+    def extend(self, zones: np.ndarray):
+        """ добавление массива новых прямоугольных зон (идентификаторы не должны повторяться) """
+        start = self._size
+        self._reserve(start + len(zones))
+        self._records[start:start + len(zones)] = zones
+        self._size = start + len(zones)
+        if self._rows_index is not None:
+            self._rows_index.update(
+                zip(zones["zone_id"].tolist(), range(start, self._size)))
+
+    def contains_any(self, zone_ids: np.ndarray) -> np.ndarray:
+        """ маска идентификаторов, уже занятых зонами набора """
+        return np.isin(zone_ids, self.array["zone_id"]) | \
+            np.isin(zone_ids, np.fromiter(self._polygons, dtype=np.int64, count=len(self._polygons)))
+
+    def remove(self, zone_id: int):
+        if self._polygons.pop(zone_id, None) is not None:
+            return
+
+        row = self._rows.pop(zone_id)
+        last = self._size - 1
+        if row != last:
+            self._records[row] = self._records[last]
+            self._rows[int(self._records[row]["zone_id"])] = row
+        self._size = last
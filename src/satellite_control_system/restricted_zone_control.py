@@ -1,36 +1,123 @@
 from queue import Empty
+from time import perf_counter
+from typing import Optional
 
 from src.system.custom_process import BaseCustomProcess
 from src.system.event_types import Event
 from src.system.config import (
     ORBIT_DRAWER_QUEUE_NAME,
     OPTICS_CONTROL_QUEUE_NAME,
-    SECURITY_MONITOR_QUEUE_NAME,
     LOG_INFO,
-    DEFAULT_LOG_LEVEL
+    LOG_ERROR,
+    DEFAULT_LOG_LEVEL,
+    EXECUTION_MODE_PROCESS
 )
-from src.satellite_control_system.restricted_zone import RestrictedZone
+from src.satellite_control_system.restricted_zone import RestrictedZone, PolygonZone, Zone, ZoneTable, \
+    zones_to_array, as_zone_array, invalid_zones
+from src.satellite_control_system.zone_journal import ZoneJournal
 
 
 class RestrictedZoneControl(BaseCustomProcess):
     """ Модуль управления запрещёнными зонами """
 
-    def __init__(self, queues_dir, log_level=DEFAULT_LOG_LEVEL):
+    def __init__(self, queues_dir, log_level=DEFAULT_LOG_LEVEL, execution_mode=EXECUTION_MODE_PROCESS,
+                 storage_dir: Optional[str] = None):
+        """
+        Args:
+            storage_dir (Optional[str]): каталог журнала зон; если задан, зоны
+                сохраняются на диск и восстанавливаются при запуске
+        """
         super().__init__(
             log_prefix="[ZONE]",
             queues_dir=queues_dir,
             events_q_name="restricted_zone_control",
             event_source_name="restricted_zone_control",
-            log_level=log_level
+            log_level=log_level,
+            execution_mode=execution_mode
         )
-        self._zones: dict[int, RestrictedZone] = {}
+        self._zones = ZoneTable()
+        self._storage_dir = storage_dir
+        self._journal: Optional[ZoneJournal] = None
+        # набор зон изменился после последней контрольной точки
+        self._zones_changed = False
+
+    def _init_resources(self):
+        if self._storage_dir is None:
+            return
+
+        started = perf_counter()
+        self._journal = ZoneJournal(self._storage_dir)
+        self._zones = self._journal.load()
+        self._log_message(
+            LOG_INFO,
+            f"восстановлено зон: {len(self._zones)} за {(perf_counter() - started) * 1000:.1f} мс")
+
+        if len(self._zones):
+            self._publish_zones()
+
+    def _get_checkpoint(self):
+        # с журналом на диске зоны восстанавливаются из него
+        if self._journal is not None or not self._zones_changed:
+            return None
+        self._zones_changed = False
+        return self._zones.payload()
+
+    def _restore_checkpoint(self, state: dict):
+        self._zones = ZoneTable(state["rectangles"], state["polygons"])
+        self._log_message(LOG_INFO, f"восстановлено зон из контрольной точки: {len(self._zones)}")
+
+    def _publish_zones(self):
+        """ отправка всего набора зон отрисовщику и OpticsControl одним событием каждому """
+        security_q = self._security_q
+        if security_q:
+            security_q.put(
+                self._sign(Event(
+                    source=self._event_source_name,
+                    destination=ORBIT_DRAWER_QUEUE_NAME,
+                    operation="draw_restricted_zones",
+                    parameters=self._zones.payload()
+                ))
+            )
+            self._sync_zones(security_q)
+
+    def _sync_zones(self, security_q):
+        # Отправляем через монитор безопасности: синхронизация зон с OpticsControl
+        security_q.put(
+            self._sign(Event(
+                source=self._event_source_name,
+                destination=OPTICS_CONTROL_QUEUE_NAME,
+                operation="sync_zones",
+                parameters=self._zones.payload()
+            ))
+        )
+
+    def _record_add(self, zone: Zone):
+        if self._journal is None:
+            return
+        if isinstance(zone, PolygonZone):
+            self._journal.append_add_polygon(zone)
+        else:
+            self._journal.append_add(zones_to_array([zone]))
+        self._compact_journal()
+
+    def _record_remove(self, zone_id: int):
+        if self._journal is None:
+            return
+        self._journal.append_remove([zone_id])
+        self._compact_journal()
+
+    def _compact_journal(self):
+        if self._journal.needs_compaction():
+            self._journal.compact(self._zones)
+            self._log_message(LOG_INFO, f"снимок зон сохранён: {len(self._zones)}")
 
     def run(self):
         self._log_message(LOG_INFO, "RestrictedZoneControl запущен")
 
-        while not self._quit:
-            self._check_events_q()
-            self._check_control_q()
+        super().run()
+
+        if self._journal is not None:
+            self._journal.close()
 
     def _check_events_q(self):
         while True:
@@ -43,44 +130,73 @@ class RestrictedZoneControl(BaseCustomProcess):
                 elif event.operation == "remove_zone":
                     self._remove_zone(event)
 
+                elif event.operation == "import_zones":
+                    self._import_zones(event)
+
             except Empty:
                 break
 
     def _add_zone(self, event: Event):
-        zone_id, lat1, lon1, lat2, lon2 = event.parameters
+        # (id, lat1, lon1, lat2, lon2) - прямоугольник, (id, [(lat, lon), ...]) - многоугольник
+        if len(event.parameters) == 2:
+            zone_id, vertices = event.parameters
+        else:
+            zone_id, lat1, lon1, lat2, lon2 = event.parameters
 
         if zone_id in self._zones:
             self._log_message(LOG_INFO, f"зона {zone_id} уже существует")
             return
 
-        zone = RestrictedZone(zone_id, lat1, lon1, lat2, lon2)
-        self._zones[zone_id] = zone
+        if len(event.parameters) == 2:
+            zone = PolygonZone(zone_id, vertices)
+        else:
+            zone = RestrictedZone(zone_id, lat1, lon1, lat2, lon2)
+        self._zones.add(zone)
+        self._zones_changed = True
+        self._record_add(zone)
 
         # Отправляем через монитор безопасности: отрисовка зоны
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination=ORBIT_DRAWER_QUEUE_NAME,
                     operation="draw_restricted_zone",
                     parameters=zone
-                )
+                ))
             )
 
-        # Отправляем через монитор безопасности: синхронизация зон с OpticsControl
         if security_q:
-            security_q.put(
-                Event(
-                    source=self._event_source_name,
-                    destination=OPTICS_CONTROL_QUEUE_NAME,
-                    operation="sync_zones",
-                    parameters=list(self._zones.values())
-                )
-            )
+            self._sync_zones(security_q)
 
         self._log_message(LOG_INFO, f"добавлена зона {zone_id}")
 
+    def _import_zones(self, event: Event):
+        """ добавление каталога зон одной транзакцией: все зоны или ни одной """
+        try:
+            zones = as_zone_array(event.parameters)
+        except (TypeError, ValueError) as e:
+            self._log_message(LOG_ERROR, f"некорректный каталог зон: {e}")
+            return
+
+        rejected = invalid_zones(zones) | self._zones.contains_any(zones["zone_id"])
+        if rejected.any():
+            self._log_message(
+                LOG_ERROR,
+                f"каталог зон отклонён: некорректных или уже существующих зон {int(rejected.sum())}, "
+                f"например {zones['zone_id'][rejected][:5].tolist()}")
+            return
+
+        self._zones.extend(zones)
+        self._zones_changed = True
+        if self._journal is not None:
+            self._journal.append_add(zones)
+            self._compact_journal()
+        self._publish_zones()
+
+        self._log_message(LOG_INFO, f"импортировано зон: {len(zones)}, всего {len(self._zones)}")
+
     def _remove_zone(self, event: Event):
         zone_id = event.parameters
 
@@ -88,29 +204,24 @@ class RestrictedZoneControl(BaseCustomProcess):
             self._log_message(LOG_INFO, f"зона {zone_id} не найдена")
             return
 
-        del self._zones[zone_id]
+        self._zones.remove(zone_id)
+        self._zones_changed = True
+        self._record_remove(zone_id)
 
         # Отправляем через монитор безопасности: очистка зоны
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination=ORBIT_DRAWER_QUEUE_NAME,
                     operation="clear_restricted_zone",
                     parameters=zone_id
-                )
+                ))
             )
 
         # Отправляем через монитор безопасности: синхронизация зон
         if security_q:
-            security_q.put(
-                Event(
-                    source=self._event_source_name,
-                    destination=OPTICS_CONTROL_QUEUE_NAME,
-                    operation="sync_zones",
-                    parameters=list(self._zones.values())
-                )
-            )
+            self._sync_zones(security_q)
 
         self._log_message(LOG_INFO, f"удалена зона {zone_id}")
\ No newline at end of file
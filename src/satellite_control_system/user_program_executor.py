@@ -1,12 +1,13 @@
 from queue import Empty
 
 from src.system.custom_process import BaseCustomProcess
+from src.satellite_control_system.restricted_zone import read_zones, as_zone_array
 from src.system.event_types import Event
 from src.system.config import (
     LOG_INFO,
     LOG_ERROR,
     DEFAULT_LOG_LEVEL,
-    SECURITY_MONITOR_QUEUE_NAME
+    EXECUTION_MODE_PROCESS
 )
 
 
@@ -15,22 +16,22 @@ class UserProgramExecutor(BaseCustomProcess):
     Исполнитель пользовательских программ.
     """
 
-    def __init__(self, queues_dir, permissions, log_level=DEFAULT_LOG_LEVEL):
+    def __init__(self, queues_dir, permissions, log_level=DEFAULT_LOG_LEVEL,
+                 execution_mode=EXECUTION_MODE_PROCESS):
         super().__init__(
             log_prefix="[USER]",
             queues_dir=queues_dir,
             events_q_name="user_program",
             event_source_name="user_program",
-            log_level=log_level
+            log_level=log_level,
+            execution_mode=execution_mode
         )
         self._permissions = permissions
         self._log_message(LOG_INFO, "модуль пользователя создан")
 
     def run(self):
         self._log_message(LOG_INFO, "исполнитель пользовательских программ запущен")
-        while not self._quit:
-            self._check_events_q()
-            self._check_control_q()
+        super().run()
 
     def _check_events_q(self):
         while True:
@@ -39,50 +40,55 @@ class UserProgramExecutor(BaseCustomProcess):
                 command = event.operation
                 params = event.parameters
 
+                # орбита и снимки относятся к спутнику события, зоны общие
                 if command == "ORBIT":
-                    self._handle_orbit(params)
+                    self._handle_orbit(params, event.satellite_id)
                 elif command == "MAKE_PHOTO":
-                    self._handle_photo()
+                    self._handle_photo(event.satellite_id)
                 elif command == "ADD_ZONE":
                     self._handle_add_zone(params)
                 elif command == "REMOVE_ZONE":
                     self._handle_remove_zone(params)
+                elif command == "IMPORT_ZONES":
+                    self._handle_import_zones(params)
 
             except Empty:
                 break
 
-    def _handle_orbit(self, params):
+    def _handle_orbit(self, params, satellite_id=None):
         if "orbit" not in self._permissions:
             self._log_message(LOG_ERROR, "нет прав на изменение орбиты")
             return
 
         # Отправляем через монитор безопасности
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination="orbit_control",
                     operation="change_orbit",
-                    parameters=params
-                )
+                    parameters=params,
+                    satellite_id=satellite_id
+                ))
             )
 
-    def _handle_photo(self):
+    def _handle_photo(self, satellite_id=None):
         if "photo" not in self._permissions:
             self._log_message(LOG_ERROR, "нет прав на создание снимков")
             return
 
         # Отправляем через монитор безопасности
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination="camera",
                     operation="request_photo",
-                    parameters=None
-                )
+                    parameters=None,
+                    satellite_id=satellite_id
+                ))
             )
 
     def _handle_add_zone(self, params):
@@ -91,15 +97,15 @@ class UserProgramExecutor(BaseCustomProcess):
             return
 
         # Отправляем через монитор безопасности
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination="restricted_zone_control",
                     operation="add_zone",
                     parameters=params
-                )
+                ))
             )
 
     def _handle_remove_zone(self, params):
@@ -108,13 +114,37 @@ class UserProgramExecutor(BaseCustomProcess):
             return
 
         # Отправляем через монитор безопасности
-        security_q = self._queues_dir.get_queue(SECURITY_MONITOR_QUEUE_NAME)
+        security_q = self._security_q
         if security_q:
             security_q.put(
-                Event(
+                self._sign(Event(
                     source=self._event_source_name,
                     destination="restricted_zone_control",
                     operation="remove_zone",
                     parameters=params
-                )
+                ))
+            )
+
+    def _handle_import_zones(self, params):
+        """ params - путь к файлу каталога (CSV или .npy) или массив записей зон """
+        if "zones" not in self._permissions:
+            self._log_message(LOG_ERROR, "нет прав на редактирование зон")
+            return
+
+        try:
+            zones = read_zones(params) if isinstance(params, str) else as_zone_array(params)
+        except (OSError, TypeError, ValueError) as e:
+            self._log_message(LOG_ERROR, f"не удалось прочитать каталог зон: {e}")
+            return
+
+        # Отправляем через монитор безопасности весь каталог одним событием
+        security_q = self._security_q
+        if security_q:
+            security_q.put(
+                self._sign(Event(
+                    source=self._event_source_name,
+                    destination="restricted_zone_control",
+                    operation="import_zones",
+                    parameters=zones
+                ))
             )
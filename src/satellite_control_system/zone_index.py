@@ -0,0 +1,163 @@
+""" модуль векторизованной проверки попадания точек в запрещённые зоны
+
+ZoneIndex проверяет сразу много точек против всех прямоугольных
+и многоугольных зон средствами NumPy:
+  * прямоугольник с lon_bot_left > lon_top_right пересекает антимеридиан
+    и занимает долготы [lon_bot_left, 180] и [-180, lon_top_right];
+  * многоугольник проверяется лучом (чётность числа пересечений рёбер).
+    Долготы вершин разворачиваются так, чтобы соседние вершины отличались
+    не более чем на 180°, поэтому многоугольник, пересекающий антимеридиан,
+    задаётся обычным обходом вершин, а точка проверяется с долготами lon и lon + 360.
+"""
+from typing import Tuple
+
+import numpy as np
+
+from src.satellite_control_system.restricted_zone import ZONE_DTYPE, POLYGON_VERTEX_DTYPE
+
+# максимальное число пар точка-ребро (точка-прямоугольник), обрабатываемых за один шаг
+CHUNK_PAIRS = 4_000_000
+
+
+def unwrap_longitudes(lons: np.ndarray) -> np.ndarray:
+    """ долготы вершин без скачков на антимеридиане, первая вершина в [-180, 180] """
+    steps = np.diff(lons)
+    steps = (steps + 180.0) % 360.0 - 180.0
+    return np.concatenate(([lons[0]], lons[0] + np.cumsum(steps)))
+
+
+def polygon_edges(vertices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """polygon_edges рёбра всех многоугольников
+
+    Args:
+        vertices (np.ndarray): записи POLYGON_VERTEX_DTYPE, вершины каждого
+            многоугольника идут подряд в порядке обхода
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: массив рёбер (E, 4) со столбцами
+            lat1, lon1, lat2, lon2 и начала рёбер каждого многоугольника в нём
+            (рёбра многоугольника идут подряд)
+    """
+    if len(vertices) == 0:
+        return np.empty((0, 4)), np.empty(0, dtype=np.int64)
+
+    ids = vertices["zone_id"]
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    ends = np.append(starts[1:], len(vertices))
+
+    lats = vertices["lat"].astype(np.float64)
+    lons = vertices["lon"].astype(np.float64)
+    for start, end in zip(starts, ends):
+        polygon_lons = unwrap_longitudes(lons[start:end])
+        # сдвиг на целое число оборотов, чтобы самая западная вершина была в [-180, 180)
+        polygon_lons -= 360.0 * np.floor((polygon_lons.min() + 180.0) / 360.0)
+        lons[start:end] = polygon_lons
+
+    # следующая вершина в обходе, для последней - первая вершина многоугольника
+    following = np.arange(1, len(vertices) + 1)
+    following[ends - 1] = starts
+    edges = np.column_stack((lats, lons, lats[following], lons[following]))
+    return edges, starts
+
+
+class ZoneIndex:
+    """ индекс запрещённых зон для векторизованной проверки точек """
+
+    def __init__(self, rectangles: np.ndarray = None, polygon_vertices: np.ndarray = None):
+        """
+        Args:
+            rectangles (np.ndarray): прямоугольные зоны, записи ZONE_DTYPE
+            polygon_vertices (np.ndarray): вершины многоугольных зон,
+                записи POLYGON_VERTEX_DTYPE
+        """
+        if rectangles is None:
+            rectangles = np.empty(0, dtype=ZONE_DTYPE)
+        if polygon_vertices is None:
+            polygon_vertices = np.empty(0, dtype=POLYGON_VERTEX_DTYPE)
+
+        self._rect_lat1 = np.asarray(rectangles["lat_bot_left"], dtype=np.float64)
+        self._rect_lat2 = np.asarray(rectangles["lat_top_right"], dtype=np.float64)
+        self._rect_lon1 = np.asarray(rectangles["lon_bot_left"], dtype=np.float64)
+        self._rect_lon2 = np.asarray(rectangles["lon_top_right"], dtype=np.float64)
+        self._rect_wraps = self._rect_lon1 > self._rect_lon2
+        self._rect_ids = np.asarray(rectangles["zone_id"])
+
+        self._edges, self._edge_starts = polygon_edges(polygon_vertices)
+        self._polygon_ids = np.asarray(polygon_vertices["zone_id"])[self._edge_starts]
+
+    @classmethod
+    def from_payload(cls, payload) -> "ZoneIndex":
+        """ индекс по содержимому события sync_zones
+
+        payload - словарь {"rectangles": ..., "polygons": ...} (см. ZoneTable.payload)
+        либо только прямоугольные зоны в любом виде, который принимает as_zone_array
+        """
+        from src.satellite_control_system.restricted_zone import as_zone_array
+
+        if isinstance(payload, dict):
+            return cls(as_zone_array(payload.get("rectangles", [])), payload.get("polygons"))
+        return cls(as_zone_array(payload))
+
+    def __len__(self) -> int:
+        return len(self._rect_ids) + len(self._polygon_ids)
+
+    def _rectangles_hit(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        lat, lon = lats[:, None], lons[:, None]
+        in_lat = (self._rect_lat1 <= lat) & (lat <= self._rect_lat2)
+        after_left = self._rect_lon1 <= lon
+        before_right = lon <= self._rect_lon2
+        in_lon = np.where(self._rect_wraps, after_left | before_right, after_left & before_right)
+        return in_lat & in_lon
+
+    def _polygons_hit(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        lat1, lon1, lat2, lon2 = (self._edges[:, column] for column in range(4))
+        lat = lats[:, None]
+        crosses_lat = (lat1 > lat) != (lat2 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing_lon = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+
+        inside = np.zeros((len(lats), len(self._edge_starts)), dtype=bool)
+        # точка проверяется и со сдвигом на оборот для многоугольников за антимеридианом
+        for shift in (0.0, 360.0):
+            crossings = crosses_lat & ((lons[:, None] + shift) < crossing_lon)
+            counts = np.add.reduceat(crossings, self._edge_starts, axis=1)
+            inside |= (counts % 2) == 1
+        return inside
+
+    def hits(self, lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+        """hits попадание каждой точки в каждую зону
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: матрицы (точки x прямоугольники)
+                и (точки x многоугольники)
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        rectangles = self._rectangles_hit(lats, lons)
+        polygons = self._polygons_hit(lats, lons) if len(self._edges) \
+            else np.zeros((len(lats), 0), dtype=bool)
+        return rectangles, polygons
+
+    def contains(self, lats, lons) -> np.ndarray:
+        """contains попадание точек хотя бы в одну зону
+
+        Args:
+            lats, lons: широты и долготы точек (скаляры или массивы одной длины)
+
+        Returns:
+            np.ndarray: маска точек, лежащих в запрещённых зонах
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        result = np.zeros(len(lats), dtype=bool)
+        if len(self) == 0:
+            return result
+
+        chunk = max(1, CHUNK_PAIRS // max(len(self._rect_ids), len(self._edges), 1))
+        for start in range(0, len(lats), chunk):
+            rectangles, polygons = self.hits(lats[start:start + chunk], lons[start:start + chunk])
+            result[start:start + chunk] = rectangles.any(axis=1) | polygons.any(axis=1)
+        return result
+
+    def contains_point(self, lat: float, lon: float) -> bool:
+        return bool(self.contains(lat, lon)[0])
@@ -0,0 +1,200 @@
+""" модуль хранения запрещённых зон на диске
+
+Состояние хранится в файлах каталога:
+  * снимок - массив записей ZONE_DTYPE прямоугольных зон и массив вершин
+    POLYGON_VERTEX_DTYPE многоугольных зон в формате .npy, читаются через
+    отображение файла в память (np.load с mmap_mode);
+  * журнал - добавляемые в конец двоичные записи фиксированной ширины
+    об изменениях после снимка. Запись JOURNAL_DTYPE описывает добавление
+    прямоугольной зоны или удаление зоны, многоугольная зона записывается
+    блоком подряд идущих записей POLYGON_JOURNAL_DTYPE (по одной на вершину)
+    той же ширины.
+
+При загрузке к снимку применяется последнее изменение журнала для каждой зоны,
+поэтому повторное применение журнала к уже обновлённому снимку ничего
+не меняет: сбой между записью снимка и очисткой журнала не портит состояние.
+"""
+import os
+from typing import Iterable
+
+import numpy as np
+
+from src.satellite_control_system.restricted_zone import ZONE_DTYPE, POLYGON_VERTEX_DTYPE, \
+    PolygonZone, ZoneTable, polygons_to_array
+
+JOURNAL_ADD = 1
+JOURNAL_REMOVE = 2
+JOURNAL_ADD_POLYGON = 3
+
+JOURNAL_DTYPE = np.dtype([("op", "<u8")] + ZONE_DTYPE.descr)
+POLYGON_JOURNAL_DTYPE = np.dtype([
+    ("op", "<u8"),
+    ("zone_id", "<i8"),
+    ("vertex", "<i8"),   # номер вершины в обходе
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("reserved", "<f8"),  # дополнение до ширины JOURNAL_DTYPE
+])
+
+SNAPSHOT_FILE_NAME = "zones.snapshot.npy"
+POLYGONS_SNAPSHOT_FILE_NAME = "zones.polygons.npy"
+JOURNAL_FILE_NAME = "zones.journal"
+
+
+class ZoneJournal:
+    """ журнал изменений запрещённых зон со снимками """
+
+    def __init__(self, directory: str, compact_every: int = 10_000, fsync: bool = False):
+        """
+        Args:
+            directory (str): каталог хранилища, создаётся при необходимости
+            compact_every (int): число записей журнала, после которого
+                состояние сохраняется снимком, а журнал очищается
+            fsync (bool): сбрасывать ли записи на диск сразу (медленнее,
+                но изменения переживают отключение питания)
+        """
+        self._directory = directory
+        self._snapshot_path = os.path.join(directory, SNAPSHOT_FILE_NAME)
+        self._polygons_path = os.path.join(directory, POLYGONS_SNAPSHOT_FILE_NAME)
+        self._journal_path = os.path.join(directory, JOURNAL_FILE_NAME)
+        self.compact_every = compact_every
+        self._fsync = fsync
+        self._journal_file = None
+        self._journal_records = 0
+
+    @property
+    def journal_records(self) -> int:
+        return self._journal_records
+
+    def _read_journal(self) -> np.ndarray:
+        if not os.path.exists(self._journal_path):
+            return np.empty(0, dtype=JOURNAL_DTYPE)
+        size = os.path.getsize(self._journal_path)
+        count, tail = divmod(size, JOURNAL_DTYPE.itemsize)
+        if tail:
+            # недописанная при сбое запись, отбрасываем её
+            os.truncate(self._journal_path, count * JOURNAL_DTYPE.itemsize)
+        if count == 0:
+            return np.empty(0, dtype=JOURNAL_DTYPE)
+        return np.memmap(self._journal_path, dtype=JOURNAL_DTYPE, mode="r", shape=(count,))
+
+    @staticmethod
+    def _load_snapshot(path: str, dtype: np.dtype) -> np.ndarray:
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+        return np.empty(0, dtype=dtype)
+
+    def load(self) -> ZoneTable:
+        """load восстановление набора зон из снимка и журнала
+
+        Returns:
+            ZoneTable: набор зон
+        """
+        os.makedirs(self._directory, exist_ok=True)
+        snapshot = self._load_snapshot(self._snapshot_path, ZONE_DTYPE)
+        polygons = self._load_snapshot(self._polygons_path, POLYGON_VERTEX_DTYPE)
+
+        journal = self._read_journal()
+        self._journal_records = len(journal)
+        if len(journal) == 0:
+            return ZoneTable(snapshot, polygons)
+
+        # блок вершин многоугольника считается одним изменением: берём его первую запись
+        polygon_records = journal.view(POLYGON_JOURNAL_DTYPE)
+        is_vertex = journal["op"] == JOURNAL_ADD_POLYGON
+        changes = ~is_vertex | (polygon_records["vertex"] == 0)
+        change_rows = np.flatnonzero(changes)
+
+        # последнее изменение для каждой зоны
+        reversed_ids = journal["zone_id"][change_rows][::-1]
+        changed_ids, first_reversed = np.unique(reversed_ids, return_index=True)
+        latest_rows = change_rows[len(change_rows) - 1 - first_reversed]
+        latest_ops = journal["op"][latest_rows]
+
+        added = journal[latest_rows[latest_ops == JOURNAL_ADD]]
+        zones = np.empty(len(added), dtype=ZONE_DTYPE)
+        for name in ZONE_DTYPE.names:
+            zones[name] = added[name]
+        kept = snapshot[~np.isin(snapshot["zone_id"], changed_ids)]
+
+        # вершины выбранных блоков: блок - записи от его первой записи до следующего изменения
+        block_of_row = np.cumsum(changes) - 1
+        latest_blocks = np.searchsorted(change_rows, latest_rows[latest_ops == JOURNAL_ADD_POLYGON])
+        vertex_rows = is_vertex & np.isin(block_of_row, latest_blocks)
+        added_vertices = polygon_records[vertex_rows]
+        vertices = np.empty(len(added_vertices), dtype=POLYGON_VERTEX_DTYPE)
+        for name in POLYGON_VERTEX_DTYPE.names:
+            vertices[name] = added_vertices[name]
+        kept_vertices = polygons[~np.isin(polygons["zone_id"], changed_ids)]
+
+        return ZoneTable(
+            np.concatenate((kept, zones)),
+            np.concatenate((kept_vertices, vertices)))
+
+    def _append(self, records: np.ndarray):
+        if self._journal_file is None:
+            self._journal_file = open(self._journal_path, "ab")
+        self._journal_file.write(records.tobytes())
+        self._journal_file.flush()
+        if self._fsync:
+            os.fsync(self._journal_file.fileno())
+        self._journal_records += len(records)
+
+    def append_add(self, zones: np.ndarray):
+        """ запись о добавлении прямоугольных зон (массив ZONE_DTYPE) одним блоком """
+        records = np.zeros(len(zones), dtype=JOURNAL_DTYPE)
+        records["op"] = JOURNAL_ADD
+        for name in ZONE_DTYPE.names:
+            records[name] = zones[name]
+        self._append(records)
+
+    def append_add_polygon(self, zone: PolygonZone):
+        """ запись о добавлении многоугольной зоны блоком записей её вершин """
+        vertices = polygons_to_array([zone])
+        records = np.zeros(len(vertices), dtype=POLYGON_JOURNAL_DTYPE)
+        records["op"] = JOURNAL_ADD_POLYGON
+        records["zone_id"] = zone.zone_id
+        records["vertex"] = np.arange(len(vertices))
+        records["lat"] = vertices["lat"]
+        records["lon"] = vertices["lon"]
+        self._append(records)
+
+    def append_remove(self, zone_ids: Iterable[int]):
+        """ запись об удалении зон """
+        zone_ids = np.fromiter(zone_ids, dtype="<i8")
+        records = np.zeros(len(zone_ids), dtype=JOURNAL_DTYPE)
+        records["op"] = JOURNAL_REMOVE
+        records["zone_id"] = zone_ids
+        self._append(records)
+
+    def needs_compaction(self) -> bool:
+        return self._journal_records >= self.compact_every
+
+    @staticmethod
+    def _write_snapshot(path: str, array: np.ndarray):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def compact(self, zones: ZoneTable):
+        """compact сохраняет снимок текущего набора зон и очищает журнал
+
+        Args:
+            zones (ZoneTable): все зоны
+        """
+        self._write_snapshot(
+            self._snapshot_path, np.ascontiguousarray(zones.array, dtype=ZONE_DTYPE))
+        self._write_snapshot(self._polygons_path, zones.polygon_vertices())
+
+        self.close()
+        with open(self._journal_path, "wb"):
+            pass
+        self._journal_records = 0
+
+    def close(self):
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
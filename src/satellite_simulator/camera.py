@@ -1,12 +1,19 @@
 from multiprocessing import Queue, Process
 from queue import Empty
+from typing import Optional
+
+import numpy as np
 
 from src.system.custom_process import BaseCustomProcess
 from src.system.queues_dir import QueuesDirectory
 from src.system.event_types import Event, ControlEvent
-from src.system.config import CRITICALITY_STR, LOG_DEBUG, \
+from src.system.frame_pool import FrameHandle
+from src.satellite_simulator.map_tiles import MapTilePyramid
+from src.system.config import CRITICALITY_STR, LOG_DEBUG, LOG_CATEGORY_EVENTS, LOG_CATEGORY_STATS, \
     LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, \
-    CAMERA_QUEUE_NAME, SATELITE_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, OPTICS_CONTROL_QUEUE_NAME
+    CAMERA_QUEUE_NAME, SATELITE_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, OPTICS_CONTROL_QUEUE_NAME, \
+    EXECUTION_MODE_PROCESS, PHOTO_FRAME_POOL_NAME, PHOTO_FRAME_SIZE_PX, PHOTO_FOOTPRINT_DEG, \
+    MAP_TILE_SIZE_PX, MAP_TILE_CACHE_SIZE, WORLD_MAP_PATH
 
 
 class Camera(BaseCustomProcess):
@@ -17,28 +24,64 @@ class Camera(BaseCustomProcess):
 
     def __init__(self,
                  queues_dir: QueuesDirectory,
-                 log_level: int):
+                 log_level: int,
+                 execution_mode: str = EXECUTION_MODE_PROCESS):
         super().__init__(
             log_prefix=Camera.log_prefix,
             queues_dir=queues_dir,
             events_q_name=Camera.events_q_name,
             event_source_name=Camera.event_source_name,
-            log_level=log_level)
+            log_level=log_level,
+            execution_mode=execution_mode)
+        # пирамида тайлов карты и пул кадров создаются в рабочем процессе, см. _init_resources
+        self._map_tiles = None
+        self._frame_pool = None
+        self._optics_q = queues_dir.handle(OPTICS_CONTROL_QUEUE_NAME)
         self._log_message(LOG_INFO, "симулятор камеры создан")
 
-    def _check_control_q(self):
-        """ Проверка наличия управляющий команд  """
+    def _init_resources(self):
+        self._frame_pool = self._queues_dir.get_frame_pool(PHOTO_FRAME_POOL_NAME)
+        if self._frame_pool is None:
+            # без пула снимки передаются только координатами
+            return
         try:
-            request: ControlEvent = self._control_q.get_nowait()
-            self._log_message(
-                LOG_DEBUG, f"проверяем запрос {request}")
-            if not isinstance(request, ControlEvent):
-                return
-            if request.operation == 'stop':
-                self._quit = True
-        except Empty:
-            # никаких команд не поступило, ну и ладно
-            pass
+            from PIL import Image
+            # та же карта, что у отрисовщика
+            self._map_tiles = MapTilePyramid(
+                np.array(Image.open(WORLD_MAP_PATH)), MAP_TILE_SIZE_PX, MAP_TILE_CACHE_SIZE)
+        except Exception as e:
+            self._log_message(LOG_ERROR, f"не удалось загрузить карту для снимков: {e}")
+
+    def _take_photo(self, lat: float, lon: float) -> Optional[FrameHandle]:
+        """_take_photo собирает снимок с центром в (lat, lon) из тайлов карты в ячейку пула кадров
+
+        Returns:
+            Optional[FrameHandle]: ссылка на кадр или None, если снимок не сделан
+        """
+        if self._map_tiles is None:
+            return None
+
+        size = PHOTO_FRAME_SIZE_PX
+        map_shape = self._map_tiles.level_shape(0)
+        allocated = self._frame_pool.allocate((size, size) + map_shape[2:], np.uint8)
+        if allocated is None:
+            self._log_message(LOG_ERROR, "нет свободных ячеек для снимка")
+            return None
+        handle, frame = allocated
+
+        self._map_tiles.photo(lat, lon, PHOTO_FOOTPRINT_DEG, size, out=frame)
+        if self._log_enabled(LOG_DEBUG, LOG_CATEGORY_STATS):
+            self._log_message(LOG_DEBUG, f"кэш тайлов карты: {self._map_tiles.stats()}",
+                              category=LOG_CATEGORY_STATS)
+        return handle
+
+    def _component_stats(self) -> dict:
+        stats = super()._component_stats()
+        if self._map_tiles is not None:
+            stats["map_tiles"] = self._map_tiles.stats()
+        if self._frame_pool is not None:
+            stats["free_frame_slots"] = self._frame_pool.free_slots()
+        return stats
 
     def _check_events_q(self):
         """ Проверка наличия команд """
@@ -51,32 +94,30 @@ class Camera(BaseCustomProcess):
                 
                 match event.operation:
                     case 'request_photo':
+                        # координаты снимка сообщает спутник, для которого он запрошен
+                        satellite_q = self._queues_dir.route(SATELITE_QUEUE_NAME, event.satellite_id)
                         request = Event(
                             source=self._event_source_name,
                             destination=SATELITE_QUEUE_NAME,
                             operation="post_camera_coords",
-                            parameters=None)
-                        sat_q: Queue = self._queues_dir.get_queue(SATELITE_QUEUE_NAME)
-                        sat_q.put(request)
+                            parameters=None,
+                            satellite_id=event.satellite_id)
+                        satellite_q.put(request)
                         self._log_message(LOG_DEBUG, "запрашиваем координаты снимка")
                     case 'camera_update':
-                        q: Queue = self._queues_dir.get_queue(OPTICS_CONTROL_QUEUE_NAME)
                         lat, lon = event.parameters
-                        q.put(
+                        self._optics_q.put(
                             Event(
                                 source=self._event_source_name, 
                                 destination=OPTICS_CONTROL_QUEUE_NAME, 
                                 operation='post_photo', 
-                                parameters=(lat, lon)))
-                        self._log_message(LOG_DEBUG, f"создаем снимок ({lat}, {lon})")
+                                parameters=(lat, lon),
+                                extra_parameters=self._take_photo(lat, lon),
+                                satellite_id=event.satellite_id))
+                        self._log_message(LOG_DEBUG, "создаем снимок (%s, %s)", lat, lon,
+                                          category=LOG_CATEGORY_EVENTS)
             except Empty:
                 break
 
-    def run(self):
-        while self._quit is False:
-            self._check_events_q()
-            self._check_control_q()
-    
-
     def stop(self):
         self._control_q.put(ControlEvent(operation="stop"))
\ No newline at end of file
@@ -0,0 +1,124 @@
+""" модуль пирамиды тайлов карты земли для синтеза снимков камеры
+
+Пирамида строится один раз из карты в равнопромежуточной проекции:
+уровень 0 - исходная карта, каждый следующий уровень вдвое меньше предыдущего
+(усреднение блоков 2x2). Уровень делится на квадратные тайлы tile_px x tile_px.
+Снимок собирается из тайлов уровня, разрешение которого не хуже требуемого,
+поэтому число читаемых тайлов и пикселей зависит только от охвата и размера
+снимка, а не от размера карты. Тайлы, нужные соседним снимкам вдоль трассы,
+берутся из кэша (LRU), ключ тайла - (уровень, x, y).
+"""
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class MapTilePyramid:
+    """ пирамида тайлов карты с кэшем тайлов """
+
+    def __init__(self, world_map: np.ndarray, tile_px: int = 256, cache_tiles: int = 64):
+        """
+        Args:
+            world_map (np.ndarray): карта (высота x ширина [x каналы]), строки
+                от 90° до -90° широты, столбцы от -180° до 180° долготы
+            tile_px (int): сторона тайла, пикс.
+            cache_tiles (int): максимальное число тайлов в кэше
+        """
+        self.tile_px = tile_px
+        self.cache_tiles = cache_tiles
+        self._levels = [world_map]
+        while min(self._levels[-1].shape[:2]) >= 2 * tile_px:
+            self._levels.append(self._downsample(self._levels[-1]))
+
+        self._tiles: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _downsample(image: np.ndarray) -> np.ndarray:
+        """ уменьшение вдвое усреднением блоков 2x2 """
+        height, width = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+        image = image[:height, :width]
+        # сумма четырёх прореженных копий быстрее свёртки по осям блоков
+        accumulator = np.uint32 if np.issubdtype(image.dtype, np.integer) else np.float64
+        total = image[0::2, 0::2].astype(accumulator)
+        total += image[1::2, 0::2]
+        total += image[0::2, 1::2]
+        total += image[1::2, 1::2]
+        return (total / 4).astype(image.dtype)
+
+    @property
+    def levels_count(self) -> int:
+        return len(self._levels)
+
+    def level_shape(self, level: int) -> tuple:
+        return self._levels[level].shape
+
+    def tile(self, level: int, x: int, y: int) -> np.ndarray:
+        """ тайл (x, y) уровня level, у правого и нижнего края карты тайлы меньше """
+        key = (level, x, y)
+        try:
+            tile = self._tiles[key]
+        except KeyError:
+            self.misses += 1
+            size = self.tile_px
+            tile = np.ascontiguousarray(
+                self._levels[level][y * size:(y + 1) * size, x * size:(x + 1) * size])
+            self._tiles[key] = tile
+            if len(self._tiles) > self.cache_tiles:
+                self._tiles.popitem(last=False)
+            return tile
+        self._tiles.move_to_end(key)
+        self.hits += 1
+        return tile
+
+    def level_for(self, footprint_deg: float, size_px: int) -> int:
+        """ самый грубый уровень, на котором пиксель не крупнее пикселя снимка """
+        target_deg_per_px = footprint_deg / size_px
+        for level in range(len(self._levels) - 1, 0, -1):
+            if 360.0 / self._levels[level].shape[1] <= target_deg_per_px:
+                return level
+        return 0
+
+    def photo(self, lat: float, lon: float, footprint_deg: float, size_px: int,
+              out: Optional[np.ndarray] = None) -> np.ndarray:
+        """photo снимок участка карты с центром в (lat, lon)
+
+        Args:
+            lat, lon (float): центр снимка, градусы
+            footprint_deg (float): охват снимка по широте и долготе, градусы
+            size_px (int): сторона снимка, пикс.
+            out (Optional[np.ndarray]): массив (size_px x size_px [x каналы])
+                для записи снимка, например ячейка пула кадров
+
+        Returns:
+            np.ndarray: снимок; у полюсов строки за краем карты повторяют крайнюю строку,
+                по долготе карта замкнута
+        """
+        level = self.level_for(footprint_deg, size_px)
+        height, width = self._levels[level].shape[:2]
+        if out is None:
+            out = np.empty((size_px, size_px) + self._levels[level].shape[2:],
+                           dtype=self._levels[level].dtype)
+
+        # координаты центров пикселей снимка в пикселях уровня
+        steps = (np.arange(size_px) + 0.5) / size_px - 0.5
+        rows = np.floor((90.0 - lat - steps * footprint_deg) / 180.0 * height).astype(np.int64)
+        rows = np.clip(rows, 0, height - 1)
+        columns = np.floor((lon + 180.0 + steps * footprint_deg) / 360.0 * width).astype(np.int64) % width
+
+        size = self.tile_px
+        tile_rows, tile_columns = rows // size, columns // size
+        for tile_y in np.unique(tile_rows):
+            out_rows = np.flatnonzero(tile_rows == tile_y)
+            for tile_x in np.unique(tile_columns):
+                out_columns = np.flatnonzero(tile_columns == tile_x)
+                tile = self.tile(level, int(tile_x), int(tile_y))
+                out[np.ix_(out_rows, out_columns)] = \
+                    tile[np.ix_(rows[out_rows] % size, columns[out_columns] % size)]
+        return out
+
+    def stats(self) -> dict:
+        return {"levels": len(self._levels), "size": len(self._tiles),
+                "hits": self.hits, "misses": self.misses}
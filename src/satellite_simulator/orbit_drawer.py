@@ -1,24 +1,22 @@
 import numpy as np
-import urllib.request
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from matplotlib.patches import Rectangle
 
-
-
-from multiprocessing import Queue, Process
 from queue import Empty
 from time import sleep
-from mpl_toolkits.mplot3d import Axes3D
-from PIL import Image
+from typing import Dict, Optional, Sequence
 
 from src.system.custom_process import BaseCustomProcess
 from src.system.queues_dir import QueuesDirectory
 from src.system.event_types import Event, ControlEvent
-from src.satellite_control_system.restricted_zone import RestrictedZone
+from src.satellite_control_system.restricted_zone import RestrictedZone, PolygonZone, Zone, \
+    as_zone_array, zones_to_array, polygons_to_array, polygons_from_array
 from src.system.config import CRITICALITY_STR, LOG_DEBUG, \
     LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, \
-    ORBIT_DRAWER_QUEUE_NAME, SATELITE_QUEUE_NAME
+    ORBIT_DRAWER_QUEUE_NAME, SATELITE_QUEUE_NAME, OVERFLOW_COALESCE, WORLD_MAP_PATH
+
+# matplotlib, PIL и urllib импортируются лениво в дочернем процессе
+# (см. _init_resources), чтобы импорт пакета src оставался быстрым
+
+WORLD_MAP_URL = "https://upload.wikimedia.org/wikipedia/commons/thumb/8/83/Equirectangular_projection_SW.jpg/1920px-Equirectangular_projection_SW.jpg"
 
 
 class OrbitDrawer(BaseCustomProcess):
@@ -26,12 +24,33 @@ class OrbitDrawer(BaseCustomProcess):
     event_source_name = ORBIT_DRAWER_QUEUE_NAME
     events_q_name = event_source_name
 
+    # отрисовка идёт в темпе GUI и может отставать: устаревшие координаты
+    # спутника заменяются последними, команды работы с зонами не теряются.
+    # Ограничена только очередь координат, они выдаются после команд,
+    # пришедших позже них (на рисунок это не влияет)
+    events_q_maxsize = 256
+    events_q_overflow_policies = {
+        'update_orbit_data': OVERFLOW_COALESCE,
+        'orbit_telemetry': OVERFLOW_COALESCE,
+    }
+
+    # подписка на телеметрию спутника: период выборки (сек. модельного времени)
+    # и число выборок в одном сообщении
+    telemetry_period_sec = 60
+    telemetry_batch_size = 1
+
     """ Класс для вывода рисунка орбиты спутника """
     def __init__(
         self,
         queues_dir : QueuesDirectory,
-        log_level : int = DEFAULT_LOG_LEVEL
+        log_level : int = DEFAULT_LOG_LEVEL,
+        satellite_ids : Sequence[Optional[str]] = (None,)
     ):
+        """
+        Args:
+            satellite_ids (Sequence[Optional[str]]): спутники, трассы которых
+                рисуются, None - единственный спутник системы
+        """
         super().__init__(
             log_prefix=OrbitDrawer.log_prefix,
             queues_dir=queues_dir,
@@ -39,31 +58,57 @@ class OrbitDrawer(BaseCustomProcess):
             event_source_name=OrbitDrawer.event_source_name,
             log_level=log_level)
         
-        # Set up figure
+        self._satellite_ids = tuple(satellite_ids)
         self._num_frames = 50
-        self._positions = []
-        self._fig, self._ax = plt.subplots(figsize=(10, 5))
+        # точки трассы и линии трасс по спутникам
+        self._positions: Dict[Optional[str], list] = {}
+        self._trajectories = {}
+        self._camera_coords = []
+        self._restricted_zone_patches = {}
+        # зоны, нарисованные одной коллекцией (draw_restricted_zones)
+        self._restricted_zones_collection = None
+        self._restricted_zone_ids = np.empty(0, dtype=np.int64)
+        self._restricted_zone_verts = []
+
+        # графические объекты создаются в дочернем процессе, см. _init_resources
+        self._fig = None
+        self._ax = None
+        self._photos = None
+
+        self._log_message(LOG_INFO, f"отрисовщик создан")
+
+
+    def _load_world_map(self):
+        """ загрузка карты земли: по ссылке или из локальной копии """
+        import urllib.request
+        from PIL import Image
 
-        world_map_url = "https://upload.wikimedia.org/wikipedia/commons/thumb/8/83/Equirectangular_projection_SW.jpg/1920px-Equirectangular_projection_SW.jpg"
-        world_map_path = "./src/satellite_simulator/Earth.jpg"
-        
         try:
-            with urllib.request.urlopen(world_map_url) as url_obj:
-                world_map = np.array(Image.open(url_obj))
+            with urllib.request.urlopen(WORLD_MAP_URL) as url_obj:
+                return np.array(Image.open(url_obj))
         except Exception as e:
             self._log_message(LOG_INFO, "Не удалось скачать карту земли по ссылке, загружаю локальную копию.")
-            world_map = np.array(Image.open(world_map_path))
+            return np.array(Image.open(WORLD_MAP_PATH))
 
-        self._ax.imshow(world_map, extent=[-180, 180, -90, 90])
-        self._trajectory, =  self._ax.plot([], [], 'ro-', markersize=7, linewidth=5)
 
-        self._camera_coords = []
-        self._photos, = self._ax.plot([], [], marker='*', markersize=15, linestyle='None', c='yellow')
+    def _init_resources(self):
+        """ создание фигуры и загрузка карты в дочернем процессе """
+        import matplotlib.pyplot as plt
 
-        self._restricted_zone_patches = {}
+        # Set up figure
+        self._fig, self._ax = plt.subplots(figsize=(10, 5))
+
+        world_map = self._load_world_map()
+        self._ax.imshow(world_map, extent=[-180, 180, -90, 90])
+        self._photos, = self._ax.plot([], [], marker='*', markersize=15, linestyle='None', c='yellow')
 
-        self._log_message(LOG_INFO, f"отрисовщик создан")
 
+    def _component_stats(self) -> dict:
+        # точки трассы и снимков накапливаются за всё время работы
+        stats = super()._component_stats()
+        stats["positions"] = sum(len(positions) for positions in self._positions.values())
+        stats["photos"] = len(self._camera_coords)
+        return stats
 
     def _check_events_q(self):
         while True:
@@ -76,13 +121,19 @@ class OrbitDrawer(BaseCustomProcess):
                 match(event.operation):
                     case 'update_orbit_data':
                         lat, lon = event.parameters
-                        self._append_positions(lat, lon)
+                        self._append_positions(event.satellite_id, lat, lon)
+                    case 'orbit_telemetry':
+                        self._append_telemetry(event.satellite_id, event.parameters)
                     case 'update_photo_map':
                         lat, lon = event.parameters
                         self._append_photos(lat, lon)
+                        # изображение снимка не рисуется, кадр освобождается
+                        self._release_frame(event)
                     case 'draw_restricted_zone':
-                        zone : RestrictedZone = event.parameters
+                        zone : Zone = event.parameters
                         self._append_restricted_zones(zone)
+                    case 'draw_restricted_zones':
+                        self._draw_restricted_zones(event.parameters)
                     case 'clear_restricted_zone':
                         zone_id : int = event.parameters
                         self._remove_restricted_zone(zone_id)
@@ -91,12 +142,48 @@ class OrbitDrawer(BaseCustomProcess):
                 break
 
 
-    def _append_positions(self, lat, lon):
-        if self._positions and abs(lon - self._positions[-1][0]) > 180:
-            self._positions.clear()
-        self._positions.append((lon, lat))
-        lons, lats = zip(*self._positions)
-        self._trajectory.set_data(lons, lats)
+    def _add_position(self, positions: list, lat, lon):
+        if positions and abs(lon - positions[-1][0]) > 180:
+            positions.clear()
+        positions.append((lon, lat))
+
+    def _update_trajectory(self, satellite_id: Optional[str]):
+        trajectory = self._trajectories.get(satellite_id)
+        if trajectory is None:
+            # линия трассы создаётся при первых координатах спутника,
+            # трассы спутников группировки различаются цветом
+            style = 'ro-' if satellite_id is None else 'o-'
+            trajectory, = self._ax.plot([], [], style, markersize=7, linewidth=5)
+            self._trajectories[satellite_id] = trajectory
+        lons, lats = zip(*self._positions[satellite_id])
+        trajectory.set_data(lons, lats)
+
+    def _append_positions(self, satellite_id: Optional[str], lat, lon):
+        self._add_position(self._positions.setdefault(satellite_id, []), lat, lon)
+        self._update_trajectory(satellite_id)
+
+    def _append_telemetry(self, satellite_id: Optional[str], telemetry: dict):
+        fields = telemetry["fields"]
+        lat_idx, lon_idx = fields.index("lat"), fields.index("lon")
+        positions = self._positions.setdefault(satellite_id, [])
+        for sample in telemetry["samples"]:
+            self._add_position(positions, sample[lat_idx], sample[lon_idx])
+        if positions:
+            self._update_trajectory(satellite_id)
+
+    def _send_to_satellites(self, operation: str, parameters=None):
+        for satellite_id in self._satellite_ids:
+            q = self._queues_dir.route(SATELITE_QUEUE_NAME, satellite_id)
+            if q:
+                q.put(
+                    Event(
+                        source=self._event_source_name,
+                        destination=SATELITE_QUEUE_NAME,
+                        operation=operation,
+                        parameters=parameters,
+                        satellite_id=satellite_id
+                    )
+                )
 
 
     def _append_photos(self, lat, lon):
@@ -104,51 +191,134 @@ class OrbitDrawer(BaseCustomProcess):
         lons, lats = zip(*self._camera_coords)
         self._photos.set_data(lons, lats)
 
-    def _append_restricted_zones(self, zone: RestrictedZone):
-        width = np.abs(zone.lon_top_right - zone.lon_bot_left)
-        height = np.abs(zone.lat_bot_left - zone.lat_top_right)
-
-        rect = Rectangle(
-            (zone.lon_bot_left, zone.lat_bot_left),
-            width,
-            height,
-            linewidth=2,
-            edgecolor='darkred',
-            facecolor='red',
-            alpha=0.3
+    @staticmethod
+    def _zone_outlines(rectangles: np.ndarray, polygon_vertices: np.ndarray):
+        """ контуры зон на карте: идентификаторы и вершины (lon, lat) каждой части
+
+        Прямоугольник, пересекающий антимеридиан, рисуется двумя частями
+        у краёв карты, многоугольник за антимеридианом - со сдвигом на оборот.
+        """
+        from src.satellite_control_system.zone_index import unwrap_longitudes
+
+        ids, outlines = [], []
+        lat1, lon1 = rectangles["lat_bot_left"], rectangles["lon_bot_left"]
+        lat2, lon2 = rectangles["lat_top_right"], rectangles["lon_top_right"]
+        wraps = lon1 > lon2
+        parts = (
+            (~wraps, lon1, lon2),
+            (wraps, lon1, np.full(len(rectangles), 180.0)),
+            (wraps, np.full(len(rectangles), -180.0), lon2),
         )
-        self._ax.add_patch(rect)        
-        self._restricted_zone_patches[zone.zone_id] = rect
+        for mask, left, right in parts:
+            corners = np.stack((
+                np.column_stack((left[mask], lat1[mask])),
+                np.column_stack((right[mask], lat1[mask])),
+                np.column_stack((right[mask], lat2[mask])),
+                np.column_stack((left[mask], lat2[mask])),
+            ), axis=1)
+            ids.extend(rectangles["zone_id"][mask].tolist())
+            outlines.extend(corners)
+
+        for zone in polygons_from_array(polygon_vertices):
+            lats = np.array([lat for lat, _ in zone.vertices])
+            lons = unwrap_longitudes(np.array([lon for _, lon in zone.vertices]))
+            for shift in (0.0, -360.0, 360.0):
+                shifted = lons + shift
+                if shifted.max() > -180 and shifted.min() < 180:
+                    ids.append(zone.zone_id)
+                    outlines.append(np.column_stack((shifted, lats)))
+        return ids, outlines
+
+    def _append_restricted_zones(self, zone: Zone):
+        from matplotlib.patches import Polygon
+
+        if isinstance(zone, PolygonZone):
+            _, outlines = self._zone_outlines(zones_to_array([]), polygons_to_array([zone]))
+        else:
+            _, outlines = self._zone_outlines(zones_to_array([zone]), polygons_to_array([]))
+
+        patches = []
+        for outline in outlines:
+            patch = Polygon(
+                outline,
+                closed=True,
+                linewidth=2,
+                edgecolor='darkred',
+                facecolor='red',
+                alpha=0.3
+            )
+            self._ax.add_patch(patch)
+            patches.append(patch)
+        self._restricted_zone_patches[zone.zone_id] = patches
         self._fig.canvas.draw_idle()  # Update canvas
 
+    def _draw_restricted_zones(self, zones):
+        """ отрисовка всего набора зон (см. ZoneTable.payload) одной коллекцией """
+        from matplotlib.collections import PolyCollection
+
+        for patches in self._restricted_zone_patches.values():
+            for patch in patches:
+                patch.remove()
+        self._restricted_zone_patches = {}
+        if self._restricted_zones_collection is not None:
+            self._restricted_zones_collection.remove()
+
+        if not isinstance(zones, dict):
+            zones = {"rectangles": zones}
+        ids, self._restricted_zone_verts = self._zone_outlines(
+            as_zone_array(zones.get("rectangles", [])),
+            zones.get("polygons", polygons_to_array([])))
+        self._restricted_zone_ids = np.array(ids, dtype=np.int64)
+        self._restricted_zones_collection = PolyCollection(
+            self._restricted_zone_verts,
+            linewidths=2,
+            edgecolors='darkred',
+            facecolors='red',
+            alpha=0.3
+        )
+        self._ax.add_collection(self._restricted_zones_collection)
+        self._fig.canvas.draw_idle()
+
     def _remove_restricted_zone(self, zone_id: int):
-        zone_rect = self._restricted_zone_patches.get(zone_id)
-        if zone_rect is None:
+        patches = self._restricted_zone_patches.pop(zone_id, None)
+        if patches is not None:
+            for patch in patches:
+                patch.remove()
+            return True
+
+        keep = self._restricted_zone_ids != zone_id
+        if keep.all():
             return False
-        
-        zone_rect.remove()
-        del self._restricted_zone_patches[zone_id]
+        self._restricted_zone_ids = self._restricted_zone_ids[keep]
+        self._restricted_zone_verts = [
+            outline for outline, kept in zip(self._restricted_zone_verts, keep) if kept]
+        self._restricted_zones_collection.set_verts(self._restricted_zone_verts)
+        return True
 
 
     def run(self):
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+
+        self._ensure_resources()
+
         def init():
-            self._trajectory.set_data([], [])
             self._photos.set_data([], [])
             # self._restricted_zones.set_data([], [])
-            return self._trajectory, self._photos
+            return (*self._trajectories.values(), self._photos)
 
 
         def update(frame):
-            q = self._queues_dir.get_queue(SATELITE_QUEUE_NAME)
-            q.put(
-                Event(
-                    source=self._event_source_name,
-                    destination=SATELITE_QUEUE_NAME,
-                    operation="send_data",
-                    parameters=None
-                )
-            )
-            return self._trajectory, self._photos
+            # координаты спутников приходят по подписке, а не по запросу на каждый кадр
+            return (*self._trajectories.values(), self._photos)
+
+        self._send_to_satellites(
+            "subscribe_telemetry",
+            {
+                "period_sec": self.telemetry_period_sec,
+                "batch_size": self.telemetry_batch_size,
+                "fields": ("time", "lat", "lon"),
+            })
         
         self._ani = animation.FuncAnimation(self._fig, update,  init_func=init, blit=False, interval=200, cache_frame_data=False,)
         plt.xlabel("Longitude")
@@ -160,4 +330,6 @@ class OrbitDrawer(BaseCustomProcess):
             self._check_events_q()
             self._check_control_q()
             plt.pause(0.1)
-            sleep(0.15)
\ No newline at end of file
+            sleep(0.15)
+
+        self._send_to_satellites("unsubscribe_telemetry")
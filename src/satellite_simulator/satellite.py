@@ -1,15 +1,17 @@
 import numpy as np
 
+from dataclasses import dataclass, field
 from multiprocessing import Queue, Process
 from queue import Empty
-from time import sleep
+from time import sleep, monotonic
+from typing import Any, Optional
 
 from src.system.custom_process import BaseCustomProcess
-from src.system.queues_dir import QueuesDirectory
+from src.system.queues_dir import QueuesDirectory, satellite_queue_name
 from src.system.event_types import Event, ControlEvent
 from src.system.config import CRITICALITY_STR, LOG_DEBUG, \
     LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, \
-    SATELITE_QUEUE_NAME, CAMERA_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME
+    SATELITE_QUEUE_NAME, CAMERA_QUEUE_NAME, ORBIT_DRAWER_QUEUE_NAME, EXECUTION_MODE_PROCESS
 
 
 
@@ -17,6 +19,25 @@ G = 6.67430e-11  # Gravitational constant (m^3 kg^-1 s^-2)
 EARTH_MASS = 5.972e24  # kg
 EARTH_RADIUS = 6.371e6  # m
 
+# поля, доступные в подписке на телеметрию
+TELEMETRY_FIELDS = ("time", "lat", "lon", "x", "y", "z", "vx", "vy", "vz",
+                    "altitude", "inclination", "raan")
+# минимальный период выборки телеметрии (сек. модельного времени)
+MIN_TELEMETRY_PERIOD_SEC = 0.5
+
+
+@dataclass
+class TelemetrySubscription:
+    """ подписка на телеметрию спутника """
+    subscriber: str         # очередь получателя
+    period_sec: float       # период выборки, сек. модельного времени
+    batch_size: int         # число выборок в одном сообщении
+    fields: tuple           # поля выборки из TELEMETRY_FIELDS
+    next_sample_time: float = 0.0
+    samples: list = field(default_factory=list)
+    queue: Any = None       # ссылка на очередь получателя (QueueHandle)
+
+
 class Satellite(BaseCustomProcess):
     """ Симулятор спутника """
     log_prefix = "[SAT]"
@@ -31,14 +52,24 @@ class Satellite(BaseCustomProcess):
         inclination: float,
         raan: float,
         queues_dir: QueuesDirectory,
-        log_level: int = DEFAULT_LOG_LEVEL
+        log_level: int = DEFAULT_LOG_LEVEL,
+        execution_mode: str = EXECUTION_MODE_PROCESS,
+        satellite_id: Optional[str] = None
     ):
+        """
+        Args:
+            satellite_id (Optional[str]): идентификатор спутника группировки;
+                спутник получает события из очереди satellite_queue_name("satellite", satellite_id)
+                и отмечает им отправляемые события, None - единственный спутник
+        """
         super().__init__(
-            log_prefix=Satellite.log_prefix,
+            log_prefix=Satellite.log_prefix if satellite_id is None else f"[SAT {satellite_id}]",
             queues_dir=queues_dir,
-            events_q_name=Satellite.events_q_name,
+            events_q_name=satellite_queue_name(Satellite.events_q_name, satellite_id),
             event_source_name=Satellite.event_source_name,
-            log_level=log_level)
+            log_level=log_level,
+            execution_mode=execution_mode)
+        self._satellite_id = satellite_id
 
         self._altitude = altitude
         self._radius = EARTH_RADIUS + altitude
@@ -62,6 +93,21 @@ class Satellite(BaseCustomProcess):
         
         self._recalc_interval_sec = 0.1 # Время пересчета координат (сек.)
         self._time_speed_sec = 30 # Время пересчета координат (сек.), время прошедшее для спутника
+        self._loop_interval_sec = self._recalc_interval_sec
+        # момент (по monotonic) следующего пересчёта координат: компонент может
+        # проснуться раньше из-за события (см. async_runtime), а модельное время
+        # должно идти с прежней скоростью
+        self._next_recalc_time = 0.0
+
+        # момент (по monotonic) окончания перехода на новую орбиту,
+        # до него спутник не обрабатывает команды и не пересчитывает позицию
+        self._transfer_end_time = 0.0
+
+        # модельное время (сек.) и подписки на телеметрию по именам получателей
+        self._sim_time_sec = 0.0
+        self._subscriptions: dict[str, TelemetrySubscription] = {}
+        self._drawer_q = queues_dir.handle(ORBIT_DRAWER_QUEUE_NAME)
+        self._camera_q = queues_dir.handle(CAMERA_QUEUE_NAME)
         self._log_message(LOG_INFO, f"симулятор создан")
 
 
@@ -142,6 +188,133 @@ class Satellite(BaseCustomProcess):
         self._velocity += 0.5 * (acceleration + new_acceleration) * dt
 
 
+    def _propagate(self, duration: float):
+        """ Расчет движения спутника на duration секунд модельного времени.
+            Если есть подписчики телеметрии, шаг интегрирования не превышает
+            наименьший запрошенный период выборки """
+        step = duration
+        if self._subscriptions:
+            step = min(step, min(s.period_sec for s in self._subscriptions.values()))
+
+        elapsed = 0.0
+        while duration - elapsed > 1e-9:
+            dt = min(step, duration - elapsed)
+            self._update_position(dt)
+            elapsed += dt
+            self._sim_time_sec += dt
+            if self._subscriptions:
+                self._sample_telemetry()
+
+
+    def _telemetry_value(self, name: str, lat: float, lon: float) -> float:
+        match name:
+            case "time":
+                return self._sim_time_sec
+            case "lat":
+                return lat
+            case "lon":
+                return lon
+            case "x" | "y" | "z":
+                return float(self._position["xyz".index(name)])
+            case "vx" | "vy" | "vz":
+                return float(self._velocity["xyz".index(name[1])])
+            # параметры текущей (последней установленной) орбиты
+            case "altitude":
+                return float(self._altitude)
+            case "inclination":
+                return float(self._inclination)
+            case "raan":
+                return float(self._raan)
+
+
+    def _sample_telemetry(self):
+        """ запись выборок для подписчиков, у которых наступил момент выборки,
+            и отправка заполненных пачек """
+        lat, lon = None, None
+        for subscription in self._subscriptions.values():
+            if self._sim_time_sec + 1e-9 < subscription.next_sample_time:
+                continue
+            if lat is None:
+                lat, lon = map(float, self.get_earth_coordinates())
+            subscription.samples.append(tuple(
+                self._telemetry_value(name, lat, lon) for name in subscription.fields))
+            subscription.next_sample_time = max(
+                subscription.next_sample_time + subscription.period_sec,
+                self._sim_time_sec + subscription.period_sec / 2)
+
+            if len(subscription.samples) >= subscription.batch_size:
+                self._send_telemetry(subscription)
+
+
+    def _send_telemetry(self, subscription: TelemetrySubscription):
+        # телеметрия идёт через монитор безопасности, если он есть в системе,
+        # иначе - прямо подписчику
+        q = self._security_q if self._security_q else subscription.queue
+        if q:
+            q.put(
+                self._sign(Event(
+                    source=self._event_source_name,
+                    destination=subscription.subscriber,
+                    operation='orbit_telemetry',
+                    parameters={"fields": subscription.fields, "samples": subscription.samples},
+                    satellite_id=self._satellite_id)))
+        subscription.samples = []
+
+
+    def _subscribe_telemetry(self, subscriber: str, parameters: dict):
+        """ регистрация подписки: {"period_sec": float, "batch_size": int, "fields": [...]} """
+        fields = tuple(parameters.get("fields", ("time", "lat", "lon")))
+        unknown = set(fields) - set(TELEMETRY_FIELDS)
+        if unknown:
+            self._log_message(LOG_ERROR, f"подписка {subscriber} отклонена, неизвестные поля {unknown}")
+            return
+
+        subscription = TelemetrySubscription(
+            subscriber=subscriber,
+            period_sec=max(float(parameters.get("period_sec", self._time_speed_sec)), MIN_TELEMETRY_PERIOD_SEC),
+            batch_size=max(int(parameters.get("batch_size", 1)), 1),
+            fields=fields,
+            next_sample_time=self._sim_time_sec,
+            queue=self._queues_dir.handle(subscriber))
+        self._subscriptions[subscriber] = subscription
+        self._log_message(
+            LOG_INFO,
+            f"подписка {subscriber} на телеметрию: период {subscription.period_sec} сек., "
+            f"пачка {subscription.batch_size}, поля {fields}")
+
+
+    def _get_checkpoint(self) -> dict:
+        # переход на новую орбиту после перезапуска не продолжается: спутник уже на ней
+        return {
+            "orbit": (self._altitude, self._inclination, self._raan, self._position_angle),
+            "position": self._position.copy(),
+            "velocity": self._velocity.copy(),
+            "sim_time_sec": self._sim_time_sec,
+            "subscriptions": [
+                (s.subscriber, s.period_sec, s.batch_size, s.fields, s.next_sample_time)
+                for s in self._subscriptions.values()],
+        }
+
+
+    def _restore_checkpoint(self, state: dict):
+        self._altitude, self._inclination, self._raan, self._position_angle = state["orbit"]
+        self._radius = EARTH_RADIUS + self._altitude
+        self._position = state["position"]
+        self._velocity = state["velocity"]
+        self._sim_time_sec = state["sim_time_sec"]
+        for subscriber, period_sec, batch_size, fields, next_sample_time in state["subscriptions"]:
+            self._subscriptions[subscriber] = TelemetrySubscription(
+                subscriber=subscriber,
+                period_sec=period_sec,
+                batch_size=batch_size,
+                fields=fields,
+                next_sample_time=next_sample_time,
+                queue=self._queues_dir.handle(subscriber))
+        self._log_message(
+            LOG_INFO, f"состояние восстановлено: модельное время {self._sim_time_sec:.0f} сек., "
+                      f"подписок {len(self._subscriptions)}")
+
+
     def get_earth_coordinates(self):
         """ Координаты, на которые смотрит камера спутника, направленная в центр земли """
         lat = np.degrees(np.arcsin(self._position[2] / np.linalg.norm(self._position)))
@@ -160,29 +333,36 @@ class Satellite(BaseCustomProcess):
                 
                 match event.operation:
                     case 'send_data':
-                        q: Queue = self._queues_dir.get_queue(ORBIT_DRAWER_QUEUE_NAME)
                         lat, lon = self.get_earth_coordinates()
-                        q.put(
+                        self._drawer_q.put(
                             Event(
                                 source=self.event_source_name, 
                                 destination=ORBIT_DRAWER_QUEUE_NAME, 
                                 operation='update_orbit_data', 
-                                parameters=(lat, lon)))
+                                parameters=(lat, lon),
+                                satellite_id=self._satellite_id))
                     case 'change_orbit':
                         new_altitude, new_inclination, new_raan = event.parameters
                         distance = self._change_orbit(new_altitude, new_inclination, new_raan)
                         time_spent = distance * self.orbit_change_coef
-                        sleep(time_spent) # переходим к новой орбите
-                        self._log_message(LOG_DEBUG, f"произошел переход на новую орбиту, переход занял {time_spent} сек.")
+                        # переходим к новой орбите, не блокируя рабочий цикл
+                        self._transfer_end_time = monotonic() + time_spent
+                        self._log_message(LOG_DEBUG, f"начат переход на новую орбиту, переход займет {time_spent} сек.")
+                        break
+                    case 'subscribe_telemetry':
+                        self._subscribe_telemetry(event.source, event.parameters or {})
+                    case 'unsubscribe_telemetry':
+                        if self._subscriptions.pop(event.source, None) is not None:
+                            self._log_message(LOG_INFO, f"подписка {event.source} на телеметрию отменена")
                     case 'post_camera_coords':
                         lat, lon = self.get_earth_coordinates()
                         request = Event(
                             source=self._event_source_name,
                             destination=CAMERA_QUEUE_NAME,
                             operation="camera_update",
-                            parameters=(lat, lon))
-                        camera_q: Queue = self._queues_dir.get_queue(CAMERA_QUEUE_NAME)
-                        camera_q.put(request)
+                            parameters=(lat, lon),
+                            satellite_id=self._satellite_id)
+                        self._camera_q.put(request)
                         self._log_message(LOG_DEBUG, "обработан запрос на снимок")
 
             except Empty:
@@ -190,14 +370,21 @@ class Satellite(BaseCustomProcess):
 
 
 
-    def run(self):
-        self._log_message(LOG_INFO, f"старт симуляции спутника")
-
-        while self._quit is False:
-            self._update_position(self._time_speed_sec)
-            self._check_events_q() # Вызываем метод базового класса для контроля управляющий команд
+    def _iteration(self):
+        if monotonic() < self._transfer_end_time:
+            # спутник еще переходит на новую орбиту
             self._check_control_q()
-            # self._log_message(LOG_DEBUG, f"позиция спутника {self._position}")            
-            
+            return
+
+        now = monotonic()
+        if now >= self._next_recalc_time:
+            self._next_recalc_time = now + self._recalc_interval_sec
+            self._propagate(self._time_speed_sec)
+        self._check_events_q()
+        self._check_control_q()
+        # self._log_message(LOG_DEBUG, f"позиция спутника {self._position}")
 
-            sleep(self._recalc_interval_sec)
\ No newline at end of file
+
+    def run(self):
+        self._log_message(LOG_INFO, f"старт симуляции спутника")
+        super().run()
@@ -0,0 +1,131 @@
+from queue import Empty
+
+from src.system.custom_process import BaseCustomProcess
+from src.system.queues_dir import QueuesDirectory
+from src.system.event_types import Event
+from src.system.telemetry_store import TelemetryStore, SOURCE_ORBIT, SOURCE_PHOTO
+from src.system.config import LOG_DEBUG, LOG_ERROR, LOG_INFO, DEFAULT_LOG_LEVEL, \
+    EXECUTION_MODE_PROCESS, SATELITE_QUEUE_NAME, TELEMETRY_RECORDER_QUEUE_NAME, LOG_CATEGORY_EVENTS
+
+
+class TelemetryRecorder(BaseCustomProcess):
+    """ Запись истории положений спутника и координат снимков на диск
+
+    Положения приходят по подписке на телеметрию спутника (orbit_telemetry)
+    или событиями update_orbit_data, координаты снимков - событиями
+    update_photo_map от OpticsControl через монитор безопасности.
+    Записи сохраняются в TelemetryStore, выборки делаются открытием того же
+    каталога: TelemetryStore(storage_dir, readonly=True). Каждый запуск
+    рекордера - новый сеанс записи хранилища (модельное время снова
+    начинается с нуля), выборки по умолчанию делаются в последнем сеансе.
+    """
+    log_prefix = "[RECORDER]"
+    event_source_name = TELEMETRY_RECORDER_QUEUE_NAME
+    events_q_name = event_source_name
+
+    # подписка на телеметрию спутника: период выборки (сек. модельного времени)
+    # и число выборок в одном сообщении
+    telemetry_period_sec = 10
+    telemetry_batch_size = 16
+
+    def __init__(
+        self,
+        queues_dir: QueuesDirectory,
+        storage_dir: str,
+        log_level: int = DEFAULT_LOG_LEVEL,
+        execution_mode: str = EXECUTION_MODE_PROCESS,
+        flush_rows: int = 256
+    ):
+        """
+        Args:
+            storage_dir (str): каталог хранилища телеметрии
+            flush_rows (int): число записей, накапливаемых перед записью в файлы
+        """
+        super().__init__(
+            log_prefix=TelemetryRecorder.log_prefix,
+            queues_dir=queues_dir,
+            events_q_name=TelemetryRecorder.events_q_name,
+            event_source_name=TelemetryRecorder.event_source_name,
+            log_level=log_level,
+            execution_mode=execution_mode)
+
+        # события телеметрии не требуют мгновенной реакции
+        self._loop_interval_sec = 0.1
+        self._storage_dir = storage_dir
+        self._satellite_q = queues_dir.handle(SATELITE_QUEUE_NAME)
+        self._flush_rows = flush_rows
+        # хранилище открывается в рабочем процессе, см. _init_resources
+        self._store = None
+        # модельное время последней выборки: снимки приходят без времени
+        # и записываются с временем последнего известного положения
+        self._sim_time_sec = 0.0
+
+        self._log_message(LOG_INFO, "рекордер телеметрии создан")
+
+    def _init_resources(self):
+        self._store = TelemetryStore(self._storage_dir, flush_rows=self._flush_rows)
+        self._log_message(LOG_INFO, f"в хранилище телеметрии {len(self._store)} записей")
+
+    def _send_to_satellite(self, operation: str, parameters=None):
+        q = self._satellite_q
+        if q:
+            q.put(
+                Event(
+                    source=self._event_source_name,
+                    destination=SATELITE_QUEUE_NAME,
+                    operation=operation,
+                    parameters=parameters))
+
+    def _record_telemetry(self, telemetry: dict):
+        fields = telemetry["fields"]
+        time_idx, lat_idx, lon_idx = fields.index("time"), fields.index("lat"), fields.index("lon")
+        for sample in telemetry["samples"]:
+            self._sim_time_sec = sample[time_idx]
+            self._store.append(self._sim_time_sec, sample[lat_idx], sample[lon_idx], SOURCE_ORBIT)
+
+    def _check_events_q(self):
+        while True:
+            try:
+                event: Event = self._events_q.get_nowait()
+
+                if not isinstance(event, Event):
+                    return
+
+                match event.operation:
+                    case 'orbit_telemetry':
+                        self._record_telemetry(event.parameters)
+                    case 'update_orbit_data':
+                        lat, lon = event.parameters
+                        self._store.append(self._sim_time_sec, lat, lon, SOURCE_ORBIT)
+                    case 'update_photo_map':
+                        lat, lon = event.parameters
+                        self._store.append(self._sim_time_sec, lat, lon, SOURCE_PHOTO)
+                        # записываются только координаты снимка
+                        self._release_frame(event)
+                        self._log_message(LOG_DEBUG, "записан снимок (%s, %s)", lat, lon,
+                                          category=LOG_CATEGORY_EVENTS)
+
+            except Empty:
+                break
+
+    def _iteration(self):
+        try:
+            return super()._iteration()
+        except Exception as e:
+            self._log_message(LOG_ERROR, f"ошибка записи телеметрии: {e}")
+
+    def run(self):
+        self._log_message(LOG_INFO, "рекордер телеметрии активен")
+        self._send_to_satellite(
+            "subscribe_telemetry",
+            {
+                "period_sec": self.telemetry_period_sec,
+                "batch_size": self.telemetry_batch_size,
+                "fields": ("time", "lat", "lon"),
+            })
+
+        super().run()
+
+        self._send_to_satellite("unsubscribe_telemetry")
+        self._store.close()
+        self._log_message(LOG_INFO, f"рекордер телеметрии остановлен, записей: {len(self._store)}")
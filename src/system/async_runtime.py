@@ -0,0 +1,192 @@
+""" модуль однопроцессной среды исполнения компонентов на asyncio
+
+Все компоненты системы выполняются как задачи asyncio в одном потоке одного
+процесса и обмениваются событиями через asyncio.Queue: события передаются
+по ссылке, без сериализации и межпроцессных каналов. Код обработчиков
+компонентов не меняется - задача asyncio вызывает те же итерации рабочего
+цикла (BaseCustomProcess._iteration), что и отдельный процесс.
+
+Компоненты, которым нужен собственный главный цикл (OrbitDrawer с окном
+matplotlib), в этой среде не поддерживаются.
+"""
+import asyncio
+import threading
+from queue import Empty, Full
+from typing import Any, List, Optional
+
+from src.system.custom_process import BaseCustomProcess
+from src.system.supervisor import RestartBudget
+from src.system.queues_dir import QueuesDirectory
+from src.system.system_wrapper import SystemComponentsContainer
+from src.system.config import LOG_INFO, LOG_ERROR, EXECUTION_MODE_PROCESS
+
+
+class AsyncEventQueue:
+    """ очередь событий на основе asyncio.Queue с интерфейсом multiprocessing.Queue
+
+    get_nowait() выбрасывает queue.Empty, поэтому обработчики компонентов
+    работают с ней так же, как с очередью процесса. put() можно вызывать
+    и из других потоков (например, из основного потока программы),
+    в этом случае событие передаётся в цикл событий потокобезопасно.
+
+    Ограничение размера (maxsize) действует только для put_nowait(): блокирующий
+    put() не может ждать внутри цикла событий, поэтому событие всегда ставится
+    в очередь.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self._maxsize = maxsize
+        self._queue = asyncio.Queue()
+        self._not_empty = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """ привязка очереди к циклу событий, в котором работают компоненты """
+        self._loop = loop
+
+    def _put_nowait(self, item: Any):
+        self._queue.put_nowait(item)
+        self._not_empty.set()
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if self._loop is None or running_loop is self._loop:
+            self._put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(self._put_nowait, item)
+
+    def put_nowait(self, item: Any):
+        if self._maxsize and self._queue.qsize() >= self._maxsize:
+            raise Full
+        self.put(item)
+
+    def get_nowait(self) -> Any:
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            self._not_empty.clear()
+            raise Empty
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def wait(self, timeout: float):
+        """ ожидание появления событий в очереди, но не дольше timeout секунд """
+        if not self._queue.empty():
+            # даём поработать остальным задачам даже при непрерывном потоке событий
+            await asyncio.sleep(0)
+            return
+        try:
+            await asyncio.wait_for(self._not_empty.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class AsyncQueuesDirectory(QueuesDirectory):
+    """ каталог очередей для однопроцессной среды исполнения на asyncio """
+    log_prefix = "[QUEUES-ASYNC]"
+
+    def create_queue(
+            self,
+            execution_mode: str = EXECUTION_MODE_PROCESS,
+            maxsize: int = 0) -> AsyncEventQueue:
+        """create_queue создаёт очередь asyncio для компонента системы
+
+        Args:
+            execution_mode (str): не используется, все компоненты работают в цикле событий
+            maxsize (int): максимальный размер очереди, 0 - без ограничения
+
+        Returns:
+            AsyncEventQueue: очередь сообщений
+        """
+        return AsyncEventQueue(maxsize)
+
+
+class AsyncSystemComponentsContainer(SystemComponentsContainer):
+    """ контейнер компонентов, выполняющихся как задачи asyncio в одном процессе
+
+    Цикл событий запускается в отдельном потоке, поэтому управление системой
+    (start, stop, отправка событий в очереди) выглядит так же, как
+    для SystemComponentsContainer с компонентами-процессами.
+    """
+
+    # максимальное время ожидания событий компонентом без собственного интервала (сек.)
+    idle_wait_sec = 0.05
+
+    def __init__(self, components: List[BaseCustomProcess], log_level=LOG_ERROR,
+                 restart_failed: bool = False):
+        super().__init__(components=components, log_level=log_level, restart_failed=restart_failed)
+        self.log_prefix = "[СИСТЕМА-ASYNC]"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+
+    async def _run_component(self, component: BaseCustomProcess):
+        """ рабочий цикл компонента в виде задачи asyncio """
+        component._ensure_resources()
+        self._log_message(LOG_INFO, f"старт {component.__class__.__name__}")
+        # состояние компонента остаётся в памяти, поэтому перезапуск -
+        # это продолжение рабочего цикла после ошибки
+        budget = RestartBudget() if self._restart_failed else None
+
+        while component._quit is False:
+            try:
+                busy = component._iteration()
+            except Exception as e:
+                if budget is not None and budget.allow():
+                    self._log_message(
+                        LOG_ERROR, f"ошибка {component.__class__.__name__}: {e}, компонент перезапущен")
+                    continue
+                self._log_message(
+                    LOG_ERROR, f"ошибка {component.__class__.__name__}: {e}, компонент остановлен")
+                return
+
+            if busy:
+                await asyncio.sleep(0)
+            else:
+                # пауза прерывается новым событием и у компонентов с собственным
+                # интервалом: события не ждут окончания интервала
+                await component._events_q.wait(component._loop_interval_sec or self.idle_wait_sec)
+
+        if component._profiler is not None:
+            component._stop_profiling()
+
+    def _bind_queues(self, loop: asyncio.AbstractEventLoop):
+        for component in self._components:
+            component._events_q.bind(loop)
+            component._control_q.bind(loop)
+
+    async def run_async(self):
+        """ запуск всех компонентов в текущем цикле событий до их остановки """
+        self._bind_queues(asyncio.get_running_loop())
+        await asyncio.gather(
+            *(self._run_component(component) for component in self._components))
+
+    def start(self):
+        """ запуск всех компонентов в отдельном потоке с циклом событий """
+        for component in self._components:
+            self._log_message(LOG_INFO, f"запуск {component.__class__.__name__}")
+
+        # очереди привязываются к циклу до старта потока, чтобы события,
+        # отправленные сразу после start(), не потерялись
+        self._loop = asyncio.new_event_loop()
+        self._bind_queues(self._loop)
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_until_complete, args=(self.run_async(),), daemon=True)
+        self._loop_thread.start()
+
+    def stop(self):
+        """ остановка всех компонентов """
+        for component in self._components:
+            self._log_message(LOG_INFO, f"остановка {component.__class__.__name__}")
+            component.stop()
+
+        if self._loop_thread is not None:
+            self._loop_thread.join()
+            self._loop.close()
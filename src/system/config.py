@@ -4,12 +4,48 @@ OPTICS_CONTROL_QUEUE_NAME = "optics_control"
 ORBIT_CONTROL_QUEUE_NAME = "orbit_control"
 CAMERA_QUEUE_NAME = "camera"
 SECURITY_MONITOR_QUEUE_NAME = "security"
+TELEMETRY_RECORDER_QUEUE_NAME = "telemetry_recorder"
+CONJUNCTION_CONTROL_QUEUE_NAME = "conjunction_control"
+# получатели, у которых своя очередь у каждого спутника (см. QueuesDirectory.route)
+PER_SATELLITE_QUEUE_NAMES = frozenset({SATELITE_QUEUE_NAME})
+# очередь сбора показателей компонентов (память и пр.), регистрируется при необходимости
+STATS_QUEUE_NAME = "stats"
+DEFAULT_STATS_INTERVAL_SEC = 10.0  # период отчёта о показателях компонента (сек.)
+# период отправки контрольной точки компонента супервизору (сек.), см. supervisor.py
+DEFAULT_CHECKPOINT_INTERVAL_SEC = 1.0
+
+# пул кадров камеры в разделяемой памяти (см. src/system/frame_pool.py)
+PHOTO_FRAME_POOL_NAME = "photos"
+PHOTO_FRAME_SIZE_PX = 256         # сторона квадратного снимка, пикс.
+PHOTO_FRAME_POOL_SLOTS = 32       # число одновременно используемых кадров
+PHOTO_FOOTPRINT_DEG = 10.0        # охват снимка по широте и долготе, градусы
+MAP_TILE_SIZE_PX = 256            # сторона тайла карты для синтеза снимков, пикс.
+MAP_TILE_CACHE_SIZE = 64          # число тайлов карты в кэше камеры
+# локальная копия карты земли для отрисовщика и камеры
+WORLD_MAP_PATH = "./src/satellite_simulator/Earth.jpg"
+
+# режимы исполнения компонентов
+EXECUTION_MODE_PROCESS = "process"  # отдельный процесс ОС, события сериализуются
+EXECUTION_MODE_THREAD = "thread"    # поток основного процесса, события передаются по ссылке
+
+# политики переполнения ограниченных очередей (задаются для каждой операции).
+# Ограничивается только очередь вытесняемых событий: основная очередь компонентов
+# не ограничена, и отправитель никогда не ждёт (обратного давления нет)
+OVERFLOW_BLOCK = "block"              # событие не вытесняется, идёт в основную очередь
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # вытесняется самое старое вытесняемое событие
+OVERFLOW_COALESCE = "coalesce"        # из событий с одинаковыми (source, operation) остаётся последнее
 
 DEFAULT_LOG_LEVEL = 2  # 1 - errors, 2 - verbose, 3 - debug
 LOG_FAILURE = 0
 LOG_ERROR = 1
 LOG_INFO  = 2
 LOG_DEBUG = 3
+
+# категории сообщений журнала: уровень категории можно задать отдельно
+# от уровня компонента (см. BaseCustomProcess.set_log_level)
+LOG_CATEGORY_EVENTS = "events"    # прохождение отдельных событий
+LOG_CATEGORY_CONTROL = "control"  # управляющие команды
+LOG_CATEGORY_STATS = "stats"      # показатели компонента
 CRITICALITY_STR = [
     "ОТКАЗ", "ОШИБКА", "ИНФО", "ОТЛАДКА"
 ]
@@ -1,12 +1,40 @@
+import os
+import threading
 from abc import abstractmethod
 from multiprocessing import Process, Queue
 from queue import Empty
+from time import sleep, monotonic, time
+from typing import Dict, Optional
 
 from src.system.event_types import Event, ControlEvent
+from src.system.event_signing import EventSigner
+from src.system.frame_pool import FrameHandle
+from src.system.profiling import create_profiler, profile_path, \
+    PROFILER_SAMPLING, DEFAULT_PROFILE_DIR, DEFAULT_SAMPLING_INTERVAL_SEC
+from src.system.memory_stats import AllocationTracker, rss_bytes, format_report
 from src.system.queues_dir import QueuesDirectory
-from src.system.config import DEFAULT_LOG_LEVEL, CRITICALITY_STR, LOG_DEBUG
+from src.system.config import DEFAULT_LOG_LEVEL, CRITICALITY_STR, LOG_DEBUG, \
+    LOG_ERROR, LOG_INFO, EXECUTION_MODE_PROCESS, EXECUTION_MODE_THREAD, SECURITY_MONITOR_QUEUE_NAME, \
+    STATS_QUEUE_NAME, DEFAULT_STATS_INTERVAL_SEC, LOG_CATEGORY_CONTROL, LOG_CATEGORY_STATS, \
+    DEFAULT_CHECKPOINT_INTERVAL_SEC
 
 class BaseCustomProcess(Process):
+    # максимальное время ожидания событий компонентом-потоком без собственного интервала (сек.)
+    thread_idle_wait_sec = 0.01
+
+    # ограничение очереди событий и политики переполнения по операциям
+    # (см. QueuesDirectory.register), по умолчанию очередь не ограничена.
+    # С политиками переполнения ограничивается только очередь вытесняемых
+    # событий: заполненная основная очередь остановила бы отправителя,
+    # то есть монитор безопасности и доставку событий всем компонентам
+    events_q_maxsize = 0
+    events_q_overflow_policies = None
+
+    # период отчёта о показателях компонента (сек.), 0 - без отчётов
+    stats_interval_sec = DEFAULT_STATS_INTERVAL_SEC
+    # период отправки контрольной точки супервизору (сек.), см. _get_checkpoint
+    checkpoint_interval_sec = DEFAULT_CHECKPOINT_INTERVAL_SEC
+
     def __init__(
         self,
         log_prefix: str,
@@ -14,55 +42,445 @@ class BaseCustomProcess(Process):
         events_q_name: str,
         event_source_name: str,
         log_level: int = DEFAULT_LOG_LEVEL,
+        execution_mode: str = EXECUTION_MODE_PROCESS,
     ):
         super().__init__()
 
+        # компонент работает либо в отдельном процессе, либо в потоке
+        # основного процесса (см. start)
+        self._execution_mode = execution_mode
+        self._thread = None
+
         self._queues_dir = queues_dir
-        self._events_q = Queue()
         self._events_q_name = events_q_name
         self._event_source_name = event_source_name
         self.log_prefix = log_prefix
-        queues_dir.register(queue=self._events_q, name=self._events_q_name)
+        self._events_q = queues_dir.register(
+            queue=self._create_events_q(queues_dir, execution_mode),
+            name=self._events_q_name,
+            maxsize=self.events_q_maxsize,
+            overflow_policies=self.events_q_overflow_policies)
 
         self.log_level = log_level
-        self._control_q = Queue()
+        # уровни отдельных категорий сообщений, заданные командой set_log_level
+        self._log_categories: Dict[str, int] = {}
+        self._control_q = queues_dir.create_queue(execution_mode)
+        # очередь монитора безопасности, через который компоненты отправляют события
+        self._security_q = queues_dir.handle(SECURITY_MONITOR_QUEUE_NAME)
+
+        # пауза между итерациями рабочего цикла (сек.), 0 - без паузы
+        self._loop_interval_sec = 0
 
         self._quit = False
+
+        # ключ подписи событий, отправляемых монитору безопасности (см. set_signing_key)
+        self._signing_key = None
+        self._signer = None
+
+        # профилировщик, включённый командой profile_start, и каталог его файла
+        self._profiler = None
+        self._profile_dir = DEFAULT_PROFILE_DIR
+
+        # отчёты о показателях: очередь сбора (если зарегистрирована) и время следующего отчёта
+        self._stats_q = queues_dir.handle(STATS_QUEUE_NAME)
+        self._next_stats_time = 0.0
+        # снимки выделений памяти, включённые командой memory_trace_start
+        self._allocation_tracker = None
+
+        # очередь контрольных точек супервизора (см. attach_supervisor),
+        # время следующей точки и точка, из которой восстанавливается перезапущенный компонент
+        self._checkpoint_q = None
+        self._next_checkpoint_time = 0.0
+        self._restored_checkpoint = None
+        # рабочий цикл компонента-потока завершился исключением
+        self._thread_failed = False
+        # ресурсы _init_resources созданы и не освобождены (см. _ensure_resources)
+        self._resources_ready = False
+
+    def set_signing_key(self, key: bytes):
+        """set_signing_key задаёт ключ подписи событий компонента
+
+        Вызывается до запуска компонента, тот же ключ передаётся монитору
+        безопасности в signing_keys под именем источника событий компонента.
+
+        Args:
+            key (bytes): секретный ключ HMAC
+        """
+        self._signing_key = key
+        self._signer = None
+
+    def _sign(self, event: Event) -> Event:
+        """ подпись события ключом компонента, без ключа событие не меняется """
+        if self._signing_key is None:
+            return event
+        if self._signer is None:
+            # состояние HMAC создаётся уже в рабочем процессе компонента
+            self._signer = EventSigner(self._signing_key)
+        return self._signer.sign(event)
     
-    def _log_message(self, criticality: int, message: str):
+    def _release_frame(self, event: Event):
+        """ освобождение кадра из пула, если событие ссылается на него (см. frame_pool.py) """
+        handle = event.extra_parameters
+        if isinstance(handle, FrameHandle):
+            pool = self._queues_dir.get_frame_pool(handle.pool)
+            if pool is not None:
+                pool.release(handle)
+
+    def _log_enabled(self, criticality: int, category: Optional[str] = None) -> bool:
+        """ будет ли выведено сообщение, для отказа от дорогой подготовки текста """
+        return criticality <= self._log_categories.get(category, self.log_level)
+
+    def _log_message(self, criticality: int, message: str, *args, category: Optional[str] = None):
         """_log_message печатает сообщение заданного уровня критичности
 
         Args:
             criticality (int): уровень критичности
-            message (str): текст сообщения
+            message (str): текст сообщения; если заданы args - шаблон
+                для подстановки message % args, которая выполняется только
+                для выводимых сообщений
+            category (Optional[str]): категория сообщения (LOG_CATEGORY_*),
+                её уровень может отличаться от уровня компонента
         """
-        if criticality <= self.log_level:
+        if criticality <= self._log_categories.get(category, self.log_level):
+            if args:
+                message = message % args
             print(f"[{CRITICALITY_STR[criticality]}]{self.log_prefix} {message}")
-    
 
 
     def _check_control_q(self):
         """ Проверка наличия управляющий команд  """
+        # все рабочие циклы регулярно проверяют команды, здесь же - время отчёта
+        # и контрольной точки
+        self._report_stats_if_due()
+        self._save_checkpoint_if_due()
         try:
             request: ControlEvent = self._control_q.get_nowait()
             self._log_message(
-                LOG_DEBUG, f"проверяем запрос {request}")
+                LOG_DEBUG, "проверяем запрос %s", request, category=LOG_CATEGORY_CONTROL)
             if not isinstance(request, ControlEvent):
                 return
             if request.operation == 'stop':
                 self._quit = True
+            elif request.operation == 'set_log_level':
+                self._set_log_level(request.parameters or {})
+            elif request.operation == 'profile_start':
+                self._start_profiling(request.parameters or {})
+            elif request.operation == 'profile_stop':
+                self._stop_profiling()
+            elif request.operation == 'memory_trace_start':
+                self._start_memory_trace(request.parameters or {})
+            elif request.operation == 'memory_snapshot':
+                self._take_memory_snapshot(request.parameters or {})
+            elif request.operation == 'memory_trace_stop':
+                self._stop_memory_trace()
+            else:
+                self._handle_control(request)
         except Empty:
             # никаких команд не поступило, ну и ладно
             pass
 
+    def _set_log_level(self, parameters: dict):
+        level = parameters.get("level")
+        if level is not None:
+            self.log_level = level
+        for category, category_level in (parameters.get("categories") or {}).items():
+            if category_level is None:
+                self._log_categories.pop(category, None)
+            else:
+                self._log_categories[category] = category_level
+        self._log_message(
+            LOG_INFO, f"уровень журнала {self.log_level}, категории {self._log_categories}",
+            category=LOG_CATEGORY_CONTROL)
+
+    def _start_profiling(self, parameters: dict):
+        if self._profiler is not None:
+            self._log_message(LOG_ERROR, "профилирование уже включено")
+            return
+        try:
+            profiler = create_profiler(
+                parameters.get("mode", PROFILER_SAMPLING),
+                parameters.get("interval_sec", DEFAULT_SAMPLING_INTERVAL_SEC))
+            # в потоке уже может работать другой профилировщик cProfile
+            profiler.start()
+        except ValueError as e:
+            self._log_message(LOG_ERROR, f"профилирование не включено: {e}")
+            return
+        self._profile_dir = parameters.get("directory", DEFAULT_PROFILE_DIR)
+        self._profiler = profiler
+        self._log_message(LOG_INFO, f"профилирование включено: {parameters}")
+
+    def _stop_profiling(self):
+        if self._profiler is None:
+            self._log_message(LOG_ERROR, "профилирование не было включено")
+            return
+        profiler, self._profiler = self._profiler, None
+        profiler.stop()
+        try:
+            path = profile_path(self._profile_dir, self._event_source_name, profiler)
+            profiler.save(path)
+        except OSError as e:
+            self._log_message(LOG_ERROR, f"профилирование выключено, профиль не записан: {e}")
+            return
+        self._log_message(LOG_INFO, f"профилирование выключено, профиль записан в {path}")
+
+    def _component_stats(self) -> dict:
+        """ показатели для периодического отчёта, компоненты дополняют их своими """
+        return {"rss_bytes": rss_bytes()}
+
+    def _export_stats(self, operation: str, stats: dict):
+        """ отправка показателей в очередь сбора или, если её нет, в журнал """
+        stats = dict(stats, component=self._event_source_name, pid=os.getpid(), time=time())
+        if self._stats_q:
+            self._stats_q.put(Event(
+                source=self._event_source_name,
+                destination=STATS_QUEUE_NAME,
+                operation=operation,
+                parameters=stats))
+        else:
+            self._log_message(LOG_DEBUG, "%s: %s", operation, stats, category=LOG_CATEGORY_STATS)
+
+    def _report_stats_if_due(self):
+        if not self.stats_interval_sec:
+            return
+        now = monotonic()
+        if now < self._next_stats_time:
+            return
+        self._next_stats_time = now + self.stats_interval_sec
+        self._export_stats("component_stats", self._component_stats())
+
+    def _get_checkpoint(self):
+        """_get_checkpoint состояние компонента для восстановления после перезапуска
+        (см. supervisor.py), вызывается в рабочем цикле раз в checkpoint_interval_sec
+
+        Returns:
+            сериализуемое pickle состояние или None, если сохранять нечего
+            (состояние не изменилось или хранится самим компонентом на диске)
+        """
+        return None
+
+    def _restore_checkpoint(self, state):
+        """ восстановление состояния из контрольной точки после _init_resources """
+
+    def _save_checkpoint_if_due(self):
+        if self._checkpoint_q is None or not self.checkpoint_interval_sec:
+            return
+        now = monotonic()
+        if now < self._next_checkpoint_time:
+            return
+        self._next_checkpoint_time = now + self.checkpoint_interval_sec
+        state = self._get_checkpoint()
+        if state is not None:
+            self._checkpoint_q.put(state)
+
+    def _start_memory_trace(self, parameters: dict):
+        if self._allocation_tracker is not None:
+            self._log_message(LOG_ERROR, "отслеживание памяти уже включено")
+            return
+        self._allocation_tracker = AllocationTracker(parameters.get("frames", 1))
+        self._allocation_tracker.start()
+        self._log_message(LOG_INFO, "отслеживание выделений памяти включено")
+
+    def _take_memory_snapshot(self, parameters: dict):
+        if self._allocation_tracker is None:
+            self._log_message(LOG_ERROR, "снимок памяти не сделан, отслеживание не включено")
+            return
+        report = self._allocation_tracker.snapshot(parameters.get("top", 10))
+        for line in format_report(report):
+            self._log_message(LOG_INFO, line)
+        self._export_stats("memory_snapshot", report)
+
+    def _stop_memory_trace(self):
+        if self._allocation_tracker is not None:
+            self._allocation_tracker.stop()
+            self._allocation_tracker = None
+            self._log_message(LOG_INFO, "отслеживание выделений памяти выключено")
+
+    def _handle_control(self, request: ControlEvent):
+        """ Обработка управляющей команды, отличной от stop.
+
+        По умолчанию команда игнорируется, компоненты переопределяют метод
+        для поддержки собственных операций.
+        """
+        self._log_message(LOG_DEBUG, f"неизвестная управляющая команда {request.operation}")
+
+
+    def _create_events_q(self, queues_dir: QueuesDirectory, execution_mode: str):
+        """ создание очереди входящих событий компонента до её регистрации в каталоге """
+        maxsize = 0 if self.events_q_overflow_policies else self.events_q_maxsize
+        return queues_dir.create_queue(execution_mode, maxsize)
+
+    def _init_resources(self):
+        """ Создание тяжёлых ресурсов компонента (графика, карты, изображения).
+
+        Вызывается в начале run(), то есть уже в дочернем процессе: такие ресурсы
+        не создаются в родительском процессе и не передаются в дочерний
+        при запуске через spawn/forkserver. По умолчанию ничего не делает.
+        """
+
+    def _ensure_resources(self):
+        """ создание ресурсов компонента, если они ещё не созданы
+
+        Компонент-поток, перезапущенный после ошибки рабочего цикла, продолжает
+        работать с ресурсами прежнего запуска: они не освобождались (хранилища
+        и журналы закрываются только после нормального завершения цикла).
+        """
+        if not self._resources_ready:
+            self._init_resources()
+            self._resources_ready = True
 
     @abstractmethod
     def _check_events_q(self):
         pass
 
-    @abstractmethod
+    def _iteration(self):
+        """ Одна итерация рабочего цикла компонента.
+
+        Рабочий цикл не должен блокироваться внутри итерации: одни и те же
+        итерации выполняются как в отдельном процессе (см. run), так и в виде
+        задачи asyncio (см. src/system/async_runtime.py).
+
+        Returns:
+            True, если обработаны не все накопившиеся события и следующую
+            итерацию нужно начать без паузы
+        """
+        busy = self._check_events_q()
+        self._check_control_q()
+        return busy
+
+    def _idle_wait(self):
+        """ пауза между итерациями, когда необработанных событий не осталось """
+        if self._loop_interval_sec:
+            sleep(self._loop_interval_sec)
+        elif self._execution_mode == EXECUTION_MODE_THREAD:
+            # не занимаем GIL холостым циклом, пока нет событий
+            self._events_q.wait(self.thread_idle_wait_sec)
+
     def run(self):
-        pass
+        self._ensure_resources()
+        if self._restored_checkpoint is not None:
+            self._restore_checkpoint(self._restored_checkpoint)
+            self._restored_checkpoint = None
+
+        while self._quit is False:
+            if not self._iteration():
+                self._idle_wait()
+
+        if self._profiler is not None:
+            # компонент остановлен во время профилирования, профиль не теряем
+            self._stop_profiling()
+        # после нормального завершения цикла компонент освобождает ресурсы,
+        # следующий запуск создаёт их заново
+        self._resources_ready = False
+
+    def _run_thread(self):
+        try:
+            self.run()
+        except BaseException:
+            self._thread_failed = True
+            raise
+
+    def start(self):
+        if self._execution_mode == EXECUTION_MODE_THREAD:
+            self._thread_failed = False
+            self._thread = threading.Thread(target=self._run_thread, name=self.name, daemon=True)
+            self._thread.start()
+        else:
+            super().start()
+
+    def join(self, timeout=None):
+        if self._execution_mode == EXECUTION_MODE_THREAD:
+            if self._thread is not None:
+                self._thread.join(timeout)
+        else:
+            super().join(timeout)
+
+    def is_alive(self) -> bool:
+        if self._execution_mode == EXECUTION_MODE_THREAD:
+            return self._thread is not None and self._thread.is_alive()
+        return super().is_alive()
+
+    @property
+    def failed(self) -> bool:
+        """ рабочий цикл компонента завершился ошибкой """
+        if self._execution_mode == EXECUTION_MODE_THREAD:
+            return self._thread_failed and not self.is_alive()
+        return self._popen is not None and self.exitcode not in (None, 0)
+
+    def attach_supervisor(self, checkpoint_q: Queue):
+        """ очередь, в которую компонент отправляет контрольные точки (см. supervisor.py) """
+        self._checkpoint_q = checkpoint_q
+
+    def restart(self, checkpoint=None):
+        """restart повторный запуск завершившегося компонента
+
+        Очереди событий остаются прежними, управляющая очередь создаётся
+        заново: завершившийся процесс мог оставить её заблокированной.
+
+        Args:
+            checkpoint: контрольная точка для восстановления состояния
+                компонента-процесса; у компонента-потока состояние и ресурсы
+                сохранились в памяти и точка не используется
+        """
+        if self.is_alive():
+            raise RuntimeError("компонент ещё работает")
+        self._quit = False
+        self._control_q = self._queues_dir.create_queue(self._execution_mode)
+        if self._execution_mode != EXECUTION_MODE_THREAD:
+            self._restored_checkpoint = checkpoint
+            # объект Process запускается только один раз, поэтому сбрасываем его состояние
+            Process.close(self)
+            Process.__init__(self)
+        self.start()
 
     def stop(self):
-        self._control_q.put(ControlEvent(operation="stop"))
\ No newline at end of file
+        self._control_q.put(ControlEvent(operation="stop"))
+
+    def set_log_level(self, level: Optional[int] = None,
+                      categories: Optional[Dict[str, Optional[int]]] = None):
+        """set_log_level изменение уровня журнала работающего компонента
+
+        Args:
+            level (Optional[int]): новый уровень компонента, None - без изменений
+            categories (Optional[Dict[str, Optional[int]]]): уровни категорий
+                сообщений (LOG_CATEGORY_*), None вместо уровня - снова
+                уровень компонента
+        """
+        self._control_q.put(ControlEvent(
+            operation="set_log_level", parameters={"level": level, "categories": categories}))
+
+    def profile_start(self, mode: str = PROFILER_SAMPLING, directory: str = DEFAULT_PROFILE_DIR,
+                      interval_sec: float = DEFAULT_SAMPLING_INTERVAL_SEC):
+        """profile_start включение профилирования работающего компонента
+
+        Args:
+            mode (str): PROFILER_SAMPLING или PROFILER_DETERMINISTIC (см. profiling.py)
+            directory (str): каталог файла профиля, файл записывается по profile_stop
+            interval_sec (float): интервал выборок для PROFILER_SAMPLING
+        """
+        self._control_q.put(ControlEvent(
+            operation="profile_start",
+            parameters={"mode": mode, "directory": directory, "interval_sec": interval_sec}))
+
+    def profile_stop(self):
+        """ выключение профилирования и запись профиля в файл """
+        self._control_q.put(ControlEvent(operation="profile_stop"))
+
+    def memory_trace_start(self, frames: int = 1):
+        """memory_trace_start включение отслеживания выделений памяти (tracemalloc)
+
+        Args:
+            frames (int): глубина стека, сохраняемого для каждого выделения
+        """
+        self._control_q.put(ControlEvent(operation="memory_trace_start", parameters={"frames": frames}))
+
+    def memory_snapshot(self, top: int = 10):
+        """memory_snapshot снимок выделений памяти: строки кода с наибольшим
+        объёмом выделений и прирост после предыдущего снимка
+
+        Args:
+            top (int): число строк кода в отчёте
+        """
+        self._control_q.put(ControlEvent(operation="memory_snapshot", parameters={"top": top}))
+
+    def memory_trace_stop(self):
+        self._control_q.put(ControlEvent(operation="memory_trace_stop"))
\ No newline at end of file
@@ -0,0 +1,74 @@
+""" модуль журнала событий, прошедших через монитор безопасности
+
+Журнал - двоичный файл из заголовка и кадров: длина кадра (4 байта,
+little-endian) и pickle кортежа (время получения, событие, решение монитора).
+Кадр, недописанный при сбое, при чтении отбрасывается.
+"""
+import os
+import pickle
+import struct
+from dataclasses import dataclass
+from typing import Iterator
+
+from src.system.event_types import Event
+
+LOG_MAGIC = b"EVLOG1\n"
+_FRAME_HEADER = struct.Struct("<I")
+
+# решения монитора по событию
+DECISION_ALLOWED = "allowed"              # разрешено политиками и отправлено получателю
+DECISION_DENIED = "denied"                # запрещено политиками
+DECISION_BAD_SIGNATURE = "bad_signature"  # отклонено из-за неверной подписи
+
+
+@dataclass
+class EventLogRecord:
+    """ запись журнала событий """
+    timestamp: float  # время получения события монитором, сек. от эпохи Unix
+    event: Event
+    decision: str     # DECISION_ALLOWED, DECISION_DENIED или DECISION_BAD_SIGNATURE
+
+
+class EventLogWriter:
+    """ запись журнала событий, кадры сбрасываются на диск вызовом flush """
+
+    def __init__(self, path: str):
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if is_new:
+            self._file.write(LOG_MAGIC)
+
+    def write(self, timestamp: float, event: Event, decision: str):
+        frame = pickle.dumps((timestamp, event, decision), protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_FRAME_HEADER.pack(len(frame)))
+        self._file.write(frame)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_event_log(path: str) -> Iterator[EventLogRecord]:
+    """read_event_log чтение записей журнала событий по порядку
+
+    Args:
+        path (str): путь к журналу
+
+    Yields:
+        EventLogRecord: записи журнала
+    """
+    with open(path, "rb") as f:
+        if f.read(len(LOG_MAGIC)) != LOG_MAGIC:
+            raise ValueError(f"{path} не является журналом событий")
+        while True:
+            header = f.read(_FRAME_HEADER.size)
+            if len(header) < _FRAME_HEADER.size:
+                return
+            size, = _FRAME_HEADER.unpack(header)
+            frame = f.read(size)
+            if len(frame) < size:
+                # недописанный кадр
+                return
+            yield EventLogRecord(*pickle.loads(frame))
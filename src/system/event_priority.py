@@ -0,0 +1,52 @@
+""" классы приоритета событий для монитора безопасности
+
+Приоритет выводится из операции события по классификации данных,
+используемой в политиках безопасности (см. example_3.py):
+команды, меняющие высокоцелостные данные (параметры орбиты, запрещённые зоны),
+обрабатываются раньше визуализации, а та - раньше низкоцелостных данных
+(снимки, телеметрия). Приоритет не передаётся в самом событии, чтобы
+отправитель не мог повысить его для своих сообщений.
+"""
+from src.system.event_types import Event
+
+PRIORITY_CONTROL = 0    # высокоцелостные команды
+PRIORITY_NORMAL = 1     # прочие события (визуализация, служебные запросы)
+PRIORITY_TELEMETRY = 2  # низкоцелостные данные: снимки и телеметрия
+
+PRIORITY_LEVELS = (PRIORITY_CONTROL, PRIORITY_NORMAL, PRIORITY_TELEMETRY)
+
+HIGH_INTEGRITY_OPERATIONS = frozenset({
+    "change_orbit",
+    "add_zone",
+    "remove_zone",
+    "sync_zones",
+    "import_zones",
+})
+
+LOW_INTEGRITY_OPERATIONS = frozenset({
+    "request_photo",
+    "post_camera_coords",
+    "camera_update",
+    "post_photo",
+    "update_photo_map",
+    "send_data",
+    "update_orbit_data",
+    "orbit_telemetry",
+})
+
+
+def event_priority(event: Event) -> int:
+    """event_priority определяет класс приоритета события по его операции
+
+    Args:
+        event (Event): событие
+
+    Returns:
+        int: один из PRIORITY_LEVELS
+    """
+    operation = getattr(event, "operation", None)
+    if operation in HIGH_INTEGRITY_OPERATIONS:
+        return PRIORITY_CONTROL
+    if operation in LOW_INTEGRITY_OPERATIONS:
+        return PRIORITY_TELEMETRY
+    return PRIORITY_NORMAL
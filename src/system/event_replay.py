@@ -0,0 +1,138 @@
+""" модуль воспроизведения журнала событий через монитор безопасности
+
+EventReplayer подаёт записанные события (см. event_log.py) во входящую очередь
+монитора и выполняет итерации монитора в вызывающем потоке, сравнивая его
+решения с записанными. Разрешённые события монитор, как обычно, отправляет
+получателям: компоненты, зарегистрированные в том же каталоге очередей
+и запущенные до воспроизведения, обрабатывают их как при работе системы.
+
+Темп подачи:
+  * REPLAY_ORIGINAL - с исходными интервалами между событиями (ускоренными
+    в speed раз), для воспроизведения инцидентов;
+  * REPLAY_FAST - без пауз, для нагрузочных испытаний.
+"""
+from dataclasses import dataclass, field
+from time import perf_counter, sleep
+from typing import Dict, Iterable, List, Optional
+
+from src.system.event_log import EventLogRecord
+from src.system.event_types import Event
+from src.system.queues_dir import QueuesDirectory
+from src.system.security_monitor import BaseSecurityMonitor
+from src.system.config import EXECUTION_MODE_THREAD
+
+REPLAY_ORIGINAL = "original"
+REPLAY_FAST = "fast"
+
+
+@dataclass
+class DecisionDifference:
+    """ событие, решение по которому отличается от записанного """
+    index: int                # номер записи в журнале
+    event: Event
+    recorded: str
+    replayed: Optional[str]   # None - монитор не принял решения
+
+
+@dataclass
+class ReplayReport:
+    """ итоги воспроизведения журнала """
+    events: int
+    duration_sec: float
+    decisions: Dict[str, int] = field(default_factory=dict)  # число решений каждого вида
+    differences: List[DecisionDifference] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        """ событий в секунду """
+        return self.events / self.duration_sec if self.duration_sec > 0 else 0.0
+
+
+class _ReplayCapture:
+    """ сбор решений монитора по воспроизводимым событиям """
+
+    def __init__(self, sequence: Dict[int, int]):
+        # номер записи журнала по id события: в режиме потока события
+        # передаются монитору по ссылке
+        self._sequence = sequence
+        self.decisions: Dict[int, str] = {}
+
+    def write(self, timestamp: float, event: Event, decision: str):
+        index = self._sequence.get(id(event))
+        if index is not None:
+            self.decisions[index] = decision
+
+    def flush(self):
+        pass
+
+
+class EventReplayer:
+    """ воспроизведение журнала событий через монитор безопасности """
+
+    def __init__(self, monitor: BaseSecurityMonitor, queues_dir: QueuesDirectory,
+                 pacing: str = REPLAY_FAST, speed: float = 1.0):
+        """
+        Args:
+            monitor (BaseSecurityMonitor): монитор, созданный в режиме
+                EXECUTION_MODE_THREAD и не запущенный: его итерации выполняет
+                EventReplayer
+            queues_dir (QueuesDirectory): каталог очередей монитора
+            pacing (str): REPLAY_ORIGINAL или REPLAY_FAST
+            speed (float): ускорение исходного темпа для REPLAY_ORIGINAL
+        """
+        if monitor._execution_mode != EXECUTION_MODE_THREAD:
+            raise ValueError("монитор для воспроизведения должен работать в режиме потока")
+        if pacing not in (REPLAY_ORIGINAL, REPLAY_FAST):
+            raise ValueError(f"неизвестный темп воспроизведения {pacing}")
+        self._monitor = monitor
+        self._monitor_q = queues_dir.handle(monitor.event_source_name)
+        self._pacing = pacing
+        self._speed = speed
+
+    def _drain(self):
+        """ итерации монитора, пока в его очереди есть события """
+        while self._monitor._iteration():
+            pass
+
+    def replay(self, records: Iterable[EventLogRecord]) -> ReplayReport:
+        """replay воспроизведение записей журнала
+
+        Args:
+            records (Iterable[EventLogRecord]): записи, например read_event_log(path)
+
+        Returns:
+            ReplayReport: пропускная способность и расхождения решений
+        """
+        records = list(records)
+        capture = _ReplayCapture({id(record.event): index for index, record in enumerate(records)})
+        self._monitor.attach_capture(capture)
+
+        started = perf_counter()
+        try:
+            if self._pacing == REPLAY_FAST:
+                batch = self._monitor.events_per_iteration
+                for start in range(0, len(records), batch):
+                    for record in records[start:start + batch]:
+                        self._monitor_q.put(record.event)
+                    self._drain()
+            elif records:
+                first_timestamp = records[0].timestamp
+                for record in records:
+                    delay = (record.timestamp - first_timestamp) / self._speed \
+                        - (perf_counter() - started)
+                    if delay > 0:
+                        sleep(delay)
+                    self._monitor_q.put(record.event)
+                    self._drain()
+            duration = perf_counter() - started
+        finally:
+            self._monitor.attach_capture(None)
+
+        report = ReplayReport(events=len(records), duration_sec=duration)
+        for index, record in enumerate(records):
+            decision = capture.decisions.get(index)
+            report.decisions[decision] = report.decisions.get(decision, 0) + 1
+            if decision != record.decision:
+                report.differences.append(
+                    DecisionDifference(index, record.event, record.decision, decision))
+        return report
@@ -0,0 +1,184 @@
+""" модуль подписи событий и проверки подписей (HMAC-SHA256)
+
+Отправитель подписывает событие ключом, известным только ему и монитору
+безопасности, монитор проверяет подпись ключом источника события (event.source).
+Так компонент не может отправить событие от имени другого компонента.
+
+Для скорости:
+  * каноническое представление события - склейка полей без сериализации
+    всего объекта (см. _encode_value);
+  * внутреннее и внешнее состояния HMAC для ключа вычисляются один раз,
+    для каждого события копируются готовые состояния sha256;
+  * монитор создаёт EventSigner для источника один раз и переиспользует его.
+"""
+import dataclasses
+import hashlib
+import hmac
+import struct
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.system.event_types import Event
+
+_SEPARATOR = b"\x1f"
+
+
+def _encode_value(value) -> bytes:
+    """_encode_value однозначное двоичное представление значения параметров события
+
+    Каждое значение - метка типа и длина содержимого, контейнеры (списки, кортежи,
+    словари, dataclass) обходятся поэлементно. Массивы numpy записываются вместе
+    с описанием типа (dtype.descr) и формой: перестановка или переименование
+    полей записи меняет подпись. Значения других типов не подписываются.
+
+    Raises:
+        TypeError: тип значения не поддерживается
+    """
+    parts = []
+    _encode_into(value, parts)
+    return b"".join(parts)
+
+
+def _chunk(tag: bytes, payload: bytes) -> bytes:
+    return tag + struct.pack("<Q", len(payload)) + payload
+
+
+def _encode_into(value, parts: list):
+    if value is None:
+        parts.append(b"N")
+    elif isinstance(value, (bool, np.bool_)):
+        parts.append(b"T" if value else b"F")
+    elif isinstance(value, (np.ndarray, np.generic)):
+        array = np.ascontiguousarray(value)
+        if array.dtype.hasobject:
+            raise TypeError("массив объектов python не подписывается")
+        header = repr((array.dtype.descr, array.shape)).encode()
+        parts.append(_chunk(b"A", header))
+        parts.append(_chunk(b"a", array.tobytes()))
+    elif isinstance(value, int):
+        parts.append(_chunk(b"i", str(value).encode()))
+    elif isinstance(value, float):
+        # repr числа python - кратчайшая запись, однозначно задающая значение
+        parts.append(_chunk(b"f", repr(value).encode()))
+    elif isinstance(value, str):
+        parts.append(_chunk(b"s", value.encode()))
+    elif isinstance(value, (bytes, bytearray)):
+        parts.append(_chunk(b"b", bytes(value)))
+    elif isinstance(value, (list, tuple)):
+        parts.append(_chunk(b"L" if isinstance(value, list) else b"U", struct.pack("<Q", len(value))))
+        for item in value:
+            _encode_into(item, parts)
+    elif isinstance(value, dict):
+        # порядок ключей сохраняется при передаче события между процессами
+        parts.append(_chunk(b"D", struct.pack("<Q", len(value))))
+        for key, item in value.items():
+            _encode_into(key, parts)
+            _encode_into(item, parts)
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        fields = dataclasses.fields(value)
+        parts.append(_chunk(b"C", type(value).__qualname__.encode()))
+        parts.append(struct.pack("<Q", len(fields)))
+        for field in fields:
+            _encode_into(field.name, parts)
+            _encode_into(getattr(value, field.name), parts)
+    else:
+        raise TypeError(f"значение типа {type(value).__name__} не подписывается")
+
+
+def canonical_bytes(event: Event) -> bytes:
+    """canonical_bytes каноническое представление подписываемых полей события
+
+    Args:
+        event (Event): событие
+
+    Returns:
+        bytes: байты для вычисления подписи
+    """
+    data = _SEPARATOR.join((
+        str(event.source).encode(),
+        str(event.destination).encode(),
+        str(event.operation).encode(),
+        _encode_value(event.parameters),
+        _encode_value(event.extra_parameters),
+    ))
+    if event.satellite_id is not None:
+        # спутник подписывается, чтобы команду нельзя было перенаправить другому;
+        # подписи событий без спутника (и записанные ранее журналы) не меняются
+        data += _SEPARATOR + str(event.satellite_id).encode()
+    return data
+
+
+_BLOCK_SIZE = hashlib.sha256().block_size
+_INNER_PAD = bytes(x ^ 0x36 for x in range(256))
+_OUTER_PAD = bytes(x ^ 0x5C for x in range(256))
+
+
+class EventSigner:
+    """ подпись и проверка событий одним ключом """
+
+    def __init__(self, key: bytes):
+        # HMAC по RFC 2104: состояния sha256 после блоков ключа с ipad и opad
+        # вычисляются один раз и копируются для каждого события
+        if len(key) > _BLOCK_SIZE:
+            key = hashlib.sha256(key).digest()
+        key = key.ljust(_BLOCK_SIZE, b"\0")
+        self._inner = hashlib.sha256(key.translate(_INNER_PAD))
+        self._outer = hashlib.sha256(key.translate(_OUTER_PAD))
+
+    def signature(self, event: Event) -> str:
+        inner = self._inner.copy()
+        inner.update(canonical_bytes(event))
+        outer = self._outer.copy()
+        outer.update(inner.digest())
+        return outer.hexdigest()
+
+    def sign(self, event: Event) -> Event:
+        """ записывает подпись в событие и возвращает его """
+        event.signature = self.signature(event)
+        return event
+
+    def verify(self, event: Event) -> bool:
+        if not event.signature:
+            return False
+        try:
+            signature = self.signature(event)
+        except TypeError:
+            # параметры, которые нельзя подписать, не могли быть подписаны и отправителем
+            return False
+        return hmac.compare_digest(signature, event.signature)
+
+
+class SignatureVerifier:
+    """ проверка подписей событий ключами их источников """
+
+    def __init__(self, keys: Dict[str, bytes]):
+        self._keys = dict(keys)
+        # EventSigner создаются при первом событии источника
+        self._signers: Dict[str, Optional[EventSigner]] = {}
+
+    def _signer(self, source: str) -> Optional[EventSigner]:
+        try:
+            return self._signers[source]
+        except KeyError:
+            key = self._keys.get(source)
+            signer = self._signers[source] = EventSigner(key) if key is not None else None
+            return signer
+
+    def verify(self, event: Event) -> bool:
+        """ проверка подписи события ключом его источника """
+        source = event.source
+        signer = self._signers[source] if source in self._signers else self._signer(source)
+        return signer is not None and signer.verify(event)
+
+    def verify_batch(self, events: Iterable[Event]) -> List[bool]:
+        """verify_batch проверка подписей пачки событий
+
+        Args:
+            events (Iterable[Event]): события, выбранные из очереди за итерацию
+
+        Returns:
+            List[bool]: результат проверки для каждого события, события источников
+                без ключа считаются неподписанными
+        """
+        return [self.verify(event) for event in events]
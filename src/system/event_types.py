@@ -14,9 +14,12 @@ class Event:
     extra_parameters: Any = None      # доп. параметры
     signature: Optional[str] = None   # цифровая подпись или аналог\
                                       # для проверки целостности и аутентичности сообщения
+    satellite_id: Optional[str] = None  # спутник, к которому относится событие, \
+    # None - единственный спутник системы (см. QueuesDirectory.route)
 
 
 @dataclass
 class ControlEvent:
     """ формат управляющих команд для сущностей (например, для остановки работы) """
     operation: str  # код операции
+    parameters: Any = None  # параметры операции
@@ -0,0 +1,145 @@
+""" модуль пула кадров в разделяемой памяти
+
+Снимки камеры не передаются через очереди событий: камера записывает кадр
+в свободную ячейку пула в разделяемой памяти, а событие несёт только
+FrameHandle (в extra_parameters). Получатели читают кадр из той же памяти
+без копирования.
+
+Ячейка занята, пока её счётчик ссылок больше нуля:
+  * allocate выдаёт ячейку со счётчиком refs;
+  * отправитель, пересылающий кадр нескольким получателям, увеличивает
+    счётчик (retain) на число дополнительных получателей;
+  * каждый получатель, а также монитор безопасности при отказе в пересылке,
+    уменьшают счётчик (release), когда кадр больше не нужен.
+Номер поколения ячейки меняется при каждой выдаче, поэтому устаревший
+FrameHandle не даёт доступа к чужому кадру и не освобождает его.
+
+Пул создаётся в основном процессе до запуска компонентов и регистрируется
+в каталоге очередей (QueuesDirectory.register_frame_pool), откуда его
+получают компоненты в своих процессах.
+"""
+import multiprocessing as mp
+import os
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class FrameHandle:
+    """ ссылка на кадр в пуле """
+    pool: str          # имя пула в каталоге очередей
+    slot: int          # номер ячейки
+    generation: int    # поколение ячейки на момент выдачи
+    shape: tuple       # форма кадра
+    dtype: str         # тип элементов кадра
+
+
+class SharedFramePool:
+    """ пул ячеек одинакового размера в разделяемой памяти """
+
+    def __init__(self, name: str, slots: int, slot_bytes: int):
+        """
+        Args:
+            name (str): имя пула, под которым он регистрируется в каталоге очередей
+            slots (int): число ячеек
+            slot_bytes (int): размер ячейки в байтах
+        """
+        self.name = name
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._owner_pid = os.getpid()
+        # счётчики ссылок и поколения ячеек, изменяются под общей блокировкой
+        self._lock = mp.Lock()
+        self._refcounts = mp.Array("q", slots, lock=False)
+        self._generations = mp.Array("q", slots, lock=False)
+        # ячейка, с которой начинается поиск свободной
+        self._cursor = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shm"] = self._shm.name
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # процессы компонентов используют resource_tracker основного процесса,
+        # поэтому память удаляется только при закрытии пула его создателем
+        self._shm = shared_memory.SharedMemory(name=state["_shm"])
+
+    def allocate(self, shape: tuple, dtype=np.uint8, refs: int = 1) \
+            -> Optional[Tuple[FrameHandle, np.ndarray]]:
+        """allocate выдача свободной ячейки под кадр
+
+        Args:
+            shape (tuple): форма кадра
+            dtype: тип элементов кадра
+            refs (int): начальное значение счётчика ссылок
+
+        Returns:
+            Optional[Tuple[FrameHandle, np.ndarray]]: ссылка на кадр и массив
+                для его записи или None, если свободных ячеек нет
+        """
+        dtype = np.dtype(dtype)
+        if int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"кадр {shape} {dtype} не помещается в ячейку {self.slot_bytes} байт")
+
+        with self._lock:
+            for offset in range(self.slots):
+                slot = (self._cursor + offset) % self.slots
+                if self._refcounts[slot] == 0:
+                    break
+            else:
+                return None
+            self._refcounts[slot] = refs
+            self._generations[slot] += 1
+            generation = self._generations[slot]
+        self._cursor = (slot + 1) % self.slots
+
+        handle = FrameHandle(self.name, slot, generation, tuple(shape), dtype.str)
+        return handle, self._array(handle)
+
+    def _array(self, handle: FrameHandle) -> np.ndarray:
+        return np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=self._shm.buf,
+                          offset=handle.slot * self.slot_bytes)
+
+    def _is_current(self, handle: FrameHandle) -> bool:
+        return self._generations[handle.slot] == handle.generation and self._refcounts[handle.slot] > 0
+
+    def view(self, handle: FrameHandle) -> Optional[np.ndarray]:
+        """ кадр без копирования или None, если ссылка устарела """
+        with self._lock:
+            if not self._is_current(handle):
+                return None
+        return self._array(handle)
+
+    def retain(self, handle: FrameHandle, count: int = 1) -> bool:
+        """ увеличение счётчика ссылок, False - ссылка устарела """
+        with self._lock:
+            if not self._is_current(handle):
+                return False
+            self._refcounts[handle.slot] += count
+            return True
+
+    def release(self, handle: FrameHandle):
+        """ уменьшение счётчика ссылок, при нуле ячейка становится свободной """
+        with self._lock:
+            if self._is_current(handle):
+                self._refcounts[handle.slot] -= 1
+
+    def free_slots(self) -> int:
+        with self._lock:
+            return sum(1 for count in self._refcounts if count == 0)
+
+    def close(self):
+        """ отключение от разделяемой памяти, создатель пула её удаляет """
+        try:
+            self._shm.close()
+        except BufferError:
+            # в процессе ещё есть массивы поверх памяти, она освободится вместе с ними
+            pass
+        if os.getpid() == self._owner_pid:
+            self._shm.unlink()
@@ -0,0 +1,89 @@
+""" модуль учёта памяти компонентов
+
+  * rss_bytes - резидентная память процесса, дёшево читается
+    из /proc/self/statm и годится для периодического опроса;
+  * AllocationTracker - снимки выделений памяти средствами tracemalloc:
+    строки кода, выделившие больше всего памяти, и прирост относительно
+    предыдущего снимка. Отслеживание замедляет выделение памяти, поэтому
+    включается только по команде (см. BaseCustomProcess.memory_trace_start).
+
+tracemalloc работает на весь процесс: у компонентов-потоков и в среде asyncio
+снимок включает выделения всех компонентов процесса.
+"""
+import os
+import resource
+import tracemalloc
+from typing import List, Optional
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    """ резидентная память текущего процесса, байт """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        # вне Linux доступен только пиковый размер (ru_maxrss в КиБ)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class AllocationTracker:
+    """ снимки выделений памяти процесса """
+
+    def __init__(self, frames: int = 1):
+        """
+        Args:
+            frames (int): глубина стека, сохраняемого для каждого выделения
+        """
+        self._frames = frames
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        # tracemalloc мог быть включён до нас, тогда его не выключаем
+        self._started_here = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self._frames)
+            self._started_here = True
+
+    def snapshot(self, top: int = 10) -> dict:
+        """snapshot снимок выделений памяти
+
+        Args:
+            top (int): число строк кода в отчёте
+
+        Returns:
+            dict: {"traced_bytes": int, "top": [...], "diff": [...]} - строки
+                с наибольшим объёмом выделений и с наибольшим приростом
+                после предыдущего снимка (пусто для первого снимка)
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        report = {
+            "traced_bytes": tracemalloc.get_traced_memory()[0],
+            "top": [str(stat) for stat in snapshot.statistics("lineno")[:top]],
+            "diff": [],
+        }
+        if self._previous is not None:
+            report["diff"] = [
+                str(stat) for stat in snapshot.compare_to(self._previous, "lineno")[:top]]
+        self._previous = snapshot
+        return report
+
+    def stop(self):
+        self._previous = None
+        if self._started_here:
+            tracemalloc.stop()
+            self._started_here = False
+
+
+def format_report(report: dict) -> List[str]:
+    """ строки отчёта снимка для журнала """
+    lines = [f"отслеживается {report['traced_bytes'] / 2**20:.1f} МиБ, больше всего выделено:"]
+    lines.extend(f"  {line}" for line in report["top"])
+    if report["diff"]:
+        lines.append("прирост после предыдущего снимка:")
+        lines.extend(f"  {line}" for line in report["diff"])
+    return lines
@@ -0,0 +1,98 @@
+""" модуль хранилища политик безопасности и кэша решений монитора """
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from src.system.security_policy_type import SecurityPolicy
+
+# ключ политики и решения: (source, destination, operation)
+PolicyKey = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class PolicySet:
+    """ неизменяемый набор политик безопасности с номером версии """
+    version: int
+    rules: FrozenSet[PolicyKey]
+
+    def allows(self, source: str, destination: str, operation: str) -> bool:
+        return (source, destination, operation) in self.rules
+
+
+class PolicyStore:
+    """ хранилище текущего набора политик
+
+    Набор политик не меняется на месте: reload() создаёт новый PolicySet
+    со следующим номером версии и заменяет ссылку на него одним присваиванием,
+    поэтому проверка события всегда видит либо старый, либо новый набор целиком.
+    """
+
+    def __init__(self, policies: Iterable[SecurityPolicy] = ()):
+        self._current = PolicySet(version=0, rules=self._rules(policies))
+
+    @staticmethod
+    def _rules(policies: Iterable[SecurityPolicy]) -> FrozenSet[PolicyKey]:
+        return frozenset(
+            (policy.source, policy.destination, policy.operation) for policy in policies)
+
+    @property
+    def current(self) -> PolicySet:
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    def reload(self, policies: Iterable[SecurityPolicy]) -> PolicySet:
+        """reload атомарная замена набора политик
+
+        Args:
+            policies (Iterable[SecurityPolicy]): новый набор политик
+
+        Returns:
+            PolicySet: новый текущий набор политик
+        """
+        self._current = PolicySet(
+            version=self._current.version + 1, rules=self._rules(policies))
+        return self._current
+
+
+class DecisionCache:
+    """ ограниченный кэш решений монитора с вытеснением давно не использованных (LRU)
+
+    Ключ решения - (source, destination, operation, версия политик), поэтому
+    после замены политик старые решения не используются, даже если кэш
+    ещё не очищен.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._decisions: "OrderedDict[tuple, bool]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._decisions)
+
+    def get(self, key: tuple) -> Optional[bool]:
+        """ сохранённое решение или None, если решения для ключа нет """
+        try:
+            decision = self._decisions[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._decisions.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def put(self, key: tuple, decision: bool):
+        self._decisions[key] = decision
+        self._decisions.move_to_end(key)
+        if len(self._decisions) > self.maxsize:
+            self._decisions.popitem(last=False)
+
+    def clear(self):
+        self._decisions.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._decisions), "hits": self.hits, "misses": self.misses}
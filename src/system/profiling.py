@@ -0,0 +1,119 @@
+""" модуль профилирования работающих компонентов
+
+Профилирование включается и выключается управляющими командами
+profile_start и profile_stop (см. BaseCustomProcess.profile_start), без
+перезапуска компонента. Профилируется поток, в котором выполняется рабочий
+цикл компонента; в среде asyncio это общий поток всех компонентов.
+
+Профилировщики:
+  * PROFILER_DETERMINISTIC - cProfile, точные счётчики вызовов и время
+    функций, заметно замедляет компонент. Результат - файл .prof для pstats
+    или snakeviz;
+  * PROFILER_SAMPLING - фоновый поток через равные интервалы снимает стек
+    рабочего потока (sys._current_frames), накладные расходы малы.
+    Результат - файл .folded: строки "функция;функция;... число выборок"
+    для построения flame graph.
+"""
+import cProfile
+import os
+import sys
+import threading
+from collections import Counter
+from itertools import count
+from time import localtime, strftime, time
+
+PROFILER_DETERMINISTIC = "cprofile"
+PROFILER_SAMPLING = "sampling"
+
+DEFAULT_PROFILE_DIR = "./profiles"
+DEFAULT_SAMPLING_INTERVAL_SEC = 0.005
+
+# номера профилей процесса: имена не совпадают при остановках в одну миллисекунду
+_profile_numbers = count()
+
+
+class DeterministicProfiler:
+    """ профилирование потока компонента средствами cProfile """
+    file_extension = ".prof"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        # cProfile профилирует поток, в котором вызван enable
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def save(self, path: str):
+        self._profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """ выборочное профилирование потока компонента """
+    file_extension = ".folded"
+
+    def __init__(self, interval_sec: float = DEFAULT_SAMPLING_INTERVAL_SEC):
+        self._interval_sec = interval_sec
+        self._thread_id = None
+        self._stacks = Counter()
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _sample(self):
+        while not self._stop_event.wait(self._interval_sec):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(self._frame_name(frame))
+                frame = frame.f_back
+            self._stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        # профилируется поток, в котором вызван start
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._sampler.join()
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def create_profiler(mode: str, interval_sec: float = DEFAULT_SAMPLING_INTERVAL_SEC):
+    """create_profiler профилировщик заданного вида
+
+    Args:
+        mode (str): PROFILER_DETERMINISTIC или PROFILER_SAMPLING
+        interval_sec (float): интервал выборок для PROFILER_SAMPLING
+
+    Returns:
+        профилировщик с методами start(), stop() и save(path)
+    """
+    if mode == PROFILER_DETERMINISTIC:
+        return DeterministicProfiler()
+    if mode == PROFILER_SAMPLING:
+        return SamplingProfiler(interval_sec)
+    raise ValueError(f"неизвестный вид профилировщика {mode}")
+
+
+def profile_path(directory: str, component: str, profiler) -> str:
+    """ путь файла профиля: компонент, процесс, время остановки (до миллисекунд) и номер профиля """
+    os.makedirs(directory, exist_ok=True)
+    now = time()
+    stamp = f"{strftime('%Y%m%d-%H%M%S', localtime(now))}.{int(now * 1000) % 1000:03d}"
+    name = f"{component}-{os.getpid()}-{stamp}-{next(_profile_numbers)}{profiler.file_extension}"
+    return os.path.join(directory, name)
@@ -1,8 +1,291 @@
 """ модуль каталога очередей сообщений """
+import asyncio
+import os
+import queue
+from collections import deque
+from dataclasses import dataclass
 from multiprocessing import Queue
-from typing import Union
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Union
 
-from src.system.config import CRITICALITY_STR, DEFAULT_LOG_LEVEL, LOG_ERROR, LOG_INFO
+from src.system.config import CRITICALITY_STR, DEFAULT_LOG_LEVEL, LOG_ERROR, LOG_INFO, \
+    EXECUTION_MODE_THREAD, EXECUTION_MODE_PROCESS, PER_SATELLITE_QUEUE_NAMES, \
+    OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE
+from src.system.socket_transport import Address, SocketQueue
+
+
+def satellite_queue_name(name: str, satellite_id: Optional[str]) -> str:
+    """ имя очереди компонента name, обслуживающего один спутник satellite_id """
+    return name if satellite_id is None else f"{name}:{satellite_id}"
+
+
+class LocalQueue:
+    """ очередь компонента, работающего в потоке основного процесса
+
+    События от отправителей из того же процесса попадают в queue.Queue
+    и передаются по ссылке, без сериализации. События от компонентов-процессов
+    попадают в multiprocessing.Queue. Порядок событий сохраняется
+    для каждого отправителя.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self._owner_pid = os.getpid()
+        self._maxsize = maxsize
+        self._local = queue.Queue(maxsize)
+        self._remote = Queue(maxsize)
+        # события, полученные при ожидании в wait(), но ещё не выданные
+        self._pending = deque()
+
+    def __getstate__(self):
+        # в другой процесс передаётся только межпроцессная часть очереди
+        return {"_owner_pid": self._owner_pid, "_maxsize": self._maxsize, "_remote": self._remote}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = queue.Queue(self._maxsize)
+        self._pending = deque()
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        if os.getpid() == self._owner_pid:
+            self._local.put(item, block, timeout)
+        else:
+            self._remote.put(item, block, timeout)
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
+
+    def get_nowait(self) -> Any:
+        if self._pending:
+            return self._pending.popleft()
+        try:
+            return self._local.get_nowait()
+        except queue.Empty:
+            return self._remote.get_nowait()
+
+    def empty(self) -> bool:
+        return not self._pending and self._local.empty() and self._remote.empty()
+
+    def wait(self, timeout: float):
+        """ ожидание событий от отправителей из того же процесса, не дольше timeout секунд """
+        if not self.empty():
+            return
+        try:
+            self._pending.append(self._local.get(timeout=timeout))
+        except queue.Empty:
+            pass
+
+
+class OverflowQueue:
+    """ ограниченная очередь с политиками переполнения для отдельных операций
+
+    События с политикой OVERFLOW_BLOCK (по умолчанию - все операции, для которых
+    политика не задана) идут в основную очередь и никогда не теряются. Основная
+    очередь компонентов не ограничена (см. BaseCustomProcess.events_q_maxsize),
+    поэтому отправитель не ждёт и обратного давления на монитор безопасности
+    нет; ждать он будет, только если основную очередь ограничить при
+    регистрации вручную. События с политиками OVERFLOW_DROP_OLDEST
+    и OVERFLOW_COALESCE идут в отдельную ограниченную очередь: при её переполнении
+    вытесняется самое старое из них, а при выборке из событий с одинаковыми
+    (source, satellite_id, operation) и политикой OVERFLOW_COALESCE остаётся
+    только последнее.
+
+    События основной очереди выдаются получателю первыми, поэтому порядок
+    поступления между очередями не сохраняется: вытесняемое событие может
+    быть выдано после события основной очереди, отправленного позже него.
+    Порядок сохраняется внутри каждой из очередей. Политики вытеснения
+    задаются для операций, которые не зависят от порядка относительно
+    остальных (например, последние координаты спутника).
+    """
+
+    def __init__(self, queue, overflow_queue, overflow_policies: Dict[str, str]):
+        self._queue = queue
+        self._overflow_queue = overflow_queue
+        self._policies = dict(overflow_policies)
+        # события вытесняемой очереди, уже прошедшие слияние, но ещё не выданные
+        self._pending = deque()
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        policy = self._policies.get(getattr(item, "operation", None), OVERFLOW_BLOCK)
+        if policy == OVERFLOW_BLOCK:
+            self._queue.put(item, block, timeout)
+            return
+
+        while True:
+            try:
+                self._overflow_queue.put_nowait(item)
+                return
+            except queue.Full:
+                # освобождаем место, вытесняя самое старое событие
+                try:
+                    self._overflow_queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
+
+    def _drain_overflow_queue(self):
+        items = []
+        while True:
+            try:
+                items.append(self._overflow_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        latest = {}
+        for index, item in enumerate(items):
+            if self._policies.get(item.operation) == OVERFLOW_COALESCE:
+                latest[(item.source, item.satellite_id, item.operation)] = index
+
+        self._pending.extend(
+            item for index, item in enumerate(items)
+            if latest.get((item.source, item.satellite_id, item.operation), index) == index)
+
+    def get_nowait(self) -> Any:
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        if not self._pending:
+            self._drain_overflow_queue()
+        if self._pending:
+            return self._pending.popleft()
+        raise queue.Empty
+
+    def empty(self) -> bool:
+        return not self._pending and self._queue.empty() and self._overflow_queue.empty()
+
+    def bind(self, loop):
+        """ привязка очередей к циклу событий asyncio (см. async_runtime) """
+        self._queue.bind(loop)
+        self._overflow_queue.bind(loop)
+
+    def wait(self, timeout: float):
+        """ ожидание событий в основной очереди, если вытесняемая очередь пуста """
+        if self._pending or not self._overflow_queue.empty():
+            return self._queue.wait(0)
+        return self._queue.wait(timeout)
+
+
+class PriorityLanesQueue:
+    """ очередь с отдельными полосами для классов приоритета событий
+
+    Отправитель кладёт событие в полосу его класса (функция lane_of), поэтому
+    высокоприоритетные события не стоят в общей очереди за потоком
+    низкоприоритетных уже на стороне отправителя. Порядок выборки из полос
+    определяет получатель (см. BaseSecurityMonitor).
+    """
+
+    def __init__(self, lanes: list, lane_of):
+        self._lanes = lanes
+        self._lane_of = lane_of
+        # событие верхней полосы, полученное при ожидании в wait(), но ещё не выданное
+        self._pending = deque()
+
+    @property
+    def lanes_count(self) -> int:
+        return len(self._lanes)
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        self._lanes[self._lane_of(item)].put(item, block, timeout)
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
+
+    def get_nowait(self, lane: Optional[int] = None) -> Any:
+        """ выборка из заданной полосы или из первой непустой в порядке приоритета """
+        if lane is not None:
+            if lane == 0 and self._pending:
+                return self._pending.popleft()
+            return self._lanes[lane].get_nowait()
+
+        for index in range(len(self._lanes)):
+            try:
+                return self.get_nowait(index)
+            except queue.Empty:
+                continue
+        raise queue.Empty
+
+    def empty(self) -> bool:
+        return not self._pending and all(lane.empty() for lane in self._lanes)
+
+    def bind(self, loop):
+        """ привязка полос к циклу событий asyncio (см. async_runtime) """
+        for lane in self._lanes:
+            lane.bind(loop)
+
+    def wait(self, timeout: float):
+        """ ожидание события верхней полосы, не дольше timeout секунд
+
+        Полосы-очереди asyncio (см. async_runtime) ожидаются все сразу:
+        вызов возвращает сопрограмму, которая завершается с первым событием
+        любой полосы.
+        """
+        top_lane = self._lanes[0]
+        if asyncio.iscoroutinefunction(getattr(top_lane, "wait", None)):
+            return self._wait_async(timeout)
+        if self._pending:
+            return
+        if hasattr(top_lane, "wait"):
+            top_lane.wait(timeout)
+            return
+        try:
+            self._pending.append(top_lane.get(timeout=timeout))
+        except queue.Empty:
+            pass
+
+    async def _wait_async(self, timeout: float):
+        if self._pending:
+            await asyncio.sleep(0)
+            return
+        waiters = [asyncio.ensure_future(lane.wait(timeout)) for lane in self._lanes]
+        _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in pending:
+            waiter.cancel()
+
+
+@dataclass(frozen=True)
+class DirectorySnapshot:
+    """ неизменяемый снимок каталога очередей """
+    version: int                    # версия каталога, растёт при каждой регистрации
+    queues: Mapping[str, Any]       # очереди по именам (только для чтения)
+
+
+class QueueHandle:
+    """ ссылка отправителя на очередь получателя
+
+    Очередь находится по снимку каталога один раз и запоминается; повторно
+    она ищется, только если версия каталога изменилась (например, получатель
+    зарегистрирован после создания ссылки). Ссылка истинна, если очередь найдена.
+    """
+    __slots__ = ("name", "_directory", "_version", "_queue")
+
+    def __init__(self, directory: "QueuesDirectory", name: str):
+        self.name = name
+        self._directory = directory
+        self._version = -1
+        self._queue = None
+
+    @property
+    def queue(self):
+        if self._version != self._directory.version:
+            snapshot = self._directory.snapshot()
+            self._queue = snapshot.queues.get(self.name)
+            self._version = snapshot.version
+        return self._queue
+
+    def __bool__(self) -> bool:
+        return self.queue is not None
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        q = self.queue
+        if q is None:
+            raise KeyError(f"очередь {self.name} не зарегистрирована")
+        q.put(item, block, timeout)
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
 
 
 class QueuesDirectory:
@@ -15,6 +298,19 @@ class QueuesDirectory:
 
         # словарь с очередями компонентов
         self.queues = {}
+        # версия каталога и снимок для неё (см. snapshot)
+        self.version = 0
+        self._snapshot = None
+        # ссылки отправителей на очереди по именам (см. handle)
+        self._handles = {}
+        # пулы кадров в разделяемой памяти (см. frame_pool.py)
+        self.frame_pools = {}
+
+    def __getstate__(self):
+        # снимок (MappingProxyType) не сериализуется, в другом процессе он создаётся заново
+        state = self.__dict__.copy()
+        state["_snapshot"] = None
+        return state
 
     def _log_message(self, criticality: int, message: str):
         """_log_message печатает сообщение заданного уровня критичности
@@ -26,15 +322,131 @@ class QueuesDirectory:
         if criticality <= self.log_level:
             print(f"[{CRITICALITY_STR[criticality]}]{self.log_prefix} {message}")
 
-    def register(self, queue: Queue, name: str):
+    def create_queue(
+            self,
+            execution_mode: str = EXECUTION_MODE_PROCESS,
+            maxsize: int = 0) -> Union[Queue, LocalQueue]:
+        """create_queue создаёт очередь для компонента системы
+
+        Args:
+            execution_mode (str): режим исполнения компонента-получателя
+            maxsize (int): максимальный размер очереди, 0 - без ограничения
+
+        Returns:
+            Union[Queue, LocalQueue]: очередь сообщений, тип которой соответствует
+                среде исполнения компонента
+        """
+        if execution_mode == EXECUTION_MODE_THREAD:
+            return LocalQueue(maxsize)
+        return Queue(maxsize)
+
+    def register(
+            self,
+            queue: Queue,
+            name: str,
+            maxsize: int = 0,
+            overflow_policies: Optional[Dict[str, str]] = None):
         """register регистрация очереди с заданным именем
 
         Args:
             queue (Queue): очередь
             name (str): имя
+            maxsize (int): размер очереди для вытесняемых событий, 0 - без ограничения
+            overflow_policies (Optional[Dict[str, str]]): политики переполнения
+                по операциям (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE),
+                операции без политики не вытесняются
+
+        Returns:
+            очередь, зарегистрированная в каталоге: переданная очередь
+            или OverflowQueue поверх неё, если заданы политики переполнения
         """
         self._log_message(LOG_INFO, f"регистрируем очередь {name}")
+        if overflow_policies:
+            execution_mode = EXECUTION_MODE_THREAD if isinstance(queue, LocalQueue) \
+                else EXECUTION_MODE_PROCESS
+            queue = OverflowQueue(
+                queue=queue,
+                overflow_queue=self.create_queue(execution_mode, maxsize),
+                overflow_policies=overflow_policies)
         self.queues[name] = queue
+        self.version += 1
+        return queue
+
+    def register_endpoint(self, name: str, address: Address, auth_key: bytes):
+        """register_endpoint регистрация удалённой очереди, доступной через сокет
+
+        Args:
+            name (str): имя
+            address (Address): ("host", port) для TCP или путь Unix-сокета
+            auth_key (bytes): общий ключ узлов, которым подписываются кадры
+        """
+        self._log_message(LOG_INFO, f"очередь {name} находится на узле {address}")
+        self.register(queue=SocketQueue(address, auth_key), name=name)
+
+    def register_frame_pool(self, pool):
+        """register_frame_pool регистрация пула кадров под его именем
+
+        Пул регистрируется до запуска компонентов, которые его используют.
+
+        Args:
+            pool (SharedFramePool): пул кадров
+        """
+        self._log_message(LOG_INFO, f"регистрируем пул кадров {pool.name}")
+        self.frame_pools[pool.name] = pool
+
+    def get_frame_pool(self, name: str):
+        """ пул кадров с указанным именем или None """
+        return self.frame_pools.get(name)
+
+    def snapshot(self) -> DirectorySnapshot:
+        """ снимок каталога текущей версии, создаётся заново только после регистрации """
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self.version:
+            snapshot = self._snapshot = DirectorySnapshot(
+                self.version, MappingProxyType(dict(self.queues)))
+        return snapshot
+
+    def handle(self, name: str) -> QueueHandle:
+        """handle ссылка отправителя на очередь с указанным именем
+
+        Ссылки создаются один раз для каждого имени и используются вместо
+        get_queue на каждое событие: очередь ищется заново, только если
+        каталог изменился. Отсутствие очереди не считается ошибкой,
+        отправитель проверяет ссылку (bool(handle)) сам.
+
+        Args:
+            name (str): имя очереди
+
+        Returns:
+            QueueHandle: ссылка на очередь
+        """
+        try:
+            return self._handles[name]
+        except KeyError:
+            handle = self._handles[name] = QueueHandle(self, name)
+            return handle
+
+    def route(self, name: str, satellite_id: Optional[str]) -> QueueHandle:
+        """route ссылка на очередь получателя события спутника
+
+        Компоненты, которые есть у каждого спутника (PER_SATELLITE_QUEUE_NAMES,
+        симулятор спутника), регистрируют очередь под именем
+        satellite_queue_name(name, satellite_id), общие для всех спутников
+        компоненты - под именем name. Событие неизвестного спутника не передаётся
+        в общую очередь: иначе его выполнил бы спутник без идентификатора.
+
+        Args:
+            name (str): имя получателя (Event.destination)
+            satellite_id (Optional[str]): спутник (Event.satellite_id)
+
+        Returns:
+            QueueHandle: ссылка на очередь спутника для получателя из
+                PER_SATELLITE_QUEUE_NAMES (ложная, если спутник не зарегистрирован),
+                иначе на общую очередь
+        """
+        if satellite_id is not None and name in PER_SATELLITE_QUEUE_NAMES:
+            return self.handle(satellite_queue_name(name, satellite_id))
+        return self.handle(name)
 
     def get_queue(self, name:str) -> Union[Queue, None]:
         """get_queue выдаёт из каталога очередь с указанным именем
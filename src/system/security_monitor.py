@@ -2,15 +2,24 @@
 from abc import abstractmethod
 from multiprocessing import Queue, Process
 from queue import Empty
+from typing import Dict, Optional
 
-from time import sleep
+from time import sleep, time
 
 from src.system.custom_process import BaseCustomProcess
 from src.system.config import LOG_ERROR, SECURITY_MONITOR_QUEUE_NAME,\
     CRITICALITY_STR, DEFAULT_LOG_LEVEL, \
-    LOG_DEBUG, LOG_INFO
-from src.system.queues_dir import QueuesDirectory
+    LOG_DEBUG, LOG_INFO, EXECUTION_MODE_PROCESS, LOG_CATEGORY_EVENTS
+from src.system.queues_dir import QueuesDirectory, PriorityLanesQueue
 from src.system.event_types import Event, ControlEvent
+from src.system.event_priority import PRIORITY_LEVELS, event_priority
+from src.system.event_signing import SignatureVerifier
+from src.system.event_log import EventLogWriter, \
+    DECISION_ALLOWED, DECISION_DENIED, DECISION_BAD_SIGNATURE
+
+# порядок выборки событий из полос приоритета
+SCHEDULING_STRICT = "strict"      # сначала все события более приоритетной полосы
+SCHEDULING_WEIGHTED = "weighted"  # до lane_weights[i] событий полосы i за один круг
 
 
 class BaseSecurityMonitor(BaseCustomProcess):
@@ -19,41 +28,149 @@ class BaseSecurityMonitor(BaseCustomProcess):
     event_source_name = SECURITY_MONITOR_QUEUE_NAME
     events_q_name = event_source_name
 
-    def __init__(self, queues_dir: QueuesDirectory, log_level: int):
+    scheduling = SCHEDULING_STRICT
+    # веса полос PRIORITY_CONTROL, PRIORITY_NORMAL, PRIORITY_TELEMETRY
+    # для SCHEDULING_WEIGHTED
+    lane_weights = (8, 4, 1)
+    # максимальное число событий за итерацию, после которого проверяются
+    # управляющие команды монитора
+    events_per_iteration = 1000
+
+    def __init__(self, queues_dir: QueuesDirectory, log_level: int,
+                 execution_mode: str = EXECUTION_MODE_PROCESS,
+                 signing_keys: Optional[Dict[str, bytes]] = None,
+                 capture_path: Optional[str] = None):
+        """
+        Args:
+            signing_keys (Optional[Dict[str, bytes]]): ключи подписи событий
+                по источникам; если заданы, события без верной подписи
+                ключом своего источника отклоняются
+            capture_path (Optional[str]): путь журнала событий (см. event_log.py);
+                если задан, каждое полученное событие записывается в журнал
+                вместе со временем получения и решением монитора
+        """
         # вызываем конструктор базового класса
         super().__init__(
             log_prefix=BaseSecurityMonitor.log_prefix,
             queues_dir=queues_dir,
             events_q_name=BaseSecurityMonitor.event_source_name,
             event_source_name=BaseSecurityMonitor.event_source_name,
-            log_level=log_level)
+            log_level=log_level,
+            execution_mode=execution_mode)
 
         # инициализируем интервал обновления
         self._recalc_interval_sec = 0.1
+        self._loop_interval_sec = self._recalc_interval_sec
+        # оставшиеся в текущем круге взвешенного планирования события по полосам
+        self._lane_credits = list(self.lane_weights)
+        self._signature_verifier = SignatureVerifier(signing_keys) \
+            if signing_keys is not None else None
+        self._capture_path = capture_path
+        # получатель записей журнала событий, открывается в рабочем процессе
+        self._capture = None
         self._log_message(LOG_INFO, "создан монитор безопасности")
 
 
-    def _check_events_q(self):
-        """_check_events_q в цикле проверим все входящие сообщения,
-        выход из цикла по условию отсутствия новых сообщений
+    def attach_capture(self, capture):
+        """attach_capture задаёт получателя записей журнала событий
+
+        Используется, когда монитор работает в процессе вызывающего
+        (см. event_replay.py).
+
+        Args:
+            capture: объект с методами write(timestamp, event, decision)
+                и flush() (как у EventLogWriter) или None
         """
+        self._capture = capture
 
-        while True:
+
+    def _init_resources(self):
+        if self._capture_path is not None:
+            self._capture = EventLogWriter(self._capture_path)
+            self._log_message(LOG_INFO, f"журнал событий монитора: {self._capture_path}")
+
+
+    def _create_events_q(self, queues_dir: QueuesDirectory, execution_mode: str):
+        """ входящие события раскладываются по полосам приоритета уже у отправителя """
+        return PriorityLanesQueue(
+            lanes=[queues_dir.create_queue(execution_mode) for _ in PRIORITY_LEVELS],
+            lane_of=event_priority)
+
+
+    def _next_event(self):
+        """ следующее событие для обработки согласно порядку выборки из полос """
+        if self.scheduling == SCHEDULING_STRICT:
             try:
-                event: Event = self._events_q.get_nowait()
+                return self._events_q.get_nowait()
             except Empty:
+                return None
+
+        # взвешенный круговой обход: верхняя полоса опрашивается первой,
+        # пока у неё остались события в текущем круге
+        for _ in range(2):
+            for lane, credit in enumerate(self._lane_credits):
+                if credit <= 0:
+                    continue
+                try:
+                    event = self._events_q.get_nowait(lane)
+                except Empty:
+                    continue
+                self._lane_credits[lane] -= 1
+                return event
+            self._lane_credits = list(self.lane_weights)
+        return None
+
+
+    def _check_events_q(self):
+        """_check_events_q в цикле проверим входящие сообщения в порядке приоритета,
+        выход из цикла по условию отсутствия новых сообщений
+        или после events_per_iteration сообщений
+
+        Returns:
+            True, если в очереди могли остаться необработанные сообщения
+        """
+
+        backlog = True
+        processed = False
+        capture = self._capture
+        verifier = self._signature_verifier
+        for _ in range(self.events_per_iteration):
+            event = self._next_event()
+            if event is None:
                 # в очереди не команд на обработку,
                 # выходим из цикла проверки
+                backlog = False
                 break
             if not isinstance(event, Event):
                 # событие неправильного типа, пропускаем
                 continue
+            # событие доставляется сразу после выборки: команда из верхней полосы
+            # не ждёт, пока будет выбрана пачка событий из нижних
+            processed = True
+            received = time() if capture is not None else None
+            self._log_message(LOG_DEBUG, "получен запрос %s", event, category=LOG_CATEGORY_EVENTS)
+
+            if verifier is not None and not verifier.verify(event):
+                self._log_message(LOG_ERROR, f"неверная подпись события! {event}")
+                if capture is not None:
+                    capture.write(received, event, DECISION_BAD_SIGNATURE)
+                self._release_frame(event)
+                continue
 
-            self._log_message(LOG_DEBUG, f"получен запрос {event}")
-
-            if self._check_event(event):
+            authorized = self._check_event(event)
+            if capture is not None:
+                capture.write(
+                    received, event, DECISION_ALLOWED if authorized else DECISION_DENIED)
+            if authorized:
                 self._proceed(event)
-                
+            else:
+                # кадр, который не будет доставлен, больше никому не нужен
+                self._release_frame(event)
+
+        if processed and capture is not None:
+            capture.flush()
+        return backlog
+
 
     @abstractmethod
     def _check_event(self, event: Event):
@@ -61,20 +178,28 @@ class BaseSecurityMonitor(BaseCustomProcess):
 
     def _proceed(self, event: Event):
         """ отправить проверенное событие конечному получателю """
-        destination_q = self._queues_dir.get_queue(event.destination)
-        if destination_q is None:
+        # ссылки на очереди получателей создаются один раз для каждого имени;
+        # событие спутника идёт в очередь этого спутника, если у получателя она своя
+        destination_q = self._queues_dir.route(event.destination, event.satellite_id)
+        if not destination_q:
             self._log_message(
                 LOG_ERROR, f"ошибка обработки запроса {event}, получатель не найден")
+            self._release_frame(event)
         else:
             destination_q.put(event)
             self._log_message(
-                LOG_DEBUG, f"запрос отправлен получателю {event}")
+                LOG_DEBUG, "запрос отправлен получателю %s", event, category=LOG_CATEGORY_EVENTS)
+
+
+    def _idle_wait(self):
+        # без событий ждём высокоприоритетную команду, а не спим:
+        # она будет обработана сразу, остальные - не позже чем через интервал
+        self._events_q.wait(self._recalc_interval_sec)
 
 
     def run(self):
         self._log_message(LOG_INFO, "старт монитора безопасности")
+        super().run()
+        if self._capture_path is not None and self._capture is not None:
+            self._capture.close()
 
-        while self._quit is False:
-            sleep(self._recalc_interval_sec)
-            self._check_events_q()
-            self._check_control_q()
@@ -0,0 +1,496 @@
+""" модуль сокетного транспорта событий между узлами
+
+Позволяет разнести компоненты системы по разным машинам. Запись каталога
+очередей может указывать не на локальную очередь, а на конечную точку
+сокета (SocketQueue): TCP-адрес вида ("host", port) или путь Unix-сокета.
+События передаются кадрами: 4-байтный префикс длины, HMAC-SHA256 кадра
+на общем ключе узлов (auth_key) и содержимое pickle. Соединения
+переиспользуются всеми отправителями процесса (пул соединений). Отправитель
+только ставит кадр в очередь соединения; соединяется с узлом и пишет
+в сокет пачками отдельный поток записи, так что недоступный узел
+не задерживает отправителей (в том числе монитор безопасности).
+
+Принимающая сторона сначала проверяет длину кадра (не больше
+MAX_FRAME_BYTES) и его HMAC и только затем распаковывает содержимое,
+поэтому объекты pickle от узла без ключа не распаковываются никогда.
+Соединение, приславшее слишком длинный кадр или кадр с неверной
+подписью, закрывается.
+
+На принимающем узле события из сокета принимает SocketGateway и всегда
+передаёт их монитору безопасности узла, так что весь межузловой трафик
+по-прежнему проходит проверку политиками.
+
+Пример (узел A - монитор и спутник, узел B - монитор и отрисовщик):
+
+    # узел A
+    queues_dir.register_endpoint(ORBIT_DRAWER_QUEUE_NAME, ("node-b", 9001), auth_key)
+    gateway = SocketGateway(("10.0.0.1", 9000), queues_dir, auth_key)
+    gateway.start()
+
+    # узел B: монитор узла B проверяет события, пришедшие от узла A,
+    # и передаёт их отрисовщику
+    queues_dir.register_endpoint(SATELITE_QUEUE_NAME, ("node-a", 9000), auth_key)
+    gateway = SocketGateway(("10.0.0.2", 9001), queues_dir, auth_key)
+    gateway.start()
+"""
+import hashlib
+import hmac
+import os
+import pickle
+import queue
+import selectors
+import socket
+import struct
+import threading
+from collections import deque
+from time import monotonic, sleep
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+
+from src.system.config import CRITICALITY_STR, DEFAULT_LOG_LEVEL, LOG_ERROR, LOG_INFO, \
+    SECURITY_MONITOR_QUEUE_NAME, OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST
+
+# адрес конечной точки: ("host", port) для TCP или путь для Unix-сокета
+Address = Union[Tuple[str, int], str]
+
+FRAME_HEADER = struct.Struct("!I")
+FRAME_TAG_SIZE = hashlib.sha256().digest_size
+# наибольшая длина кадра (подпись и содержимое); снимки передаются через
+# пул кадров в разделяемой памяти, поэтому события невелики
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+
+DEFAULT_BATCH_SIZE_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL_SEC = 0.002
+# наибольший объём очереди отправки одного соединения
+MAX_BUFFER_BYTES = 16 * 1024 * 1024
+CONNECT_TIMEOUT_SEC = 1.0
+# паузы перед повторным соединением после ошибки (удваиваются)
+MIN_RECONNECT_DELAY_SEC = 0.05
+MAX_RECONNECT_DELAY_SEC = 5.0
+
+
+def _log_message(criticality: int, message: str, log_prefix: str = "[SOCKET]",
+                 log_level: int = DEFAULT_LOG_LEVEL):
+    if criticality <= log_level:
+        print(f"[{CRITICALITY_STR[criticality]}]{log_prefix} {message}")
+
+
+class FrameError(Exception):
+    """ кадр нарушает протокол: слишком длинный или с неверной подписью """
+
+
+def _check_auth_key(auth_key: bytes) -> bytes:
+    if not auth_key:
+        raise ValueError("для сокетного транспорта нужен общий ключ узлов auth_key")
+    return bytes(auth_key)
+
+
+def encode_frame(item: Any, auth_key: bytes) -> bytes:
+    """encode_frame упаковывает объект в подписанный кадр с префиксом длины
+
+    Args:
+        item (Any): передаваемый объект (обычно Event)
+        auth_key (bytes): общий ключ узлов
+
+    Returns:
+        bytes: кадр для записи в сокет
+    """
+    payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+    if FRAME_TAG_SIZE + len(payload) > MAX_FRAME_BYTES:
+        raise FrameError(f"кадр длиной {len(payload)} байт больше {MAX_FRAME_BYTES}")
+    tag = hmac.new(auth_key, payload, hashlib.sha256).digest()
+    return FRAME_HEADER.pack(FRAME_TAG_SIZE + len(payload)) + tag + payload
+
+
+class FrameDecoder:
+    """ разбор потока байт на подписанные кадры с префиксом длины """
+
+    def __init__(self, auth_key: bytes, max_frame_bytes: int = MAX_FRAME_BYTES):
+        self._auth_key = _check_auth_key(auth_key)
+        self._max_frame_bytes = max_frame_bytes
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """feed добавляет принятые байты и возвращает объекты из всех полных кадров
+
+        Args:
+            data (bytes): очередная порция данных из сокета
+
+        Returns:
+            list: объекты, извлечённые из полностью принятых кадров
+
+        Raises:
+            FrameError: длина кадра вне допустимых границ или подпись неверна;
+                дальнейший разбор потока невозможен, соединение нужно закрыть
+        """
+        self._buffer += data
+        items = []
+        offset = 0
+        header_size = FRAME_HEADER.size
+        while len(self._buffer) - offset >= header_size:
+            (length,) = FRAME_HEADER.unpack_from(self._buffer, offset)
+            # длина проверяется по заголовку, до накопления кадра в буфере
+            if not FRAME_TAG_SIZE <= length <= self._max_frame_bytes:
+                raise FrameError(f"недопустимая длина кадра {length}")
+            end = offset + header_size + length
+            if len(self._buffer) < end:
+                break
+            start = offset + header_size
+            tag = bytes(self._buffer[start:start + FRAME_TAG_SIZE])
+            payload = bytes(self._buffer[start + FRAME_TAG_SIZE:end])
+            expected = hmac.new(self._auth_key, payload, hashlib.sha256).digest()
+            if not hmac.compare_digest(tag, expected):
+                raise FrameError("неверная подпись кадра")
+            items.append(pickle.loads(payload))
+            offset = end
+        if offset:
+            del self._buffer[:offset]
+        return items
+
+
+def _socket_family(address: Address) -> int:
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+class _Connection:
+    """ соединение с конечной точкой и очередь ещё не записанных кадров
+
+    Отправители только добавляют кадры в очередь (write), соединение
+    устанавливает и записывает её поток записи пула (send): недоступный узел
+    не задерживает отправителей. После ошибки следующая попытка выполняется
+    не раньше чем через растущую паузу (до MAX_RECONNECT_DELAY_SEC).
+    """
+
+    def __init__(self, address: Address, max_buffer_bytes: int = MAX_BUFFER_BYTES,
+                 overflow_policy: str = OVERFLOW_DROP_OLDEST):
+        if overflow_policy not in (OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK):
+            raise ValueError(f"неподдерживаемая политика переполнения {overflow_policy}")
+        self.address = address
+        self._max_buffer_bytes = max_buffer_bytes
+        self._overflow_policy = overflow_policy
+        self._sock: Optional[socket.socket] = None
+        self._frames: Deque[bytes] = deque()
+        self.buffered_bytes = 0
+        self.dropped_frames = 0
+        # кадры, отброшенные с последней удачной записи (в журнал - один раз за переполнение)
+        self._dropped_since_send = 0
+        # очередь кадров и запись в сокет защищены разными блокировками:
+        # отправители не ждут записи в сокет
+        self._lock = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._retry_delay_sec = 0.0
+        self.next_attempt_time = 0.0
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(_socket_family(self.address), socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT_SEC)
+        sock.connect(self.address)
+        sock.settimeout(None)
+        if sock.family == socket.AF_INET:
+            # кадры и так отправляются пачками
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def write(self, frame: bytes, block: bool = True, timeout: Optional[float] = None):
+        """write добавляет кадр в очередь отправки
+
+        При переполнении очереди (max_buffer_bytes) с политикой OVERFLOW_DROP_OLDEST
+        отбрасываются самые старые кадры, с политикой OVERFLOW_BLOCK отправитель
+        ждёт освобождения места (block, timeout - как у queue.Queue.put).
+
+        Raises:
+            queue.Full: места не стало за timeout (только OVERFLOW_BLOCK)
+        """
+        def fits() -> bool:
+            return self.buffered_bytes + len(frame) <= self._max_buffer_bytes or not self._frames
+
+        with self._lock:
+            if self._overflow_policy == OVERFLOW_BLOCK and not fits() \
+                    and (not block or not self._lock.wait_for(fits, timeout)):
+                raise queue.Full
+            self._frames.append(frame)
+            self.buffered_bytes += len(frame)
+            if self._overflow_policy == OVERFLOW_DROP_OLDEST:
+                self._drop_oldest_locked()
+
+    def _drop_oldest_locked(self):
+        dropped = 0
+        while self.buffered_bytes > self._max_buffer_bytes and len(self._frames) > 1:
+            self.buffered_bytes -= len(self._frames.popleft())
+            dropped += 1
+        if dropped:
+            if not self._dropped_since_send:
+                _log_message(
+                    LOG_ERROR, f"очередь отправки в {self.address} переполнена, старые кадры отбрасываются")
+            self.dropped_frames += dropped
+            self._dropped_since_send += dropped
+
+    def send(self, force: bool = False) -> bool:
+        """send запись накопленных кадров в сокет, в потоке записи пула
+
+        Args:
+            force (bool): не ждать окончания паузы после ошибки
+
+        Returns:
+            bool: False, если запись не удалась и кадры остались в очереди
+        """
+        with self._send_lock:
+            if not force and monotonic() < self.next_attempt_time:
+                return False
+            with self._lock:
+                frames = list(self._frames)
+                self._frames.clear()
+                self.buffered_bytes = 0
+                self._lock.notify_all()
+            if not frames:
+                return True
+            try:
+                if self._sock is None:
+                    self._sock = self._connect()
+                self._sock.sendall(b"".join(frames))
+            except OSError as e:
+                self.close()
+                self._retry_delay_sec = min(
+                    max(2 * self._retry_delay_sec, MIN_RECONNECT_DELAY_SEC), MAX_RECONNECT_DELAY_SEC)
+                self.next_attempt_time = monotonic() + self._retry_delay_sec
+                _log_message(
+                    LOG_ERROR, f"ошибка отправки в {self.address}: {e}, "
+                    f"повтор через {self._retry_delay_sec:.2f} сек.")
+                # кадры возвращаются в начало очереди; новое соединение начинает
+                # поток заново, поэтому кадры повторяются целиком
+                with self._lock:
+                    self._frames.extendleft(reversed(frames))
+                    self.buffered_bytes += sum(map(len, frames))
+                    if self._overflow_policy == OVERFLOW_DROP_OLDEST:
+                        self._drop_oldest_locked()
+                return False
+            self._retry_delay_sec = 0.0
+            self.next_attempt_time = 0.0
+            with self._lock:
+                dropped, self._dropped_since_send = self._dropped_since_send, 0
+            if dropped:
+                _log_message(LOG_INFO, f"запись в {self.address} восстановлена, отброшено кадров: {dropped}")
+            return True
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+
+class _ConnectionPool:
+    """ пул соединений процесса: одно соединение на конечную точку
+
+    Пул пересоздаётся в дочернем процессе, поэтому процессы не разделяют сокеты.
+    Соединения устанавливает и записывает один поток записи пула.
+    """
+
+    def __init__(self):
+        self._pid = None
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._connections: Dict[Address, _Connection] = {}
+        self._flush_requested = threading.Event()
+        # в очереди соединения набралась пачка: запись без ожидания интервала
+        self._flush_now = False
+        self._flusher: Optional[threading.Thread] = None
+
+    def connection(self, address: Address, max_buffer_bytes: int = MAX_BUFFER_BYTES,
+                   overflow_policy: str = OVERFLOW_DROP_OLDEST) -> _Connection:
+        if self._pid != os.getpid():
+            self._reset()
+        connection = self._connections.get(address)
+        if connection is None:
+            with self._lock:
+                connection = self._connections.get(address)
+                if connection is None:
+                    connection = self._connections[address] = _Connection(
+                        address, max_buffer_bytes, overflow_policy)
+        return connection
+
+    def request_flush(self, now: bool = False):
+        """ запрос отложенной (now=False) или немедленной записи очередей всех соединений """
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                    self._flusher.start()
+        if now:
+            self._flush_now = True
+        self._flush_requested.set()
+
+    def _flush_loop(self):
+        timeout = None
+        while True:
+            if self._flush_requested.wait(timeout):
+                if not self._flush_now:
+                    # копим кадры, пришедшие за интервал, и записываем их одной пачкой
+                    sleep(DEFAULT_FLUSH_INTERVAL_SEC)
+                self._flush_now = False
+                self._flush_requested.clear()
+            # соединения с неудачной записью повторяются после паузы
+            retry_at = None
+            for connection in list(self._connections.values()):
+                if not connection.send() and connection.buffered_bytes:
+                    retry_at = connection.next_attempt_time if retry_at is None \
+                        else min(retry_at, connection.next_attempt_time)
+            timeout = None if retry_at is None else max(retry_at - monotonic(), 0.0)
+
+    def flush_all(self):
+        if self._pid != os.getpid():
+            return
+        for connection in list(self._connections.values()):
+            connection.send(force=True)
+
+
+_pool = _ConnectionPool()
+
+
+def flush_all():
+    """ немедленная запись всех буферизованных кадров текущего процесса """
+    _pool.flush_all()
+
+
+class SocketQueue:
+    """ запись каталога очередей, ведущая на удалённую конечную точку
+
+    Поддерживает только отправку (put): принимает события SocketGateway
+    на стороне получателя. put только добавляет кадр в очередь отправки
+    соединения, запись в сокет выполняет поток записи пула.
+    """
+
+    def __init__(self, address: Address, auth_key: bytes,
+                 batch_size_bytes: int = DEFAULT_BATCH_SIZE_BYTES,
+                 max_buffer_bytes: int = MAX_BUFFER_BYTES,
+                 overflow_policy: str = OVERFLOW_DROP_OLDEST):
+        """
+        Args:
+            address (Address): адрес шлюза принимающего узла
+            auth_key (bytes): общий ключ узлов, которым подписываются кадры
+            batch_size_bytes (int): объём очереди, после которого запись
+                начинается без ожидания DEFAULT_FLUSH_INTERVAL_SEC
+            max_buffer_bytes (int): наибольший объём очереди отправки
+            overflow_policy (str): поведение при переполнении очереди отправки:
+                OVERFLOW_DROP_OLDEST - отбросить самые старые кадры,
+                OVERFLOW_BLOCK - отправитель ждёт (block, timeout в put)
+        """
+        self.address = address
+        self._auth_key = _check_auth_key(auth_key)
+        self._batch_size_bytes = batch_size_bytes
+        self._max_buffer_bytes = max_buffer_bytes
+        self._overflow_policy = overflow_policy
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        connection = _pool.connection(self.address, self._max_buffer_bytes, self._overflow_policy)
+        connection.write(encode_frame(item, self._auth_key), block, timeout)
+        _pool.request_flush(now=connection.buffered_bytes >= self._batch_size_bytes)
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
+
+
+class SocketGateway:
+    """ шлюз, принимающий события из сокета и передающий их монитору безопасности узла """
+    log_prefix = "[GATEWAY]"
+
+    def __init__(self, address: Address, queues_dir, auth_key: bytes,
+                 log_level: int = DEFAULT_LOG_LEVEL):
+        """
+        Args:
+            address (Address): адрес, на котором шлюз принимает соединения
+            queues_dir (QueuesDirectory): каталог локальных очередей
+            auth_key (bytes): общий ключ узлов, которым подписаны кадры
+            log_level (int): уровень логирования
+        """
+        self.address = address
+        self._queues_dir = queues_dir
+        self._auth_key = _check_auth_key(auth_key)
+        self.log_level = log_level
+        self._server: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._thread: Optional[threading.Thread] = None
+        self._quit = False
+
+    def _log_message(self, criticality: int, message: str):
+        _log_message(criticality, message, self.log_prefix, self.log_level)
+
+    def start(self):
+        """ запуск приёма соединений в отдельном потоке """
+        family = _socket_family(self.address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.address)
+        self._server.listen()
+        self._server.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ, None)
+        self._quit = False
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._log_message(LOG_INFO, f"шлюз слушает {self.address}")
+
+    def _serve(self):
+        while self._quit is False:
+            for key, _ in self._selector.select(timeout=0.1):
+                if key.data is None:
+                    self._accept()
+                else:
+                    self._read(key.fileobj, key.data)
+
+    def _accept(self):
+        try:
+            conn, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self._selector.register(conn, selectors.EVENT_READ, FrameDecoder(self._auth_key))
+
+    def _read(self, conn: socket.socket, decoder: FrameDecoder):
+        try:
+            data = conn.recv(DEFAULT_BATCH_SIZE_BYTES)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(conn)
+            return
+        try:
+            items = decoder.feed(data)
+        except FrameError as e:
+            self._log_message(LOG_ERROR, f"соединение закрыто: {e}")
+            self._close(conn)
+            return
+        for item in items:
+            self._deliver(item)
+
+    def _close(self, conn: socket.socket):
+        self._selector.unregister(conn)
+        conn.close()
+
+    def _deliver(self, item: Any):
+        # получателя определяет монитор безопасности по своим политикам
+        q = self._queues_dir.handle(SECURITY_MONITOR_QUEUE_NAME)
+        if not q:
+            self._log_message(LOG_ERROR, f"монитор безопасности не найден, событие {item} отброшено")
+            return
+        q.put(item)
+
+    def stop(self):
+        """ остановка шлюза и закрытие всех соединений """
+        self._quit = True
+        if self._thread is not None:
+            self._thread.join()
+        for key in list(self._selector.get_map().values()):
+            key.fileobj.close()
+        self._selector.close()
+        if _socket_family(self.address) == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self._log_message(LOG_INFO, f"шлюз {self.address} остановлен")
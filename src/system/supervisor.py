@@ -0,0 +1,160 @@
+""" модуль наблюдения за компонентами и перезапуска упавших
+
+ComponentSupervisor в отдельном потоке основного процесса следит за
+компонентами системы и перезапускает завершившиеся с ошибкой:
+
+  * компонент-процесс: завершение процесса обнаруживается сразу по его
+    sentinel (multiprocessing.connection.wait). Новый процесс получает те же
+    очереди событий, поэтому каталог очередей и ссылки на них в других
+    компонентах остаются действительными, и восстанавливает состояние
+    из последней контрольной точки. Контрольные точки компонент сам
+    периодически отправляет супервизору (см. BaseCustomProcess._get_checkpoint);
+    компоненты с собственным хранилищем на диске (например,
+    RestrictedZoneControl с storage_dir) восстанавливаются из него;
+  * компонент-поток: состояние компонента осталось в памяти, перезапускается
+    только поток рабочего цикла.
+
+Частые падения одного компонента ограничены RestartBudget: после
+max_restarts перезапусков за restart_window_sec компонент больше
+не перезапускается.
+"""
+import threading
+from collections import deque
+from multiprocessing import Queue
+from multiprocessing.connection import wait
+from queue import Empty
+from time import monotonic, sleep
+from typing import Dict, List
+
+from src.system.custom_process import BaseCustomProcess
+from src.system.config import LOG_ERROR, LOG_FAILURE, LOG_INFO, CRITICALITY_STR, \
+    EXECUTION_MODE_PROCESS
+
+DEFAULT_CHECK_INTERVAL_SEC = 0.01
+DEFAULT_MAX_RESTARTS = 5
+DEFAULT_RESTART_WINDOW_SEC = 60.0
+
+
+class RestartBudget:
+    """ ограничение числа перезапусков компонента за скользящее окно """
+
+    def __init__(self, max_restarts: int = DEFAULT_MAX_RESTARTS,
+                 window_sec: float = DEFAULT_RESTART_WINDOW_SEC):
+        self._max_restarts = max_restarts
+        self._window_sec = window_sec
+        self._restarts = deque()
+
+    def allow(self) -> bool:
+        """ можно ли перезапустить компонент ещё раз; разрешённый перезапуск учитывается """
+        now = monotonic()
+        while self._restarts and now - self._restarts[0] > self._window_sec:
+            self._restarts.popleft()
+        if len(self._restarts) >= self._max_restarts:
+            return False
+        self._restarts.append(now)
+        return True
+
+
+class ComponentSupervisor:
+    """ перезапуск упавших компонентов с восстановлением состояния """
+
+    def __init__(self, components: List[BaseCustomProcess], log_level=LOG_ERROR,
+                 check_interval_sec: float = DEFAULT_CHECK_INTERVAL_SEC,
+                 max_restarts: int = DEFAULT_MAX_RESTARTS,
+                 restart_window_sec: float = DEFAULT_RESTART_WINDOW_SEC):
+        """
+        Args:
+            components (List[BaseCustomProcess]): наблюдаемые компоненты
+            check_interval_sec (float): наибольшая задержка обнаружения
+                падения компонента-потока и приёма контрольных точек
+            max_restarts (int): наибольшее число перезапусков компонента
+                за restart_window_sec
+        """
+        self._components = components
+        self.log_prefix = "[СУПЕРВИЗОР]"
+        self.log_level = log_level
+        self._check_interval_sec = check_interval_sec
+        self._budgets = {
+            id(component): RestartBudget(max_restarts, restart_window_sec)
+            for component in components}
+        # очереди контрольных точек и последние принятые точки компонентов-процессов
+        self._checkpoint_queues: Dict[int, Queue] = {}
+        self._checkpoints: Dict[int, object] = {}
+        self._given_up = set()
+        self._thread = None
+        self._quit = False
+
+    def _log_message(self, criticality: int, message: str):
+        if criticality <= self.log_level:
+            print(f"[{CRITICALITY_STR[criticality]}]{self.log_prefix} {message}")
+
+    def _attach(self, component: BaseCustomProcess):
+        if component._execution_mode != EXECUTION_MODE_PROCESS:
+            return
+        # новая очередь при каждом запуске: процесс мог завершиться посреди записи
+        checkpoint_q = Queue()
+        self._checkpoint_queues[id(component)] = checkpoint_q
+        component.attach_supervisor(checkpoint_q)
+
+    def attach(self):
+        """ подключение компонентов к супервизору, до их запуска """
+        for component in self._components:
+            self._attach(component)
+
+    def start(self):
+        """ начало наблюдения, после запуска компонентов """
+        self._quit = False
+        self._thread = threading.Thread(target=self._watch, name="supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ окончание наблюдения, до остановки компонентов """
+        self._quit = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _collect_checkpoints(self):
+        for key, checkpoint_q in self._checkpoint_queues.items():
+            while True:
+                try:
+                    self._checkpoints[key] = checkpoint_q.get_nowait()
+                except Empty:
+                    break
+
+    def _watch(self):
+        while not self._quit:
+            sentinels = [
+                component.sentinel for component in self._components
+                if component._execution_mode == EXECUTION_MODE_PROCESS and component.is_alive()]
+            if sentinels:
+                wait(sentinels, self._check_interval_sec)
+            else:
+                sleep(self._check_interval_sec)
+            if self._quit:
+                break
+
+            self._collect_checkpoints()
+            for component in self._components:
+                if component.failed and id(component) not in self._given_up:
+                    self._restart(component)
+
+    def _restart(self, component: BaseCustomProcess):
+        name = component.__class__.__name__
+        self._log_message(LOG_ERROR, f"{name} завершился с ошибкой")
+        if not self._budgets[id(component)].allow():
+            self._given_up.add(id(component))
+            self._log_message(LOG_FAILURE, f"{name} падает слишком часто, перезапуск прекращён")
+            return
+
+        started = monotonic()
+        # точка сохраняется до следующей: компонент может упасть раньше, чем пришлёт новую
+        checkpoint = self._checkpoints.get(id(component))
+        self._attach(component)
+        component.restart(checkpoint)
+        if component._execution_mode != EXECUTION_MODE_PROCESS:
+            restored = "состояние в памяти"
+        else:
+            restored = "из контрольной точки" if checkpoint is not None else "без контрольной точки"
+        self._log_message(
+            LOG_INFO, f"{name} перезапущен за {(monotonic() - started) * 1000:.1f} мс, {restored}")
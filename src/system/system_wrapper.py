@@ -2,17 +2,25 @@
 
 
 from multiprocessing import Process
-from typing import List
+from typing import Dict, List, Optional
+from src.system.supervisor import ComponentSupervisor
 from src.system.config import LOG_ERROR, LOG_INFO, CRITICALITY_STR
 
 
 class SystemComponentsContainer:
     """ контейнер компонентов """    
 
-    def __init__(self, components: List[Process], log_level = LOG_ERROR):
+    def __init__(self, components: List[Process], log_level = LOG_ERROR, restart_failed: bool = False):
+        """
+        Args:
+            restart_failed (bool): перезапускать компоненты, завершившиеся
+                с ошибкой (см. supervisor.py)
+        """
         self._components = components
         self.log_prefix = "[СИСТЕМА]"
         self.log_level = log_level
+        self._restart_failed = restart_failed
+        self._supervisor = None
 
     def _log_message(self, criticality: int, message: str):
         """_log_message печатает сообщение заданного уровня критичности
@@ -26,13 +34,22 @@ class SystemComponentsContainer:
 
     def start(self):
         """ запуск всех компонентов """
+        if self._restart_failed:
+            self._supervisor = ComponentSupervisor(self._components, self.log_level)
+            self._supervisor.attach()
 
         for component in self._components:
             self._log_message(LOG_INFO, f"запуск {component.__class__.__name__}")
             component.start()
 
+        if self._supervisor is not None:
+            self._supervisor.start()
+
     def stop(self):
         """ остановка всех компонентов """
+        # остановленные компоненты не должны перезапускаться
+        if self._supervisor is not None:
+            self._supervisor.stop()
 
         for component in self._components:
             self._log_message(LOG_INFO, f"остановка {component.__class__.__name__}")
@@ -41,6 +58,13 @@ class SystemComponentsContainer:
         for component in self._components:
             component.join()
 
+    def set_log_level(self, level: Optional[int] = None,
+                      categories: Optional[Dict[str, Optional[int]]] = None):
+        """ изменение уровня журнала всех компонентов без перезапуска
+        (см. BaseCustomProcess.set_log_level) """
+        for component in self._components:
+            component.set_log_level(level, categories)
+
     def clean(self):
         """ очистка всех компонентов """
         for component in self._components:
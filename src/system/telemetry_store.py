@@ -0,0 +1,243 @@
+""" модуль колоночного хранилища телеметрии на диске
+
+Записи (время, широта, долгота, источник) хранятся по столбцам в файлах
+фрагментов фиксированного размера (по chunk_rows строк), каждый столбец
+фрагмента - отдельный файл, отображаемый в память (np.memmap). Записи
+копятся в памяти и переносятся в файлы пачками (flush), после чего число
+сохранённых строк записывается в файл состояния: строки, не попавшие в него
+при сбое, при следующем открытии не учитываются.
+
+Модельное время начинается с нуля при каждом запуске системы, поэтому строки
+делятся на сеансы записи: каждое открытие хранилища для записи начинает
+новый сеанс, а время, меньшее последнего, - тоже (например, спутник
+перезапущен без контрольной точки). Номера первых строк сеансов хранятся
+в файле состояния. Внутри сеанса время не убывает, поэтому выборка
+по интервалу времени в сеансе - двоичный поиск сначала по первым временам
+фрагментов сеанса, затем внутри фрагментов.
+Хранилище можно открыть только для чтения (readonly=True) из другого процесса,
+пока рекордер продолжает запись: каждая выборка видит строки последнего flush.
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SOURCE_ORBIT = 0   # положение спутника
+SOURCE_PHOTO = 1   # координаты снимка
+
+COLUMNS = {
+    "time": np.float64,    # время, сек. модельного времени спутника
+    "lat": np.float64,
+    "lon": np.float64,
+    "source": np.uint8,    # SOURCE_ORBIT или SOURCE_PHOTO
+}
+
+STATE_FILE_NAME = "rows.npy"
+
+
+class TelemetryStore:
+    """ колоночное хранилище записей телеметрии """
+
+    def __init__(self, directory: str, chunk_rows: int = 65536, flush_rows: int = 256,
+                 readonly: bool = False):
+        """
+        Args:
+            directory (str): каталог хранилища
+            chunk_rows (int): число строк в одном фрагменте
+            flush_rows (int): число накопленных записей, после которого они
+                переносятся в файлы
+            readonly (bool): открыть только для чтения
+        """
+        self._directory = directory
+        self._readonly = readonly
+        self.flush_rows = flush_rows
+        self._state_path = os.path.join(directory, STATE_FILE_NAME)
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+
+        self._chunk_rows = chunk_rows
+        self._rows = 0
+        # номера первых строк сеансов записи
+        self._run_starts: List[int] = [0]
+        self._read_state()
+        # новый сеанс начинается с первой записи после открытия
+        self._new_run = not readonly and self._rows > 0
+
+        # отображения столбцов по фрагментам
+        self._chunks: List[Dict[str, np.memmap]] = []
+        self._buffer = {name: [] for name in COLUMNS}
+
+    def _read_state(self):
+        if os.path.exists(self._state_path):
+            state = [int(value) for value in np.load(self._state_path)]
+            self._rows, self._chunk_rows = state[:2]
+            # в файлах прежнего формата сеансов нет: все строки - один сеанс
+            self._run_starts = state[2:] or [0]
+
+    def _write_state(self):
+        tmp_path = self._state_path + ".tmp"
+        starts = [start for start in self._run_starts if start < self._rows] or [0]
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.array([self._rows, self._chunk_rows] + starts, dtype=np.int64))
+        os.replace(tmp_path, self._state_path)
+
+    def __len__(self) -> int:
+        return self._rows + len(self._buffer["time"])
+
+    def _column_path(self, chunk: int, name: str) -> str:
+        return os.path.join(self._directory, f"chunk_{chunk:06d}.{name}")
+
+    def _chunk(self, chunk: int) -> Dict[str, np.memmap]:
+        while len(self._chunks) <= chunk:
+            index = len(self._chunks)
+            mode = "r" if self._readonly else ("r+" if os.path.exists(
+                self._column_path(index, "time")) else "w+")
+            columns = {
+                name: np.memmap(self._column_path(index, name), dtype=dtype, mode=mode,
+                                shape=(self._chunk_rows,))
+                for name, dtype in COLUMNS.items()
+            }
+            self._chunks.append(columns)
+        return self._chunks[chunk]
+
+    @property
+    def runs(self) -> int:
+        """ число сеансов записи """
+        return len(self._run_starts)
+
+    def _last_time(self) -> float:
+        if self._buffer["time"]:
+            return self._buffer["time"][-1]
+        if self._rows == 0:
+            return -np.inf
+        chunk, row = divmod(self._rows - 1, self._chunk_rows)
+        return float(self._chunk(chunk)["time"][row])
+
+    def append(self, t: float, lat: float, lon: float, source: int):
+        """ добавление записи; время меньше последнего начинает новый сеанс """
+        t = float(t)
+        if self._new_run or t < self._last_time():
+            self._new_run = False
+            if len(self) > self._run_starts[-1]:
+                self._run_starts.append(len(self))
+        self._buffer["time"].append(t)
+        self._buffer["lat"].append(float(lat))
+        self._buffer["lon"].append(float(lon))
+        self._buffer["source"].append(int(source))
+        if len(self._buffer["time"]) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """ перенос накопленных записей в файлы фрагментов """
+        count = len(self._buffer["time"])
+        if count == 0:
+            return
+        columns = {name: np.asarray(values, dtype=COLUMNS[name])
+                   for name, values in self._buffer.items()}
+
+        written = 0
+        touched = set()
+        while written < count:
+            chunk, row = divmod(self._rows + written, self._chunk_rows)
+            size = min(count - written, self._chunk_rows - row)
+            chunk_columns = self._chunk(chunk)
+            for name, values in columns.items():
+                chunk_columns[name][row:row + size] = values[written:written + size]
+            touched.add(chunk)
+            written += size
+
+        for chunk in touched:
+            for column in self._chunks[chunk].values():
+                column.flush()
+        self._rows += count
+        self._write_state()
+        self._buffer = {name: [] for name in COLUMNS}
+
+    def _run_rows(self, run: int):
+        """ строки [first, last) сеанса run (отрицательный - с конца) """
+        starts = [start for start in self._run_starts if start < self._rows] or [0]
+        index = range(len(starts))[run]
+        last = starts[index + 1] if index + 1 < len(starts) else self._rows
+        return starts[index], last
+
+    def range(self, t_start: float, t_end: float, source: Optional[int] = None,
+              run: int = -1) -> Dict[str, np.ndarray]:
+        """range записи с временем в интервале [t_start, t_end]
+
+        Args:
+            t_start (float): начало интервала
+            t_end (float): конец интервала
+            source (Optional[int]): только записи этого источника
+            run (int): номер сеанса записи, по умолчанию последний
+
+        Returns:
+            Dict[str, np.ndarray]: столбцы time, lat, lon, source
+        """
+        if self._readonly:
+            # запись продолжается в другом процессе
+            self._read_state()
+        else:
+            self.flush()
+        first_row, last_row = self._run_rows(run)
+
+        # фрагменты сеанса и первое время сеанса в каждом из них
+        chunks = list(range(first_row // self._chunk_rows,
+                            (last_row + self._chunk_rows - 1) // self._chunk_rows))
+        bounds = [(max(first_row, chunk * self._chunk_rows) - chunk * self._chunk_rows,
+                   min(last_row, (chunk + 1) * self._chunk_rows) - chunk * self._chunk_rows)
+                  for chunk in chunks]
+        first_times = np.array([
+            self._chunk(chunk)["time"][begin] for chunk, (begin, _) in zip(chunks, bounds)])
+        first_chunk = max(int(np.searchsorted(first_times, t_start, side="right")) - 1, 0)
+        last_chunk = int(np.searchsorted(first_times, t_end, side="right"))
+
+        parts = {name: [] for name in COLUMNS}
+        for chunk, (row_begin, row_end) in list(zip(chunks, bounds))[first_chunk:last_chunk]:
+            columns = self._chunks[chunk]
+            times = columns["time"][row_begin:row_end]
+            begin = row_begin + int(np.searchsorted(times, t_start, side="left"))
+            end = row_begin + int(np.searchsorted(times, t_end, side="right"))
+            for name in COLUMNS:
+                parts[name].append(np.array(columns[name][begin:end]))
+
+        result = {
+            name: np.concatenate(values) if values else np.empty(0, dtype=COLUMNS[name])
+            for name, values in parts.items()
+        }
+        if source is not None:
+            mask = result["source"] == source
+            result = {name: values[mask] for name, values in result.items()}
+        return result
+
+    def position_at(self, t: float, max_gap_sec: float = 60.0, run: int = -1) -> Optional[tuple]:
+        """position_at положение спутника в момент t по соседним записям орбиты
+
+        Args:
+            t (float): момент времени
+            max_gap_sec (float): максимальное удаление соседних записей от t
+            run (int): номер сеанса записи, по умолчанию последний
+
+        Returns:
+            Optional[tuple]: (lat, lon) или None, если рядом с t нет записей
+                с обеих сторон
+        """
+        rows = self.range(t - max_gap_sec, t + max_gap_sec, source=SOURCE_ORBIT, run=run)
+        times = rows["time"]
+        after = int(np.searchsorted(times, t, side="left"))
+        if after < len(times) and times[after] == t:
+            return float(rows["lat"][after]), float(rows["lon"][after])
+        if after == 0 or after == len(times):
+            return None
+
+        before = after - 1
+        weight = (t - times[before]) / (times[after] - times[before])
+        lat = rows["lat"][before] + weight * (rows["lat"][after] - rows["lat"][before])
+        # долгота интерполируется по кратчайшему пути через антимеридиан
+        step = (rows["lon"][after] - rows["lon"][before] + 180.0) % 360.0 - 180.0
+        lon = (rows["lon"][before] + weight * step + 180.0) % 360.0 - 180.0
+        return float(lat), float(lon)
+
+    def close(self):
+        if not self._readonly:
+            self.flush()
+        self._chunks = []